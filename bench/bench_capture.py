@@ -0,0 +1,72 @@
+"""截圖轉換成本比較：改版前 PIL frombytes + np.array vs ScreenCapture 的BGRA視圖與重複使用緩衝區
+
+實際擷取需要螢幕，這裡以假的mss控制代碼回傳預先產生的BGRA畫面，只量測擷取之後的轉換耗時
+與額外配置的記憶體（tracemalloc 峰值）。
+
+執行：python bench/bench_capture.py [-n 50]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+from PIL import Image  # noqa: E402
+
+SIZES = [(1920, 1080), (2560, 1440)]
+
+
+def fake_capture(width, height):
+    """回傳使用假mss控制代碼的 ScreenCapture，每次擷取都回傳同一塊BGRA記憶體"""
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 256, (height, width, 4), dtype=np.uint8).tobytes()
+    shot = types.SimpleNamespace(raw=raw, bgra=raw, width=width, height=height, size=(width, height))
+    sct = types.SimpleNamespace(grab=lambda monitor: shot, monitors=[{"left": 0, "top": 0}])
+    capture = game_monitor.ScreenCapture()
+    capture._get_sct = lambda: sct
+    return capture, shot
+
+
+def measure(func, count):
+    """回傳 (平均毫秒, 記憶體峰值MB)"""
+    func()  # 第一次呼叫配置緩衝區，不列入計算
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = (time.perf_counter() - start) / count * 1000
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=50, help="每種方式重複次數")
+    args = parser.parse_args()
+
+    for width, height in SIZES:
+        capture, shot = fake_capture(width, height)
+        area = (0, 0, width, height)
+        cases = {
+            "PIL frombytes+np.array": lambda: np.array(Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")),
+            "grab_bgra (view)": lambda: capture.grab_bgra(area),
+            "grab_gray (reused)": lambda: capture.grab_gray(area),
+            "grab_rgb (owned copy)": lambda: capture.grab_rgb(area),
+        }
+        for name, func in cases.items():
+            elapsed, peak = measure(func, args.count)
+            print(f"{width}x{height}  {name:24} {elapsed:7.2f} ms  peak {peak:6.1f} MB")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""BOSS顏色檢測效能比較：改版前的 int64 色差運算 vs 24位元查找表，以及漸進掃描
+
+在合成畫面上量測：
+- 改版前 |dR|+|dG|+|dB| < 容差 的逐像素運算與 ColorClassifier.count_matches（結果須相同）
+- 查找表重建耗時（只在目標顏色或容差變更時發生）
+- evaluate_boss_frame 完整掃描與漸進掃描在沒有王、有王兩種畫面的耗時
+
+執行：python bench/bench_color_lut.py [-n 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+SIZES = [(400, 120), (1920, 1080)]
+TARGET, TOLERANCE, THRESHOLD = (255, 0, 0), 50, 100
+
+
+def frame(width, height, boss=False, seed=0):
+    """偏暗的隨機畫面；boss=True 時加入一行紅色文字大小的色塊"""
+    rng = np.random.default_rng(seed)
+    bgra = rng.integers(0, 200, (height, width, 4), dtype=np.uint8)
+    bgra[:, :, 3] = 255
+    if boss:
+        bgra[height // 2:height // 2 + 12, width // 4:width // 4 + 200] = (0, 0, 255, 255)
+    return bgra
+
+
+def old_count(bgra):
+    """改版前的做法：int64 暫存陣列逐像素計算L1色差"""
+    img_array = bgra[..., 2::-1]
+    color_distance = np.sum(np.abs(img_array - np.array(TARGET)), axis=2)
+    return int(np.sum(color_distance < TOLERANCE))
+
+
+def measure(func, count):
+    func()
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=20, help="每種方式重複次數")
+    args = parser.parse_args()
+
+    rules = [("color", TARGET, TOLERANCE, THRESHOLD)]
+    classifier = game_monitor.ColorClassifier()
+
+    start = time.perf_counter()
+    classifier.count_matches(frame(8, 8), rules)
+    print(f"查找表建立 {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    for width, height in SIZES:
+        bgra = frame(width, height, boss=True)
+        assert old_count(bgra) == classifier.count_matches(bgra, rules)[0]
+        old = measure(lambda: old_count(bgra), args.count)
+        lut = measure(lambda: classifier.count_matches(bgra, rules), args.count)
+        print(f"{width}x{height}  int64色差 {old:7.2f} ms   查找表 {lut:6.2f} ms")
+    print()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        engine = game_monitor.MonitorEngine(base_dir)
+        engine.config.update({"target_color": TARGET, "color_tolerance": TOLERANCE, "color_threshold": THRESHOLD})
+        for width, height in [(1800, 1000)]:
+            for label, boss in (("沒有王", False), ("有王", True)):
+                bgra = frame(width, height, boss=boss)
+                full_result = engine.evaluate_boss_frame(bgra, progressive=False)
+                assert engine.evaluate_boss_frame(bgra, progressive=True) == full_result == boss
+                full = measure(lambda: engine.evaluate_boss_frame(bgra, progressive=False), args.count)
+                progressive = measure(lambda: engine.evaluate_boss_frame(bgra, progressive=True), args.count)
+                print(f"{width}x{height} {label}  完整掃描 {full:6.2f} ms   漸進掃描 {progressive:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
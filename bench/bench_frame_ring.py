@@ -0,0 +1,116 @@
+"""共用截圖緩衝區效能比較：各功能自行呼叫mss vs 由單一擷取執行緒寫入 FrameRing
+
+以耗時與面積成正比的假mss模擬擷取成本，同時執行以下讀取端 N 秒：
+- 偵測循環：每 0.05 秒一個擷取週期，讀取王怪檢測區域並執行 detect_boss
+- 頻道區域監看：每 0.1 秒讀取頻道檢測區域
+- 當機監控：每 0.5 秒讀取整個螢幕
+- 即時顏色預覽：每 0.05 秒讀取 1x1 像素
+回報實際的mss擷取次數與偵測週期的平均耗時。
+
+執行：python bench/bench_frame_ring.py [-s 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+SCREEN_W, SCREEN_H = 1920, 1080
+DETECTION_AREA = (100, 100, 1000, 400)
+CHANNEL_AREA = (1500, 800, 1800, 900)
+GRAB_BASE_MS = 2.0  # 每次mss呼叫的固定成本
+GRAB_MS_PER_MPIXEL = 25.0  # 每百萬像素的擷取成本
+
+
+class SimulatedMss:
+    """耗時與面積成正比的假mss控制代碼，所有執行緒共用同一個計數"""
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.screen = rng.integers(0, 200, (SCREEN_H, SCREEN_W, 4), dtype=np.uint8)
+        self.monitors = [{"left": 0, "top": 0, "width": SCREEN_W, "height": SCREEN_H}]
+        self.grabs = 0
+        self._lock = threading.Lock()
+
+    def grab(self, monitor):
+        x, y, w, h = monitor["left"], monitor["top"], monitor["width"], monitor["height"]
+        time.sleep((GRAB_BASE_MS + GRAB_MS_PER_MPIXEL * w * h / 1e6) / 1000)
+        with self._lock:
+            self.grabs += 1
+        raw = self.screen[y:y + h, x:x + w].tobytes()
+        return types.SimpleNamespace(raw=raw, width=w, height=h)
+
+    def close(self):
+        pass
+
+
+def periodic(stop, interval, func):
+    while not stop.is_set():
+        func()
+        time.sleep(interval)
+
+
+def run(use_ring, seconds):
+    sct = SimulatedMss()
+    with tempfile.TemporaryDirectory() as base_dir:
+        engine = game_monitor.MonitorEngine(base_dir)
+        engine.config.update({"detection_area": DETECTION_AREA, "channel_area": CHANNEL_AREA, "frame_ring_fps": 10})
+        engine.capture._get_sct = lambda: sct
+        if use_ring:
+            engine.start_frame_ring()
+
+        stop = threading.Event()
+        tick_times = []
+
+        def detection_loop():
+            while not stop.is_set():
+                start = time.perf_counter()
+                engine.capture.begin_tick([DETECTION_AREA])
+                try:
+                    engine.detect_boss()
+                finally:
+                    engine.capture.end_tick()
+                tick_times.append(time.perf_counter() - start)
+                time.sleep(0.05)
+
+        capture = engine.capture
+        threads = [
+            threading.Thread(target=detection_loop),
+            threading.Thread(target=periodic, args=(stop, 0.1, lambda: capture.grab_gray(CHANNEL_AREA))),
+            threading.Thread(target=periodic, args=(stop, 0.5, lambda: capture.grab_gray((0, 0, SCREEN_W, SCREEN_H)))),
+            threading.Thread(target=periodic, args=(stop, 0.05, lambda: capture.grab_bgra((960, 540, 961, 541)))),
+        ]
+        grabs_before = sct.grabs
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        grabs = sct.grabs - grabs_before
+
+        if use_ring:
+            engine.stop_frame_ring()
+    return grabs / seconds, len(tick_times) / seconds, np.mean(tick_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--seconds", type=float, default=5, help="每種模式執行秒數")
+    args = parser.parse_args()
+
+    for label, use_ring in (("各自擷取", False), ("共用緩衝區", True)):
+        grabs, ticks, tick_ms = run(use_ring, args.seconds)
+        print(f"{label:6}  mss擷取 {grabs:6.1f} 次/秒   偵測週期 {ticks:5.1f} 次/秒，平均 {tick_ms:5.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
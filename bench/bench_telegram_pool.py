@@ -0,0 +1,115 @@
+"""Telegram連線池效能比較：每次 requests.post 新建連線 vs TelegramApiClient 共用連線池
+
+使用 tests/test_telegram_rate_limit.py 的本機模擬 Bot API 伺服器，依序發送 N 則訊息並比較延遲。
+有 openssl 指令時另外以自簽憑證測試 HTTPS（每次新建連線都要重新做TLS交握）。
+
+執行：python bench/bench_telegram_pool.py [-n 200]
+"""
+import argparse
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+import requests  # noqa: E402
+
+import game_monitor  # noqa: E402
+from test_telegram_rate_limit import start_server  # noqa: E402
+
+TOKEN = "BENCH"
+CHAT_ID = "1"
+
+
+def make_certificate(directory):
+    """以 openssl 產生 127.0.0.1 的自簽憑證，沒有 openssl 時回傳None"""
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", key, "-out", cert], check=True, capture_output=True)
+    return cert, key
+
+
+def start(certificate=None):
+    server = start_server()
+    url = server.url
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        url = url.replace("http://", "https://")
+    return server, url
+
+
+def bare_send(url, verify):
+    """改版前的做法：每次呼叫 requests.post（不共用連線）"""
+    response = requests.post(f"{url}/bot{TOKEN}/sendMessage", data={"chat_id": CHAT_ID, "text": "BOSS出現"},
+                             timeout=10, verify=verify)
+    return response.status_code == 200
+
+
+def measure(send, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        assert send()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": max(latencies),
+    }
+
+
+def run(label, count, certificate=None):
+    server, url = start(certificate)
+    verify = certificate[0] if certificate else True
+    try:
+        api = game_monitor.TelegramApiClient(TOKEN, url)
+        api._get_session().verify = verify
+        api._get_session().trust_env = False  # 不使用環境變數中的代理與CA設定
+        results = {
+            "requests.post": measure(lambda: bare_send(url, verify), count),
+            "pooled": measure(lambda: api.send_message(CHAT_ID, "BOSS出現", rate_limited=False), count),
+        }
+        api.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for name, stats in results.items():
+        print(f"{label:5} {name:13} mean {stats['mean']:6.2f} ms  p50 {stats['p50']:6.2f} ms  "
+              f"p95 {stats['p95']:6.2f} ms  max {stats['max']:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=200, help="每種方式依序發送的訊息數")
+    args = parser.parse_args()
+
+    os.environ.pop("REQUESTS_CA_BUNDLE", None)
+    os.environ.pop("CURL_CA_BUNDLE", None)
+    os.environ["NO_PROXY"] = "127.0.0.1"
+
+    run("http", args.count)
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = make_certificate(directory)
+        if certificate:
+            run("https", args.count, certificate)
+        else:
+            print("https 略過（找不到 openssl）")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,25 +5,1502 @@
 功能：監控畫面特定區域，檢測王怪並透過Telegram發送通知
 """
 
+import time
+STARTUP_T0 = time.perf_counter()  # 啟動報告的計時起點
+
 import tkinter as tk
 from tkinter import ttk, messagebox, colorchooser, simpledialog
 import json
-import time
+import sys
 import threading
+import socketserver
+import bisect
+import heapq
+import functools
+import importlib
+from collections import deque
 from datetime import datetime
-import pyautogui
-# 設定PyAutoGUI參數避免fail-safe問題
-pyautogui.FAILSAFE = False  # 禁用fail-safe（謹慎使用）
-pyautogui.PAUSE = 0.5  # 每次操作間隔0.5秒
-import requests
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
-import keyboard
-import mss
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 import urllib.parse
+import io
+import contextlib
+import copy
 import os
-import json
+
+class StartupReport:
+    """啟動時間報告：各模組匯入耗時與啟動里程碑（距程式啟動的秒數）"""
+    
+    def __init__(self, t0):
+        self.t0 = t0
+        self.imports = {}  # 模組名稱 -> (耗時秒數, 是否延遲匯入)
+        self.marks = {}    # 里程碑名稱 -> 距啟動秒數
+        self.path = None   # 設定後每個里程碑都會更新JSON檔
+        self._lock = threading.Lock()
+    
+    def import_module(self, name):
+        """立即匯入模組並記錄耗時"""
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.record_import(name, time.perf_counter() - start, lazy=False)
+        return module
+    
+    def record_import(self, name, seconds, lazy):
+        """記錄模組匯入耗時"""
+        with self._lock:
+            self.imports[name] = (seconds, lazy)
+    
+    def mark(self, name):
+        """記錄里程碑（同名只記錄第一次）"""
+        if name in self.marks:
+            return
+        with self._lock:
+            if name in self.marks:
+                return
+            self.marks[name] = time.perf_counter() - self.t0
+        if self.path:
+            self.save(self.path)
+    
+    def to_dict(self):
+        """轉為可輸出JSON的字典"""
+        with self._lock:
+            return {
+                "imports_ms": {name: {"ms": round(seconds * 1000, 1), "lazy": lazy}
+                               for name, (seconds, lazy) in self.imports.items()},
+                "milestones_ms": {name: round(seconds * 1000, 1) for name, seconds in self.marks.items()}
+            }
+    
+    def save(self, path):
+        """輸出JSON報告"""
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"❌ 輸出啟動報告失敗: {e}")
+    
+    def format_summary(self):
+        """主控台摘要"""
+        report = self.to_dict()
+        imports = ", ".join(f"{name} {info['ms']:.0f}ms{'(延遲)' if info['lazy'] else ''}"
+                            for name, info in report["imports_ms"].items())
+        milestones = ", ".join(f"{name} {ms:.0f}ms" for name, ms in report["milestones_ms"].items())
+        return f"⏱️ 啟動報告 - 匯入: {imports}\n⏱️ 啟動報告 - 里程碑: {milestones}"
+
+class LazyModule:
+    """延遲匯入的模組代理：第一次存取屬性時才真正匯入，不影響啟動時間"""
+    
+    def __init__(self, name, report=None, on_load=None):
+        self._name = name
+        self._report = report
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(module)
+                    if self._report:
+                        self._report.record_import(self._name, time.perf_counter() - start, lazy=True)
+                    self._module = module
+        return self._module
+    
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def configure_pyautogui(module):
+    """設定PyAutoGUI參數避免fail-safe問題"""
+    module.FAILSAFE = False  # 禁用fail-safe（謹慎使用）
+    module.PAUSE = 0.5  # 每次操作間隔0.5秒
+
+startup_report = StartupReport(STARTUP_T0)
+
+# 滑鼠只有一個：所有監控引擎（多開時的每個客戶端）的點擊都必須取得此鎖
+MOUSE_LOCK = threading.Lock()
+
+# 載入參考截圖就需要影像處理模組，維持立即匯入
+cv2 = startup_report.import_module("cv2")
+np = startup_report.import_module("numpy")
+Image = startup_report.import_module("PIL.Image")
+ImageTk = startup_report.import_module("PIL.ImageTk")
+
+# 只在監控、點擊或連線時才用到的模組延遲到第一次使用才匯入
+pyautogui = LazyModule("pyautogui", startup_report, on_load=configure_pyautogui)
+requests = LazyModule("requests", startup_report)
+mss = LazyModule("mss", startup_report)
+
+class ScreenCapture:
+    """常駐截圖引擎：每個執行緒保留一個mss控制代碼，直接提供BGRA緩衝區的NumPy視圖"""
+    
+    def __init__(self, metrics=None):
+        self._local = threading.local()
+        self.metrics = metrics  # 提供時記錄每次實際擷取的耗時
+        self.ring = None  # 共用截圖環狀緩衝區（由擷取執行緒寫入）
+        self.ring_max_age = 0.2
+    
+    def attach_ring(self, ring, max_age=0.2):
+        """改由共用截圖環狀緩衝區取得畫面；畫格超過 max_age 秒未更新時仍自行擷取"""
+        self.ring = ring
+        self.ring_max_age = max_age
+    
+    def detach_ring(self):
+        """停止使用共用截圖環狀緩衝區"""
+        self.ring = None
+    
+    def _get_sct(self):
+        """取得目前執行緒的mss控制代碼（第一次使用時建立）"""
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+    
+    def close(self):
+        """關閉目前執行緒的mss控制代碼"""
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            try:
+                sct.close()
+            except:
+                pass
+            self._local.sct = None
+    
+    def begin_tick(self, regions):
+        """開始新的擷取週期：本週期內所有區域共用一次聯集範圍的截圖"""
+        regions = [tuple(region) for region in regions if region]
+        if regions:
+            union = (min(r[0] for r in regions), min(r[1] for r in regions),
+                     max(r[2] for r in regions), max(r[3] for r in regions))
+        else:
+            union = None
+        self._local.tick_union = union
+        self._local.tick_frame = None
+    
+    def end_tick(self):
+        """結束擷取週期，釋放本週期的截圖"""
+        self._local.tick_union = None
+        self._local.tick_frame = None
+    
+    def _slice_from_tick(self, area):
+        """從本週期的聯集截圖切出指定區域，區域不在聯集範圍內時回傳None"""
+        union = getattr(self._local, "tick_union", None)
+        if not union or not area:
+            return None
+        
+        x1, y1, x2, y2 = area
+        ux1, uy1, ux2, uy2 = union
+        if x1 < ux1 or y1 < uy1 or x2 > ux2 or y2 > uy2:
+            return None
+        
+        # 第一次讀取時才擷取，同一週期只擷取一次
+        if self._local.tick_frame is None:
+            self._local.tick_frame = self._grab(union)
+        return self._local.tick_frame[y1-uy1:y2-uy1, x1-ux1:x2-ux1]
+    
+    def grab_bgra(self, area=None, live=False):
+        """擷取區域並回傳 (高, 寬, 4) 的BGRA視圖，不經過PIL也不複製
+        
+        live=True 時略過本週期的快取與共用緩衝區，一定呼叫mss取得此刻的畫面。
+        """
+        if live:
+            return self._grab_direct(area)
+        frame = self._slice_from_tick(area)
+        if frame is not None:
+            return frame
+        return self._grab(area)
+    
+    def _grab(self, area):
+        """取得畫面：共用緩衝區的最新畫格夠新且涵蓋區域時複製該區域，否則呼叫mss擷取"""
+        ring = self.ring
+        if ring is not None:
+            latest = ring.read_region(area, self.ring_max_age)
+            if latest is not None:
+                return latest[2]
+        return self._grab_direct(area)
+    
+    def grab_full_screen(self):
+        """直接擷取整個虛擬螢幕，回傳 (左, 上, BGRA視圖)，供擷取執行緒寫入共用緩衝區"""
+        monitor = self._get_sct().monitors[0]
+        return monitor["left"], monitor["top"], self._grab_direct(None)
+    
+    def _grab_direct(self, area):
+        """實際呼叫mss擷取畫面"""
+        sct = self._get_sct()
+        if area:
+            x1, y1, x2, y2 = area
+            monitor = {"top": y1, "left": x1, "width": x2-x1, "height": y2-y1}
+        else:
+            monitor = sct.monitors[0]  # 主螢幕
+        
+        start = time.perf_counter()
+        try:
+            screenshot = sct.grab(monitor)
+        except Exception:
+            # 控制代碼失效時（例如解析度變更）重建一次再試
+            self.close()
+            screenshot = self._get_sct().grab(monitor)
+        if self.metrics is not None:
+            self.metrics.record("capture", time.perf_counter() - start)
+        startup_report.mark("first_frame")
+        
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+    
+    def grab_rgb(self, area=None):
+        """擷取區域並轉換為獨立的RGB陣列（可安全保存）"""
+        return cv2.cvtColor(self.grab_bgra(area), cv2.COLOR_BGRA2RGB)
+    
+    def grab_gray(self, area=None, live=False):
+        """擷取區域並轉換為灰階
+        
+        結果寫入執行緒專用的預先配置緩衝區，下一次擷取會覆蓋內容，只適合立即使用的比對流程。
+        """
+        bgra = self.grab_bgra(area, live)
+        buffer = getattr(self._local, "gray_buffer", None)
+        if buffer is None or buffer.shape != bgra.shape[:2]:
+            buffer = np.empty(bgra.shape[:2], dtype=np.uint8)
+            self._local.gray_buffer = buffer
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY, dst=buffer)
+        return buffer
+
+class FrameRing:
+    """以共享記憶體實作的截圖環狀緩衝區
+    
+    單一擷取執行緒寫入帶時間戳記與編號的畫格，其他執行緒或偵測工作程序複製最新畫格中需要的區域。
+    每個槽位以序列鎖保護：寫入期間序號為奇數，複製前後序號不同（寫入中或已繞完一圈被覆寫）即重讀。
+    """
+    
+    HEADER_FIELDS = 3  # [最新畫格編號, 槽位數, 每槽容量]
+    SLOT_FIELDS = 7    # [序列鎖, 畫格編號, 時間戳(微秒), 左, 上, 高, 寬]
+    
+    def __init__(self, capacity=0, slots=4, name=None):
+        if name is None:
+            capacity = (capacity + 63) // 64 * 64
+            size = (self.HEADER_FIELDS + slots * self.SLOT_FIELDS) * 8 + slots * capacity
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        
+        self.header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = (0, slots, capacity)
+        self.slots, self.capacity = int(self.header[1]), int(self.header[2])
+        
+        offset = self.header.nbytes
+        self.slot_headers = np.ndarray((self.slots, self.SLOT_FIELDS), dtype=np.int64,
+                                       buffer=self.shm.buf, offset=offset)
+        if self.owner:
+            self.slot_headers[:] = 0
+        offset += self.slot_headers.nbytes
+        self.data = np.ndarray((self.slots, self.capacity), dtype=np.uint8, buffer=self.shm.buf, offset=offset)
+    
+    @property
+    def name(self):
+        return self.shm.name
+    
+    def write(self, frame, origin=(0, 0), timestamp=None):
+        """寫入一張BGRA畫格並回傳畫格編號（只允許單一寫入端）"""
+        height, width = frame.shape[:2]
+        if frame.nbytes > self.capacity:
+            raise ValueError(f"畫格大小 {width}x{height} 超過緩衝區容量")
+        
+        number = int(self.header[0]) + 1
+        slot = number % self.slots
+        fields = self.slot_headers[slot]
+        lock = int(fields[0])
+        fields[0] = lock + 1  # 奇數：寫入中
+        self.data[slot, :frame.nbytes].reshape(frame.shape)[:] = frame
+        fields[1:] = (number, int((timestamp or time.time()) * 1e6), origin[0], origin[1], height, width)
+        fields[0] = lock + 2
+        self.header[0] = number
+        return number
+    
+    def read_region(self, area=None, max_age=None):
+        """複製最新畫格中的區域（螢幕座標），回傳 (畫格編號, 時間戳, BGRA陣列)
+        
+        尚無畫格、畫格超過 max_age 秒或不涵蓋區域時回傳None。複製完成後再確認一次序列鎖，
+        複製期間槽位被覆寫就重讀，因此不會回傳撕裂的畫面。
+        """
+        for _ in range(3):
+            number = int(self.header[0])
+            if not number:
+                return None
+            slot = number % self.slots
+            fields = self.slot_headers[slot]
+            lock = int(fields[0])
+            if lock % 2:
+                continue
+            frame_number, timestamp, left, top, height, width = (int(value) for value in fields[1:])
+            if fields[0] != lock or frame_number != number:
+                continue
+            timestamp /= 1e6
+            if max_age is not None and time.time() - timestamp > max_age:
+                return None
+            
+            frame = self.data[slot, :height * width * 4].reshape(height, width, 4)
+            if area:
+                x1, y1, x2, y2 = area[0] - left, area[1] - top, area[2] - left, area[3] - top
+                if x1 < 0 or y1 < 0 or y2 > height or x2 > width:
+                    return None
+                frame = frame[y1:y2, x1:x2]
+            region = frame.copy()
+            if self.slot_headers[slot, 0] != lock:
+                continue
+            return number, timestamp, region
+        return None
+    
+    def close(self):
+        """釋放共享記憶體（建立者同時刪除）"""
+        del self.header, self.slot_headers, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class ColorClassifier:
+    """24位元查找表顏色分類器
+    
+    每條規則佔查找表的一個位元，所有規則只需一次查表與一次直方圖統計，
+    規則數量增加不會增加每次檢測的成本。顏色規則的判斷與L1色差規則
+    (|R|+|G|+|B| < 容差) 完全一致。
+    查找表依規則保留（最近使用的 MAX_TABLES 組），多開時所有客戶端共用同一個分類器，
+    規則相同的客戶端共用同一張16MB的表。
+    """
+    
+    MAX_RULES = 8  # 查找表每個項目為uint8，最多8條規則
+    MAX_TABLES = 8  # 最多保留幾組規則的查找表
+    
+    def __init__(self):
+        self._tables = {}  # 規則: (查找表, 規則位元)，依最近使用排序
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    @staticmethod
+    def _build_rule_mask(rule):
+        """建立單一規則的 256x256x256 布林表，索引為 [R, G, B]"""
+        channel = np.arange(256, dtype=np.int16)
+        if rule[0] == "range":
+            low, high = rule[1], rule[2]
+            in_r, in_g, in_b = [(channel >= low[i]) & (channel <= high[i]) for i in range(3)]
+            return (in_r[:, None] & in_g[None, :])[:, :, None] & in_b[None, None, :]
+        
+        (r, g, b), tolerance = rule[1], rule[2]
+        dr = np.abs(channel - r).astype(np.uint16)
+        dg = np.abs(channel - g).astype(np.uint16)
+        db = np.abs(channel - b).astype(np.uint16)
+        distance = (dr[:, None] + dg[None, :])[:, :, None] + db[None, None, :]
+        return distance < tolerance
+    
+    def _get_lut(self, rules):
+        """取得查找表，只有出現新的規則顏色或容差時才建立"""
+        key = tuple(rule[:3] for rule in rules)
+        with self._lock:
+            table = self._tables.pop(key, None)
+            if table is None:
+                lut = np.zeros((256, 256, 256), dtype=np.uint8)
+                for bit, rule in enumerate(rules):
+                    lut |= self._build_rule_mask(rule).view(np.uint8) << bit
+                # 索引為 (R << 16) | (G << 8) | B；每個查表值 (0-255) 包含哪些規則
+                table = (lut.ravel(), (np.arange(256)[:, None] >> np.arange(len(rules))) & 1)
+                if len(self._tables) >= self.MAX_TABLES:
+                    del self._tables[next(iter(self._tables))]  # 丟棄最久未使用的表
+            self._tables[key] = table
+            return table
+    
+    def _get_scratch(self, shape):
+        """取得執行緒專用的暫存陣列，依尺寸分別保留（取樣與完整掃描各用一組）"""
+        scratch_by_shape = getattr(self._local, "scratch", None)
+        if scratch_by_shape is None:
+            scratch_by_shape = self._local.scratch = {}
+        scratch = scratch_by_shape.get(shape)
+        if scratch is None:
+            if len(scratch_by_shape) >= 4:
+                scratch_by_shape.clear()  # 區域尺寸變更後丟棄舊的暫存陣列
+            scratch = (np.empty(shape, dtype=np.uint32), np.empty(shape, dtype=np.uint8))
+            scratch_by_shape[shape] = scratch
+        return scratch
+    
+    def count_matches(self, bgra, rules):
+        """計算BGRA影像中符合每條規則的像素數量
+        
+        rules 為 ("color", (R, G, B), 容差, 閾值) 或 ("range", (R, G, B), (R, G, B), 閾值) 的列表，
+        回傳與 rules 對應的像素數量列表。
+        """
+        lut, rule_bits = self._get_lut(rules)
+        
+        # 每個BGRA像素以little-endian讀成uint32即為 0xAARRGGBB，去掉alpha就是查找表索引
+        pixels = bgra.view(np.uint32)
+        index, matched = self._get_scratch(pixels.shape)
+        np.bitwise_and(pixels, 0xFFFFFF, out=index)
+        np.take(lut, index, out=matched)
+        
+        histogram = np.bincount(matched.ravel(), minlength=256)
+        return (histogram @ rule_bits).tolist()
+    
+    @staticmethod
+    def _channel_bound(rule):
+        """取得規則的單一通道必要條件 (BGRA通道索引, 下限, 上限)，沒有像素可能符合時回傳None
+        
+        符合顏色規則的像素每個通道都與目標相差小於容差；選下限最高的通道，
+        在偏暗的遊戲畫面上通常最能排除像素。
+        """
+        if rule[0] == "range":
+            intervals = [(rule[1][i], rule[2][i]) for i in range(3)]
+        else:
+            tolerance = rule[2]
+            if tolerance <= 0:
+                return None
+            intervals = [(max(0, value - tolerance + 1), min(255, value + tolerance - 1)) for value in rule[1]]
+        rgb_index = max(range(3), key=lambda i: intervals[i][0])
+        low, high = intervals[rgb_index]
+        if low > high:
+            return None
+        return 2 - rgb_index, low, high
+    
+    def count_upper_bounds(self, bgra, rules):
+        """計算每條規則符合像素數的上限：只讀一個通道，成本遠低於完整查表
+        
+        上限不超過閾值時即可確定該規則沒有超過閾值（結果與 count_matches 的判斷一致）。
+        """
+        channels = {}
+        bounds = []
+        for rule in rules:
+            bound = self._channel_bound(rule)
+            if bound is None:
+                bounds.append(0)
+                continue
+            channel_index, low, high = bound
+            if channel_index not in channels:
+                channels[channel_index] = cv2.extractChannel(bgra, channel_index)
+            bounds.append(cv2.countNonZero(cv2.inRange(channels[channel_index], low, high)))
+        return bounds
+
+def compute_dhash(gray):
+    """計算16x16差異雜湊 (dHash)，回傳32位元組的位元陣列"""
+    small = cv2.resize(gray, (17, 16), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+def hash_distance(hash1, hash2):
+    """計算兩個雜湊的漢明距離"""
+    return int(np.count_nonzero(np.unpackbits(np.bitwise_xor(hash1, hash2))))
+
+class SSIMScorer:
+    """內建SSIM計算（參數與scikit-image預設值一致）
+    
+    使用float32與box濾波（或高斯濾波），參考圖的平均值與變異數在建立快取時算好，
+    每次比對只計算即時畫面的部分，暫存陣列依尺寸重複使用。
+    """
+    
+    K1 = 0.01
+    K2 = 0.03
+    DATA_RANGE = 255.0
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    @staticmethod
+    def _window(gaussian):
+        """取得濾波視窗大小（與skimage相同：box為7，高斯 sigma=1.5 為11）"""
+        return 11 if gaussian else 7
+    
+    def _filter(self, src, dst, gaussian):
+        """局部平均濾波"""
+        win = self._window(gaussian)
+        if gaussian:
+            return cv2.GaussianBlur(src, (win, win), 1.5, dst=dst, borderType=cv2.BORDER_REFLECT)
+        return cv2.blur(src, (win, win), dst=dst, borderType=cv2.BORDER_REFLECT)
+    
+    def _cov_norm(self, gaussian):
+        """樣本共變異數修正係數"""
+        points = self._window(gaussian) ** 2
+        return points / (points - 1)
+    
+    def _get_buffers(self, shape):
+        """取得執行緒專用的float32暫存陣列"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers[0].shape != shape:
+            buffers = tuple(np.empty(shape, dtype=np.float32) for _ in range(7))
+            self._local.buffers = buffers
+        return buffers
+    
+    def prepare_reference(self, gray, gaussian=False):
+        """預先計算參考圖的平均值與變異數"""
+        if min(gray.shape) < self._window(gaussian):
+            raise ValueError("影像尺寸小於SSIM視窗")
+        
+        y = gray.astype(np.float32)
+        uy = self._filter(y, None, gaussian)
+        uyy = self._filter(y * y, None, gaussian)
+        vy = self._cov_norm(gaussian) * (uyy - uy * uy)
+        return {"y": y, "uy": uy, "uy2": uy * uy, "vy": vy, "gaussian": gaussian}
+    
+    def score(self, gray, reference):
+        """計算灰階畫面與預先計算的參考圖之間的平均SSIM"""
+        return self.score_many(gray, [reference])[0]
+    
+    def score_many(self, gray, references):
+        """以同一張灰階畫面批次比對多張參考圖
+        
+        即時畫面的平均值與變異數只計算一次，每張參考圖只需再做一次共變異數濾波。
+        所有參考圖須使用相同的濾波方式。
+        """
+        if not references:
+            return []
+        
+        gaussian = references[0]["gaussian"]
+        cov_norm = self._cov_norm(gaussian)
+        c1 = (self.K1 * self.DATA_RANGE) ** 2
+        c2 = (self.K2 * self.DATA_RANGE) ** 2
+        pad = (self._window(gaussian) - 1) // 2
+        x, ux, ux2, vx, vxy, numerator, denominator = self._get_buffers(gray.shape)
+        
+        # 即時畫面的平均值與變異數 vx
+        np.copyto(x, gray, casting="unsafe")
+        self._filter(x, ux, gaussian)
+        np.multiply(ux, ux, out=ux2)
+        np.multiply(x, x, out=numerator)
+        self._filter(numerator, vx, gaussian)
+        vx -= ux2
+        vx *= cov_norm
+        
+        scores = []
+        for reference in references:
+            # 共變異數 vxy
+            np.multiply(x, reference["y"], out=numerator)
+            self._filter(numerator, vxy, gaussian)
+            np.multiply(ux, reference["uy"], out=numerator)
+            vxy -= numerator
+            vxy *= cov_norm
+            
+            # 分子 (2*ux*uy + C1) * (2*vxy + C2)
+            numerator *= 2
+            numerator += c1
+            vxy *= 2
+            vxy += c2
+            numerator *= vxy
+            
+            # 分母 (ux^2 + uy^2 + C1) * (vx + vy + C2)
+            np.add(ux2, reference["uy2"], out=denominator)
+            denominator += c1
+            np.add(vx, reference["vy"], out=vxy)
+            vxy += c2
+            denominator *= vxy
+            
+            np.divide(numerator, denominator, out=numerator)
+            scores.append(float(numerator[pad:-pad, pad:-pad].mean(dtype=np.float64)))
+        
+        return scores
+
+class LatencyHistogram:
+    """固定區間的耗時直方圖（毫秒）
+    
+    只保存各區間的次數，記錄成本固定；百分位數以所在區間內線性內插估計。
+    """
+    
+    BOUNDS_MS = (1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 70, 100, 150, 200, 300, 500, 700,
+                 1000, 1500, 2000, 3000, 5000, 7000, 10000, 15000, 20000, 30000, 60000, 120000, 300000)
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)  # 最後一格為超過上限
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, seconds):
+        """記錄一次耗時（秒）"""
+        ms = seconds * 1000.0
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+    
+    def merge(self, other):
+        """併入另一個直方圖的統計"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+    
+    def percentile(self, p):
+        """估計第p百分位數（毫秒）"""
+        if not self.count:
+            return 0.0
+        
+        rank = p / 100.0 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.BOUNDS_MS[i - 1] if i > 0 else 0.0
+                upper = self.BOUNDS_MS[i] if i < len(self.BOUNDS_MS) else self.max_ms
+                value = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(value, self.max_ms)
+            cumulative += bucket_count
+        return self.max_ms
+    
+    def to_dict(self):
+        """轉為可輸出JSON的字典"""
+        buckets = {f"le_{bound}": count for bound, count in zip(self.BOUNDS_MS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "buckets": buckets
+        }
+
+class PerformanceMetrics:
+    """監控效能統計：各函式與各階段的耗時直方圖、完整循環時間與每小時頻道數"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """清除所有統計"""
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+            self.channel_times = deque()  # 最近一小時完成頻道切換的時間
+            self.channels_total = 0
+    
+    def record(self, name, seconds):
+        """記錄一次耗時"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+    
+    def increment(self, name, amount=1):
+        """累加計數器"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def take_delta(self):
+        """取出上次取出後新增的耗時與計數並清空（偵測工作程序回報給主程序使用）"""
+        with self._lock:
+            delta = (self.histograms, self.counters)
+            self.histograms, self.counters = {}, {}
+        return delta
+    
+    def merge_delta(self, delta):
+        """併入 take_delta 取出的耗時與計數"""
+        histograms, counters = delta
+        with self._lock:
+            for name, other in histograms.items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = LatencyHistogram()
+                histogram.merge(other)
+            for name, amount in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def record_channel(self, cycle_seconds):
+        """記錄完成一個頻道（一次完整循環）"""
+        now = time.time()
+        self.record("cycle", cycle_seconds)
+        with self._lock:
+            self.channels_total += 1
+            self.channel_times.append(now)
+            while self.channel_times and now - self.channel_times[0] > 3600:
+                self.channel_times.popleft()
+    
+    def channels_per_hour(self):
+        """最近一小時（不足一小時則依已運行時間換算）的每小時頻道數"""
+        with self._lock:
+            now = time.time()
+            while self.channel_times and now - self.channel_times[0] > 3600:
+                self.channel_times.popleft()
+            # 剛啟動時以至少60秒換算，避免少量樣本換算出誇大的數字
+            window = min(3600.0, max(60.0, now - self.started_at))
+            return len(self.channel_times) * 3600.0 / window
+    
+    def snapshot(self):
+        """取得所有統計的字典快照"""
+        channels_per_hour = self.channels_per_hour()
+        with self._lock:
+            return {
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "channels_total": self.channels_total,
+                "channels_per_hour": round(channels_per_hour, 1),
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+            }
+    
+    def format_summary(self):
+        """多行文字摘要（Telegram與日誌使用）"""
+        snapshot = self.snapshot()
+        lines = [f"已完成頻道：{snapshot['channels_total']}（每小時 {snapshot['channels_per_hour']:.1f}）"]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name}: {value}")
+        for name, stats in snapshot["histograms"].items():
+            lines.append(f"{name}: n={stats['count']} p50={stats['p50_ms']:.0f}ms "
+                         f"p95={stats['p95_ms']:.0f}ms p99={stats['p99_ms']:.0f}ms")
+        return "\n".join(lines)
+    
+    def format_brief(self):
+        """單行摘要（GUI狀態列使用）"""
+        cycle = self.histograms.get("cycle")
+        cycle_text = f"{cycle.percentile(50) / 1000:.1f}秒" if cycle and cycle.count else "—"
+        return f"循環中位數: {cycle_text} | 每小時頻道: {self.channels_per_hour():.1f}"
+    
+    def dump(self, path):
+        """輸出JSON統計檔"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+class MetricsServer:
+    """本機Prometheus文字格式指標端點
+    
+    在獨立的HTTP執行緒中回應 /metrics，只讀取統計快照，不會阻塞監控執行緒。
+    """
+    
+    PREFIX = "artale"
+    
+    def __init__(self, game_monitor, host="127.0.0.1", port=9464):
+        self.game_monitor = game_monitor
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+    
+    def start(self):
+        """啟動HTTP服務，埠號被占用等錯誤時回傳False"""
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics":
+                    body = server.render().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                    status = 200
+                elif self.path == "/healthz":
+                    body, content_type, status = b"ok\n", "text/plain", 200
+                else:
+                    body, content_type, status = b"not found\n", "text/plain", 404
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass  # 不在主控台輸出每次抓取
+        
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.httpd.daemon_threads = True
+        except OSError as e:
+            print(f"❌ 指標端點啟動失敗 ({self.host}:{self.port}): {e}")
+            self.httpd = None
+            return False
+        
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"✅ 指標端點已啟動: http://{self.host}:{self.port}/metrics")
+        return True
+    
+    def stop(self):
+        """停止HTTP服務"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+    
+    def render(self):
+        """產生Prometheus文字格式內容"""
+        monitor = self.game_monitor
+        snapshot = monitor.metrics.snapshot()
+        counters = snapshot["counters"]
+        p = self.PREFIX
+        lines = []
+        
+        def metric(name, kind, help_text, value):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.append(f"{p}_{name} {value}")
+        
+        metric("cycles_total", "counter", "Completed channel cycles (stage F back to A).", snapshot["channels_total"])
+        metric("boss_detections_total", "counter", "Boss detections.", counters.get("boss_detections", 0))
+        metric("telegram_send_failures_total", "counter", "Failed Telegram API sends.", counters.get("telegram_send_failures", 0))
+        metric("channels_per_hour", "gauge", "Channels scanned per hour over the last hour.", snapshot["channels_per_hour"])
+        metric("current_stage_seconds", "gauge", "Seconds spent in the current stage.",
+               round(time.time() - monitor.current_stage_start_time, 3))
+        metric("running", "gauge", "1 while monitoring is running.", int(bool(monitor.is_running)))
+        metric("paused", "gauge", "1 while monitoring is paused.", int(bool(monitor.is_paused)))
+        metric("uptime_seconds", "gauge", "Seconds since metrics were last reset.", snapshot["uptime_seconds"])
+        
+        # 耗時直方圖：stage_*/detect_* 每次呼叫、dwell_* 階段停留、cycle 完整循環、capture 擷取
+        lines.append(f"# HELP {p}_duration_seconds Durations of stages, detections, captures and cycles.")
+        lines.append(f"# TYPE {p}_duration_seconds histogram")
+        for name, stats in snapshot["histograms"].items():
+            cumulative = 0
+            for bound, count in zip(LatencyHistogram.BOUNDS_MS, stats["buckets"].values()):
+                cumulative += count
+                lines.append(f'{p}_duration_seconds_bucket{{name="{name}",le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{p}_duration_seconds_bucket{{name="{name}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{p}_duration_seconds_sum{{name="{name}"}} {stats["sum_ms"] / 1000:.6f}')
+            lines.append(f'{p}_duration_seconds_count{{name="{name}"}} {stats["count"]}')
+        
+        return "\n".join(lines) + "\n"
+
+def timed(name):
+    """將方法的執行時間記錄到 self.metrics 的裝飾器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                self.metrics.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def detection_worker_main(conn, base_dir, ring_name=None, ring_max_age=0.2):
+    """偵測工作程序進入點：自行擷取畫面並執行檢測，只回傳判定結果
+    
+    提供共用截圖緩衝區名稱時改讀取主程序擷取的最新畫格。每次回應附上這次呼叫新增的
+    效能統計與雜湊預篩次數，由主程序併入；最外層的 @timed 耗時由主程序自己記錄，這裡不重複記錄。
+    """
+    engine = MonitorEngine(base_dir)
+    ring = FrameRing(name=ring_name) if ring_name else None
+    if ring:
+        engine.capture.attach_ring(ring, ring_max_age)
+    
+    try:
+        while True:
+            message = conn.recv()
+            kind = message[0]
+            if kind == "stop":
+                break
+            
+            if kind == "sync":
+                _, config, stage_screenshots, crash_screenshots = message
+                engine.config.update(config)
+                engine.stage_screenshots = stage_screenshots
+                engine.crash_screenshots = crash_screenshots
+                engine.prepare_reference_cache()
+                conn.send(("ok", None))
+                continue
+            
+            _, method, args = message
+            func = getattr(type(engine), method)
+            func = getattr(func, "__wrapped__", func)
+            # 工作程序執行的檢測只讀取王怪檢測區域
+            engine.capture.begin_tick([engine.config["detection_area"]])
+            try:
+                reply = ["ok", func(engine, *args)]
+            except Exception as e:
+                reply = ["error", str(e)]
+            finally:
+                engine.capture.end_tick()
+            
+            prefilter_delta = dict(engine.prefilter_stats)
+            engine.prefilter_stats = dict.fromkeys(prefilter_delta, 0)
+            conn.send((*reply, (engine.metrics.take_delta(), prefilter_delta)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if ring:
+            engine.capture.detach_ring()
+            ring.close()
+
+class DetectionWorker:
+    """偵測工作程序的控制端
+    
+    畫面擷取與 detect_boss/detect_stage_match/classify_frame 在獨立程序執行，
+    避免NumPy/OpenCV運算與Tk、Telegram等執行緒搶GIL；程序間只傳遞小型的判定結果。
+    """
+    
+    def __init__(self, engine, timeout=5.0):
+        self.engine = engine
+        self.timeout = timeout
+        self.process = None
+        self.conn = None
+        self.needs_sync = False
+        self.synced_config = None  # 上次送到工作程序的設定
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """啟動工作程序"""
+        self.conn, child_conn = multiprocessing.Pipe()
+        capture = self.engine.capture
+        ring_name = capture.ring.name if capture.ring is not None else None
+        self.process = multiprocessing.Process(
+            target=detection_worker_main,
+            args=(child_conn, self.engine.base_dir, ring_name, capture.ring_max_age),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.sync()
+    
+    def sync(self):
+        """將目前設定與參考截圖送到工作程序"""
+        with self._lock:
+            config = copy.deepcopy(self.engine.config)
+            self.conn.send(("sync", config,
+                            dict(self.engine.stage_screenshots), dict(self.engine.crash_screenshots)))
+            self._receive(timeout=30)  # 工作程序第一次同步需要匯入模組與計算特徵
+            self.synced_config = config
+            self.needs_sync = False
+    
+    def call(self, method, *args):
+        """在工作程序執行引擎方法並回傳結果
+        
+        設定與上次同步的內容不同時（任何寫入或整個替換）先重新同步。
+        """
+        if self.needs_sync or self.engine.config != self.synced_config:
+            self.sync()
+        with self._lock:
+            self.conn.send(("call", method, args))
+            return self._receive(self.timeout)
+    
+    def _receive(self, timeout):
+        if not self.conn.poll(timeout):
+            raise TimeoutError("偵測工作程序沒有回應")
+        status, value, *stats = self.conn.recv()
+        if stats:
+            metrics_delta, prefilter_delta = stats[0]
+            self.engine.metrics.merge_delta(metrics_delta)
+            for key, amount in prefilter_delta.items():
+                self.engine.prefilter_stats[key] = self.engine.prefilter_stats.get(key, 0) + amount
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+    
+    def stop(self):
+        """停止工作程序"""
+        try:
+            if self.conn:
+                self.conn.send(("stop",))
+        except Exception:
+            pass
+        if self.process:
+            self.process.join(2)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.conn:
+            self.conn.close()
+        self.process = self.conn = None
+
+class LatestStateMailbox:
+    """跨執行緒的最新狀態信箱：同一個鍵只保留最後一次送出的值，由介面執行緒定時取出"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+    
+    def post(self, key, value):
+        """送出狀態（覆蓋尚未取出的舊值）"""
+        with self._lock:
+            self._pending[key] = value
+    
+    def drain(self):
+        """取出並清空所有待處理的狀態"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+SCREENSHOT_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+def encode_screenshot(bgra, fmt="jpeg", quality=80, max_size=1600):
+    """將BGRA截圖縮小到最長邊不超過 max_size 並在記憶體中壓縮，回傳 (BytesIO, 檔名, MIME類型)"""
+    extension, mime, quality_flag = SCREENSHOT_FORMATS.get(fmt, SCREENSHOT_FORMATS["jpeg"])
+    image = cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
+    
+    height, width = image.shape[:2]
+    scale = max_size / max(height, width) if max_size else 1
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    
+    ok, encoded = cv2.imencode(extension, image, [quality_flag, int(quality)])
+    if not ok:
+        raise RuntimeError(f"截圖壓縮失敗 ({fmt})")
+    return io.BytesIO(encoded.tobytes()), f"screenshot{extension}", mime
+
+class TelegramRateLimitError(Exception):
+    """Telegram回應429，retry_after 為伺服器要求等待的秒數"""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"Telegram限流，需等待 {retry_after} 秒")
+        self.retry_after = retry_after
+
+class ChatRateLimiter:
+    """每個聊天室一個權杖桶：平均每秒 rate 則訊息、最多連發 burst 則；收到429時暫停該聊天室"""
+    
+    def __init__(self, rate=1.0, burst=3):
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1, int(burst))
+        self._buckets = {}  # 聊天室: [權杖數, 上次補充時間, 暫停到]
+        self._lock = threading.Lock()
+    
+    def try_acquire(self, chat_id, reserve=0):
+        """嘗試取得一個權杖（保留 reserve 個給高優先順序訊息），成功回傳0，否則回傳需要等待的秒數"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(str(chat_id), [float(self.burst), now, 0.0])
+            if now < bucket[2]:
+                return bucket[2] - now
+            
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            needed = 1 + min(reserve, self.burst - 1)
+            if bucket[0] >= needed:
+                bucket[0] -= 1
+                return 0
+            return (needed - bucket[0]) / self.rate
+    
+    def acquire(self, chat_id, timeout):
+        """等待取得權杖，最多等待 timeout 秒，回傳是否取得"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(chat_id)
+            if not wait:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+    
+    def block(self, chat_id, seconds):
+        """伺服器回應429時暫停該聊天室並清空權杖"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(str(chat_id), [0.0, now, 0.0])
+            bucket[0], bucket[1] = 0.0, now + seconds
+            bucket[2] = max(bucket[2], now + seconds)
+
+class TelegramApiClient:
+    """Telegram Bot API 用戶端
+    
+    所有呼叫共用一個 requests.Session 與其連線池（keep-alive），省去每次請求的TCP/TLS交握。
+    urllib3 的連線池可跨執行緒共用；逾時與重試次數依端點設定。
+    """
+    
+    DEFAULT_API_URL = "https://api.telegram.org"
+    
+    # 端點: (逾時秒數, 最多嘗試次數, 讀取逾時是否重試)
+    # 發送類端點讀取逾時時伺服器可能已處理，不重試以免重複發送；連線失敗與5xx一律重試
+    ENDPOINT_POLICIES = {
+        "getUpdates": (5, 1, False),
+        "sendMessage": (10, 3, False),
+        "editMessageText": (10, 2, False),
+        "answerCallbackQuery": (5, 2, True),
+        "setMyCommands": (10, 3, True),
+        "sendPhoto": (30, 2, False),
+    }
+    DEFAULT_POLICY = (10, 2, False)
+    RETRY_STATUS = (500, 502, 503, 504)
+    RATE_LIMITED_METHODS = ("sendMessage", "sendPhoto", "editMessageText")
+    MAX_RATE_WAIT = 10  # 直接呼叫時最多等待權杖或429的秒數，超過就交回呼叫端
+    
+    def __init__(self, token, api_url=None, metrics=None, pool_size=4, backoff=0.5, limiter=None):
+        self.token = token
+        self.api_url = (api_url or self.DEFAULT_API_URL).rstrip("/")
+        self.metrics = metrics
+        self.limiter = limiter
+        self.pool_size = pool_size
+        self.backoff = backoff
+        self._session = None
+        self._lock = threading.Lock()
+    
+    def _get_session(self):
+        """取得共用的Session（第一次使用時建立，避免啟動時匯入requests）"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+    
+    @staticmethod
+    def get_retry_after(response):
+        """取得429回應要求等待的秒數"""
+        try:
+            return float(response.json().get("parameters", {}).get("retry_after", 1))
+        except ValueError:
+            return float(response.headers.get("Retry-After", 1))
+    
+    def call(self, method, data=None, params=None, files=None, timeout=None, rate_limited=True):
+        """呼叫Bot API並回傳回應，所有嘗試都失敗時拋出最後一次的例外
+        
+        發送類端點先向聊天室的權杖桶取得權杖；rate_limited=False 表示呼叫端（通知佇列）已自行取得，
+        此時429會直接回傳，由呼叫端重新排程而不在此等待。
+        """
+        default_timeout, attempts, retry_read_timeout = self.ENDPOINT_POLICIES.get(method, self.DEFAULT_POLICY)
+        url = f"{self.api_url}/bot{self.token}/{method}"
+        session = self._get_session()
+        chat_id = (data or {}).get("chat_id") if method in self.RATE_LIMITED_METHODS else None
+        if rate_limited and self.limiter and chat_id is not None:
+            if not self.limiter.acquire(chat_id, self.MAX_RATE_WAIT):
+                print(f"⚠️ Telegram聊天室 {chat_id} 發送過於頻繁，仍嘗試發送")
+        
+        delay = 0
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(delay or self.backoff * (2 ** (attempt - 1)))
+                delay = 0
+                if files:
+                    for value in files.values():
+                        handle = value[1] if isinstance(value, tuple) else value
+                        if hasattr(handle, "seek"):
+                            handle.seek(0)
+            
+            start = time.perf_counter()
+            try:
+                response = session.post(url, data=data, params=params, files=files,
+                                        timeout=timeout or default_timeout)
+            except requests.exceptions.ConnectionError:
+                if attempt + 1 >= attempts:
+                    raise
+                continue
+            except requests.exceptions.Timeout:
+                if not retry_read_timeout or attempt + 1 >= attempts:
+                    raise
+                continue
+            finally:
+                if self.metrics is not None:
+                    self.metrics.record("telegram_api", time.perf_counter() - start)
+            
+            if response.status_code == 429:
+                retry_after = self.get_retry_after(response)
+                if self.metrics is not None:
+                    self.metrics.increment("telegram_rate_limited")
+                if self.limiter and chat_id is not None:
+                    self.limiter.block(chat_id, retry_after)
+                if not rate_limited or retry_after > self.MAX_RATE_WAIT or attempt + 1 >= attempts:
+                    return response
+                delay = retry_after
+                continue
+            
+            if response.status_code not in self.RETRY_STATUS or attempt + 1 >= attempts:
+                return response
+        return response
+    
+    def send_message(self, chat_id, text, reply_markup=None, rate_limited=True):
+        """發送文字訊息，成功回傳True；仍被限流時拋出 TelegramRateLimitError"""
+        data = {"chat_id": chat_id, "text": text}
+        if reply_markup is not None:
+            data["reply_markup"] = json.dumps(reply_markup)
+        response = self.call("sendMessage", data=data, rate_limited=rate_limited)
+        if response.status_code == 429:
+            raise TelegramRateLimitError(self.get_retry_after(response))
+        return response.status_code == 200
+    
+    def close(self):
+        """關閉連線池"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+class NotificationReceipt:
+    """通知的送達回條：狀態為 queued / sent / failed / dropped"""
+    
+    def __init__(self, notification_id, priority, text):
+        self.id = notification_id
+        self.priority = priority
+        self.text = text
+        self.status = "queued"
+        self.attempts = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+    
+    def finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self._done.set()
+    
+    def wait(self, timeout=None):
+        """等待通知送達或放棄，回傳是否發送成功"""
+        self._done.wait(timeout)
+        return self.status == "sent"
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "priority": self.priority,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "latency_ms": round((self.finished_at - self.created_at) * 1000, 1) if self.finished_at else None
+        }
+
+class NotificationDispatcher:
+    """背景通知佇列：監控執行緒只負責排入，由工作執行緒依優先順序發送
+    
+    數字越小優先順序越高；佇列已滿時捨棄優先順序最低的通知。每個聊天室以權杖桶限流，
+    低優先順序的通知保留一個權杖給警報，等待期間累積的低優先順序通知合併為一則摘要。
+    發送失敗以指數退避重試，429則依伺服器的 retry_after 延後（不計入嘗試次數）；
+    等待中的通知不會佔用工作執行緒。
+    """
+    
+    PRIORITY_BOSS = 0
+    PRIORITY_CRASH = 1
+    PRIORITY_TIMEOUT = 2
+    PRIORITY_INFO = 3
+    DIGEST_PRIORITY = PRIORITY_TIMEOUT  # 此優先順序（含）以下的通知可合併為摘要
+    MAX_MESSAGE_LENGTH = 4096
+    DIGEST_SEPARATOR = "\n\n────────\n\n"
+    
+    def __init__(self, send_func, workers=2, max_size=100, max_attempts=4, backoff=2.0, metrics=None, limiter=None):
+        self.send_func = send_func  # send_func(chat_id, text) -> bool，被限流時拋出 TelegramRateLimitError
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.metrics = metrics
+        self.limiter = limiter
+        self.recent_receipts = deque(maxlen=50)
+        self._ready = []    # (優先順序, 序號, (聊天室, [回條...]))
+        self._delayed = []  # (可發送時間, 序號, (聊天室, [回條...]))
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._running = True
+        self._threads = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+    
+    def submit(self, chat_id, text, priority=PRIORITY_INFO):
+        """排入通知並立即回傳回條"""
+        with self._cond:
+            self._counter += 1
+            receipt = NotificationReceipt(self._counter, priority, text)
+            self.recent_receipts.append(receipt)
+            
+            if len(self._ready) + len(self._delayed) >= self.max_size:
+                victim = self._pop_lowest_priority(priority)
+                if victim is None:
+                    self._finish([receipt], "dropped", "通知佇列已滿")
+                    return receipt
+                self._finish(victim[1], "dropped", "通知佇列已滿，由較高優先順序的通知取代")
+            
+            heapq.heappush(self._ready, (priority, self._counter, (chat_id, [receipt])))
+            self._cond.notify()
+        return receipt
+    
+    def _pop_lowest_priority(self, priority):
+        """移除優先順序比 priority 低的最後一個待發送通知，沒有時回傳None"""
+        pending = self._ready + self._delayed
+        if not pending:
+            return None
+        worst = max(pending, key=lambda item: (item[2][1][0].priority, item[1]))
+        if worst[2][1][0].priority <= priority:
+            return None
+        self._remove_pending(worst)
+        return worst[2]
+    
+    def _remove_pending(self, item):
+        for queue in (self._ready, self._delayed):
+            if item in queue:
+                queue.remove(item)
+                heapq.heapify(queue)
+    
+    def _finish(self, receipts, status, error=None):
+        for receipt in receipts:
+            receipt.finish(status, error)
+            if self.metrics is not None:
+                self.metrics.increment(f"notifications_{status}")
+                if status == "sent":
+                    self.metrics.record("notification_delivery", receipt.finished_at - receipt.created_at)
+    
+    def _defer(self, batch, delay):
+        """延後 delay 秒再發送"""
+        with self._cond:
+            heapq.heappush(self._delayed, (time.time() + delay, batch[1][0].id, batch))
+            self._cond.notify()
+    
+    def _next_notification(self):
+        """取出下一個可發送的通知（等待中的通知到期時移回待發送佇列）"""
+        with self._cond:
+            while True:
+                now = time.time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, counter, batch = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (batch[1][0].priority, counter, batch))
+                if self._ready:
+                    return heapq.heappop(self._ready)[2]
+                if not self._running and not self._delayed:
+                    return None
+                self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+    
+    def _collect_digest(self, chat_id, receipts):
+        """把同一聊天室其他待發送的低優先順序通知併入，回傳合併後的回條清單"""
+        length = sum(len(receipt.text) for receipt in receipts) + 100
+        with self._cond:
+            pending = sorted((item for item in self._ready + self._delayed
+                              if item[2][0] == chat_id and item[2][1][0].priority >= self.DIGEST_PRIORITY),
+                             key=lambda item: item[1])
+            for item in pending:
+                extra = sum(len(receipt.text) + len(self.DIGEST_SEPARATOR) for receipt in item[2][1])
+                if length + extra > self.MAX_MESSAGE_LENGTH:
+                    break
+                self._remove_pending(item)
+                receipts = receipts + item[2][1]
+                length += extra
+        return sorted(receipts, key=lambda receipt: receipt.id)
+    
+    def format_digest(self, receipts):
+        """合併多則通知為一則摘要訊息"""
+        if len(receipts) == 1:
+            return receipts[0].text
+        return f"📦 {len(receipts)} 則通知彙整" + self.DIGEST_SEPARATOR + self.DIGEST_SEPARATOR.join(
+            receipt.text for receipt in receipts)
+    
+    def _worker_loop(self):
+        while True:
+            batch = self._next_notification()
+            if batch is None:
+                return
+            chat_id, receipts = batch
+            low_priority = receipts[0].priority >= self.DIGEST_PRIORITY
+            
+            # 限流：低優先順序保留一個權杖給警報；停止時每則通知只做最後一次嘗試，不再等待
+            if self.limiter and self._running:
+                wait = self.limiter.try_acquire(chat_id, reserve=1 if low_priority else 0)
+                if wait:
+                    self._defer(batch, wait)
+                    continue
+            
+            if low_priority:
+                receipts = self._collect_digest(chat_id, receipts)
+                batch = (chat_id, receipts)
+                if len(receipts) > 1 and self.metrics is not None:
+                    self.metrics.increment("notifications_coalesced", len(receipts) - 1)
+            
+            for receipt in receipts:
+                receipt.attempts += 1
+            try:
+                success = self.send_func(chat_id, self.format_digest(receipts))
+                error = None if success else "發送失敗"
+            except TelegramRateLimitError as e:
+                if self._running:
+                    for receipt in receipts:
+                        receipt.attempts -= 1
+                    self._defer(batch, e.retry_after)
+                    continue
+                success, error = False, str(e)
+            except Exception as e:
+                success, error = False, str(e)
+            
+            if success:
+                self._finish(receipts, "sent")
+            elif receipts[0].attempts >= self.max_attempts or not self._running:
+                self._finish(receipts, "failed", error)
+                print(f"❌ 通知發送失敗（已嘗試 {receipts[0].attempts} 次）: {error}")
+            else:
+                self._defer(batch, self.backoff * (2 ** (receipts[0].attempts - 1)))
+    
+    def pending_count(self):
+        with self._cond:
+            return sum(len(item[2][1]) for item in self._ready + self._delayed)
+    
+    def stop(self, timeout=5):
+        """停止接收重試並等待已排入的通知發送完畢（最多 timeout 秒）"""
+        with self._cond:
+            self._running = False
+            # 停止後不再等待退避時間，剩下的通知各做最後一次嘗試
+            for _, counter, batch in self._delayed:
+                heapq.heappush(self._ready, (batch[1][0].priority, counter, batch))
+            self._delayed = []
+            self._cond.notify_all()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.time()))
+
+class TelegramSenderMixin:
+    """共用的Telegram發送功能：依目前的Bot Token取得連線池化的API用戶端（需要 config 與 metrics）"""
+    
+    telegram_api = None
+    notifier = None
+    rate_limiter = None
+    
+    def get_rate_limiter(self):
+        """取得各聊天室共用的發送限流器（直接發送與通知佇列共用同一組權杖桶）"""
+        if self.rate_limiter is None:
+            self.rate_limiter = ChatRateLimiter(
+                rate=self.config.get("telegram_rate_per_chat", 1.0),
+                burst=self.config.get("telegram_rate_burst", 3)
+            )
+        return self.rate_limiter
+    
+    def get_notifier(self):
+        """取得背景通知佇列（第一次使用時啟動工作執行緒）"""
+        if self.notifier is None:
+            self.notifier = NotificationDispatcher(
+                self.deliver_telegram_message,
+                workers=self.config.get("notification_workers", 2),
+                max_size=self.config.get("notification_queue_size", 100),
+                max_attempts=self.config.get("notification_max_attempts", 4),
+                metrics=self.metrics,
+                limiter=self.get_rate_limiter()
+            )
+        return self.notifier
+    
+    def notify(self, message, priority=NotificationDispatcher.PRIORITY_INFO, chat_id=None):
+        """將Telegram通知排入背景佇列後立即返回，回傳送達回條"""
+        return self.get_notifier().submit(chat_id or self.config.get("telegram_chat_id"), message, priority)
+    
+    def stop_notifier(self):
+        """送出佇列中剩餘的通知並停止工作執行緒"""
+        notifier, self.notifier = self.notifier, None
+        if notifier:
+            notifier.stop()
+    
+    def get_telegram_api(self):
+        """取得Telegram API用戶端，Token或API位址變更時重建"""
+        token = self.config.get("telegram_bot_token", "")
+        api_url = self.config.get("telegram_api_url") or TelegramApiClient.DEFAULT_API_URL
+        api = self.telegram_api
+        if api is None or api.token != token or api.api_url != api_url.rstrip("/"):
+            if api is not None:
+                api.close()
+            api = self.telegram_api = TelegramApiClient(token, api_url, metrics=self.metrics,
+                                                        limiter=self.get_rate_limiter())
+        return api
+    
+    def deliver_telegram_message(self, chat_id, message):
+        """通知佇列使用的發送：權杖已由佇列取得，429時拋出 TelegramRateLimitError 讓佇列延後重送"""
+        success = self.get_telegram_api().send_message(chat_id, message, rate_limited=False)
+        if not success:
+            self.metrics.increment("telegram_send_failures")
+        return success
+    
+    def send_telegram_message(self, chat_id, message):
+        """發送Telegram訊息"""
+        try:
+            success = self.get_telegram_api().send_message(chat_id or self.config.get("telegram_chat_id"), message)
+        except Exception as e:
+            print(f"Telegram發送失敗: {e}")
+            success = False
+        if not success:
+            self.metrics.increment("telegram_send_failures")
+        return success
 
 class TelegramBot:
     """Telegram Bot指令處理器"""
@@ -35,6 +1512,8 @@ class TelegramBot:
         self.update_offset = 0
         self.is_listening = False
         self.listener_thread = None
+        self.stop_event = threading.Event()
+        self.media_executor = None  # 截圖壓縮與上傳在此執行，不阻塞指令輪詢
         
         # 指令處理映射
         self.commands = {
@@ -43,7 +1522,8 @@ class TelegramBot:
             '/pause': self.handle_pause,
             '/resume': self.handle_resume,
             '/stop': self.handle_stop,
-            '/screenshot': self.handle_screenshot
+            '/screenshot': self.handle_screenshot,
+            '/metrics': self.handle_metrics
         }
     
     def start_listener(self):
@@ -52,10 +1532,17 @@ class TelegramBot:
             print("❌ Telegram Bot Token或Chat ID未設定，跳過Bot功能")
             return False
         
+        # 指令選單與歡迎訊息都在監聽執行緒中發送，不阻塞視窗顯示
         self.is_listening = True
+        self.stop_event.clear()
         self.listener_thread = threading.Thread(target=self.listen_for_commands, daemon=True)
         self.listener_thread.start()
         
+        print("✅ Telegram Bot監聽已啟動")
+        return True
+    
+    def bootstrap(self):
+        """監聽開始前的連線初始化：設定指令選單並發送歡迎訊息"""
         # 設定Bot指令選單（固定在聊天欄）
         self.set_bot_commands()
         
@@ -63,45 +1550,79 @@ class TelegramBot:
         if self.game_monitor.config.get("send_welcome_message", True):
             self.send_welcome_message()
         
-        print("✅ Telegram Bot監聽已啟動")
-        return True
+        startup_report.mark("telegram_ready")
     
     def stop_listener(self):
-        """停止Telegram指令監聽"""
+        """停止Telegram指令監聽
+        
+        Telegram收到新的getUpdates時會立即以409結束進行中的長輪詢，因此送出一次不等待的
+        getUpdates來取消；停止後不再處理任何更新（也不推進offset），下一個監聽者會重新收到。
+        """
         self.is_listening = False
-        if self.listener_thread:
+        self.stop_event.set()
+        if self.media_executor:
+            self.media_executor.shutdown(wait=False)
+            self.media_executor = None
+        if self.listener_thread and self.listener_thread.is_alive():
+            try:
+                self.game_monitor.get_telegram_api().call(
+                    "getUpdates", data={"offset": self.update_offset + 1, "timeout": 0, "limit": 1})
+            except Exception:
+                pass
             self.listener_thread.join(timeout=1)
     
     def listen_for_commands(self):
-        """監聽Telegram指令（輪詢方式）"""
+        """監聽Telegram指令（長輪詢：有新訊息時伺服器立即回應）"""
+        try:
+            self.bootstrap()
+        except Exception as e:
+            print(f"❌ Telegram初始化失敗: {e}")
+        
+        failures = 0
         while self.is_listening:
-            try:
-                # 每3秒檢查一次新訊息
-                self.check_for_updates()
-                time.sleep(3)
-            except Exception as e:
-                print(f"❌ Telegram監聽錯誤: {e}")
-                time.sleep(5)  # 錯誤時等待長一點
+            retry_after = self.check_for_updates()
+            if retry_after is None:
+                failures = 0
+                continue
+            
+            # 發生錯誤時指數退避（1、2、4...最多60秒），停止監聽時立即結束等待
+            failures += 1
+            delay = max(retry_after, min(60, 2 ** (failures - 1)))
+            if self.stop_event.wait(delay):
+                break
     
     def check_for_updates(self):
-        """檢查Telegram更新"""
+        """以長輪詢取得Telegram更新並處理，成功回傳None，失敗回傳建議的最短等待秒數"""
+        poll_timeout = int(self.game_monitor.config.get("telegram_poll_timeout", 25))
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/getUpdates"
             params = {
                 "offset": self.update_offset + 1,
-                "timeout": 2,
-                "allowed_updates": ["message", "callback_query"]
+                "timeout": poll_timeout,
+                "allowed_updates": json.dumps(["message", "callback_query"])
             }
             
-            response = requests.get(url, params=params, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data["ok"] and data["result"]:
-                    for update in data["result"]:
-                        self.process_update(update)
-                        self.update_offset = update["update_id"]
+            # 用戶端逾時必須比伺服器端的長輪詢時間長
+            response = self.game_monitor.get_telegram_api().call("getUpdates", data=params, timeout=poll_timeout + 10)
+            if response.status_code != 200:
+                if self.is_listening:
+                    print(f"❌ 檢查Telegram更新失敗: HTTP {response.status_code}")
+                try:
+                    return response.json().get("parameters", {}).get("retry_after", 0)
+                except ValueError:
+                    return 0
+            
+            data = response.json()
+            if data["ok"] and data["result"]:
+                for update in data["result"]:
+                    if not self.is_listening:
+                        break
+                    self.process_update(update)
+                    self.update_offset = update["update_id"]
+            return None
         except Exception as e:
-            print(f"❌ 檢查Telegram更新失敗: {e}")
+            if self.is_listening:
+                print(f"❌ 檢查Telegram更新失敗: {e}")
+            return 0
     
     def process_update(self, update):
         """處理Telegram更新"""
@@ -152,21 +1673,21 @@ class TelegramBot:
     def set_bot_commands(self):
         """設定Bot指令清單（固定在聊天欄）"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/setMyCommands"
             commands = [
                 {"command": "menu", "description": "📋 顯示操作選單"},
                 {"command": "status", "description": "📊 查看程式狀態"},
                 {"command": "pause", "description": "⏸️ 暫停程式"},
                 {"command": "resume", "description": "▶️ 恢復運行"},
                 {"command": "stop", "description": "⏹️ 停止程式"},
-                {"command": "screenshot", "description": "📸 螢幕截圖"}
+                {"command": "screenshot", "description": "📸 螢幕截圖"},
+                {"command": "metrics", "description": "⏱️ 效能統計"}
             ]
             
             data = {
                 'commands': json.dumps(commands)
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self.game_monitor.get_telegram_api().call("setMyCommands", data=data)
             if response.status_code == 200:
                 print("✅ Bot指令選單設定成功")
                 return True
@@ -251,7 +1772,8 @@ class TelegramBot:
 ⏸️ /pause - 暫停程式
 ▶️ /resume - 恢復程式運行  
 ⏹️ /stop - 停止程式
-📸 /screenshot - 發送目前畫面截圖
+📸 /screenshot - 發送目前畫面截圖（加 detection / channel 只截取該區域）
+⏱️ /metrics - 查看各階段耗時與每小時頻道數
 📋 /menu - 顯示此指令清單
 
 💡 三種操作方式：
@@ -291,6 +1813,7 @@ class TelegramBot:
 {status_icon}
 目前階段：{current_stage}
 持續時間：{duration}
+{self.game_monitor.get_prefilter_summary()}
 時間：{self.get_timestamp()}"""
             
             return status_text
@@ -298,6 +1821,16 @@ class TelegramBot:
         except Exception as e:
             return f"❌ 取得狀態失敗: {str(e)}\n時間：{self.get_timestamp()}"
     
+    def handle_metrics(self, message):
+        """處理 /metrics 指令"""
+        try:
+            return f"""⏱️ 效能統計
+
+{self.game_monitor.metrics.format_summary()}
+時間：{self.get_timestamp()}"""
+        except Exception as e:
+            return f"❌ 取得效能統計失敗: {str(e)}\n時間：{self.get_timestamp()}"
+    
     def handle_pause(self, message):
         """處理 /pause 指令"""
         try:
@@ -308,8 +1841,7 @@ class TelegramBot:
                 return f"⚠️ 程式已經是暫停狀態\n時間：{self.get_timestamp()}"
             
             # 執行暫停
-            self.game_monitor.is_paused = True
-            self.game_monitor.pause_continue_btn.config(text="繼續")
+            self.game_monitor.pause_monitoring()
             
             return f"✅ 程式已暫停\n時間：{self.get_timestamp()}"
             
@@ -326,8 +1858,7 @@ class TelegramBot:
                 return f"⚠️ 程式已經在運行中\n時間：{self.get_timestamp()}"
             
             # 執行恢復
-            self.game_monitor.is_paused = False
-            self.game_monitor.pause_continue_btn.config(text="暫停")
+            self.game_monitor.resume_monitoring()
             
             return f"✅ 程式已恢復運行\n時間：{self.get_timestamp()}"
             
@@ -341,10 +1872,7 @@ class TelegramBot:
                 return f"⚠️ 程式已經是停止狀態\n時間：{self.get_timestamp()}"
             
             # 執行停止
-            self.game_monitor.is_running = False
-            self.game_monitor.is_paused = False
-            self.game_monitor.start_stop_btn.config(text="開始")
-            self.game_monitor.pause_continue_btn.config(text="暫停", state="disabled")
+            self.game_monitor.stop_monitoring()
             
             return f"✅ 程式已停止\n時間：{self.get_timestamp()}"
             
@@ -352,31 +1880,43 @@ class TelegramBot:
             return f"❌ 停止失敗: {str(e)}\n時間：{self.get_timestamp()}"
     
     def handle_screenshot(self, message):
-        """處理 /screenshot 指令"""
+        """處理 /screenshot 指令（可加 detection 或 channel 只截取對應區域）
+        
+        擷取、壓縮與上傳交給背景執行緒，指令輪詢不必等待上傳完成。
+        """
+        args = (message or {}).get("text", "").split()[1:]
+        crop = args[0].lower() if args else self.game_monitor.config.get("screenshot_crop", "")
+        
+        if self.media_executor is None:
+            self.media_executor = ThreadPoolExecutor(max_workers=1)
+        self.media_executor.submit(self.send_screenshot, crop)
+        return None  # 圖片由背景執行緒發送，不需要額外文字回應
+    
+    def send_screenshot(self, crop=""):
+        """擷取畫面並在記憶體中壓縮後發送，失敗時改發送文字說明"""
+        config = self.game_monitor.config
         try:
-            # 擷取全螢幕截圖
-            screenshot = pyautogui.screenshot()
-            
-            # 儲存為臨時檔案
-            temp_file = f"tmp_rovodev_screenshot_{int(time.time())}.png"
-            screenshot.save(temp_file)
+            areas = {"detection": config.get("detection_area"), "channel": config.get("channel_area")}
+            area = areas.get(crop)
+            if crop and crop in areas and not area:
+                self.send_message(f"❌ 尚未設定{'王怪檢測區域' if crop == 'detection' else '頻道檢測區域'}\n時間：{self.get_timestamp()}")
+                return False
             
-            # 發送截圖
-            success = self.send_photo(temp_file, f"📸 螢幕截圖\n時間：{self.get_timestamp()}")
+            # 擷取畫面（啟用共用截圖緩衝區時直接取最新畫格）
+            bgra = self.game_monitor.capture.grab_bgra(area)
+            photo, filename, mime = encode_screenshot(
+                bgra,
+                fmt=config.get("screenshot_format", "jpeg"),
+                quality=config.get("screenshot_quality", 80),
+                max_size=config.get("screenshot_max_size", 1600)
+            )
             
-            # 刪除臨時檔案
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-            
-            if success:
-                return None  # 圖片已發送，不需要額外文字回應
-            else:
-                return f"❌ 截圖發送失敗\n時間：{self.get_timestamp()}"
-                
+            if self.send_photo(photo, f"📸 螢幕截圖\n時間：{self.get_timestamp()}", filename=filename, mime=mime):
+                return True
+            self.send_message(f"❌ 截圖發送失敗\n時間：{self.get_timestamp()}")
         except Exception as e:
-            return f"❌ 截圖失敗: {str(e)}\n時間：{self.get_timestamp()}"
+            self.send_message(f"❌ 截圖失敗: {str(e)}\n時間：{self.get_timestamp()}")
+        return False
     
     def handle_invalid_command(self):
         """處理無效指令"""
@@ -390,7 +1930,7 @@ class TelegramBot:
     def handle_screenshot_callback(self):
         """處理截圖按鈕"""
         self.handle_screenshot(None)
-        return f"📸 螢幕截圖已發送\n時間：{self.get_timestamp()}"
+        return f"📸 螢幕截圖發送中\n時間：{self.get_timestamp()}"
     
     def handle_pause_callback(self):
         """處理暫停按鈕"""
@@ -437,24 +1977,19 @@ class TelegramBot:
     def send_message_with_keyboard(self, text, keyboard):
         """發送帶按鈕的Telegram訊息"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            data = {
-                'chat_id': self.chat_id,
-                'text': text,
-                'reply_markup': json.dumps(keyboard)
-            }
-            
-            response = requests.post(url, data=data, timeout=10)
-            return response.status_code == 200
+            success = self.game_monitor.get_telegram_api().send_message(self.chat_id, text, reply_markup=keyboard)
+            if not success:
+                self.game_monitor.metrics.increment("telegram_send_failures")
+            return success
             
         except Exception as e:
             print(f"❌ 發送帶按鈕的Telegram訊息失敗: {e}")
+            self.game_monitor.metrics.increment("telegram_send_failures")
             return False
     
     def edit_message(self, message_id, text, keyboard):
         """編輯Telegram訊息"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/editMessageText"
             data = {
                 'chat_id': self.chat_id,
                 'message_id': message_id,
@@ -462,7 +1997,7 @@ class TelegramBot:
                 'reply_markup': json.dumps(keyboard)
             }
             
-            response = requests.post(url, data=data, timeout=10)
+            response = self.game_monitor.get_telegram_api().call("editMessageText", data=data)
             return response.status_code == 200
             
         except Exception as e:
@@ -472,46 +2007,49 @@ class TelegramBot:
     def answer_callback_query(self, query_id, text=""):
         """回應按鈕點擊"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/answerCallbackQuery"
             data = {
                 'callback_query_id': query_id,
                 'text': text,
                 'show_alert': False
             }
             
-            response = requests.post(url, data=data, timeout=5)
+            response = self.game_monitor.get_telegram_api().call("answerCallbackQuery", data=data)
             return response.status_code == 200
             
         except Exception as e:
             print(f"❌ 回應按鈕點擊失敗: {e}")
             return False
     
-    def send_photo(self, photo_path, caption=""):
-        """發送Telegram圖片"""
+    def send_photo(self, photo, caption="", filename=None, mime=None):
+        """發送Telegram圖片（photo 可為檔案路徑或記憶體中的檔案物件）"""
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendPhoto"
-            
-            with open(photo_path, 'rb') as photo:
-                files = {'photo': photo}
+            with (open(photo, 'rb') if isinstance(photo, str) else contextlib.nullcontext(photo)) as handle:
+                if filename:
+                    files = {'photo': (filename, handle, mime or "application/octet-stream")}
+                else:
+                    files = {'photo': handle}
                 data = {
                     'chat_id': self.chat_id,
                     'caption': caption
                 }
                 
-                response = requests.post(url, files=files, data=data, timeout=30)
+                response = self.game_monitor.get_telegram_api().call("sendPhoto", data=data, files=files)
+                if response.status_code != 200:
+                    self.game_monitor.metrics.increment("telegram_send_failures")
                 return response.status_code == 200
                 
         except Exception as e:
             print(f"❌ 發送Telegram圖片失敗: {e}")
+            self.game_monitor.metrics.increment("telegram_send_failures")
             return False
 
-class GameMonitor:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Artale找Boss神器")
-        
-        # 設定視窗永遠在最上層
-        self.root.attributes('-topmost', True)
+class MonitorEngine(TelegramSenderMixin):
+    """監控引擎：設定、畫面檢測與階段狀態機，不依賴任何GUI元件"""
+    
+    def __init__(self, base_dir="", capture=None, metrics=None, color_classifier=None, ssim_scorer=None):
+        # 設定檔與參考截圖所在目錄（多開時每個客戶端各自一個目錄）
+        self.base_dir = base_dir
+        self.log_prefix = ""  # 主控台訊息前綴（多開時為客戶端名稱）
         
         # 系統狀態
         self.is_running = False
@@ -521,11 +2059,17 @@ class GameMonitor:
         
         # 階段設定狀態
         self.stage_screenshots = {}
-        self.setting_stage = None
+        self.reference_cache = {}  # 階段參考截圖的預先計算特徵
+        self.ssim_scorer = ssim_scorer if ssim_scorer is not None else SSIMScorer()
+        self.prefilter_stats = {"match": 0, "reject": 0, "ssim": 0}  # 雜湊預篩命中/未命中次數
+        self.metrics = metrics if metrics is not None else PerformanceMetrics()
+        self.last_metrics_dump = 0
         
         # 當機檢測設定狀態
         self.crash_screenshots = {}
-        self.setting_crash = None
+        self.crash_watchdog_thread = None
+        self.active_crash_key = None  # 目前偵測到的當機畫面（同一次當機只通知一次）
+        self.pending_crash_recovery = None  # 等待監控循環處理的當機復原
         
         # 狀態追蹤變數
         self.current_stage_start_time = time.time()
@@ -535,12 +2079,11 @@ class GameMonitor:
         self.timeout_notified_for_current_stage = False
         self.last_timeout_notification_time = 0
         
-        # 滴管取色狀態
-        self.eyedropper_active = False
+        # 常駐截圖引擎（每個執行緒各自保留mss控制代碼）
+        self.capture = capture if capture is not None else ScreenCapture(self.metrics)
         
-        # BOSS檢測測試狀態
-        self.boss_test_active = False
-        self.boss_test_thread = None
+        # BOSS顏色查找表（目標顏色或容差變更時才重建；多開時由所有客戶端共用）
+        self.color_classifier = color_classifier if color_classifier is not None else ColorClassifier()
         
         # 設定資料
         self.config = {
@@ -550,6 +2093,35 @@ class GameMonitor:
             "channel_area": None,    # (x1, y1, x2, y2)
             "target_color": (255, 0, 0),  # RGB
             "color_threshold": 100,
+            "boss_color_rules": [],  # 色盤中的其他BOSS顏色規則
+            "boss_progressive_scan": True,  # 單通道上限、稀疏格點與分段掃描提前結束（結果與完整掃描相同）
+            "boss_sampling_stride": 4,
+            "boss_scan_band_rows": 32,  # 分段掃描每段的列數
+            "ssim_gaussian_weights": False,  # 階段比對SSIM使用高斯權重（預設box濾波）
+            "hash_prefilter_enabled": True,  # 階段比對前先以dHash預篩
+            "hash_match_distance": 10,  # 漢明距離 <= 此值直接判定匹配（共256位元）
+            "hash_match_min_contrast": 10,  # 參考截圖灰階標準差低於此值時不以雜湊直接判定匹配
+            "hash_match_brightness_tolerance": 12,  # 雜湊判定匹配時允許的平均亮度差
+            "hash_reject_distance": 90,  # 漢明距離 >= 此值直接判定不匹配
+            "crash_detection_enabled": True,
+            "crash_similarity_threshold": 85,
+            "crash_check_interval": 5,  # 背景當機監控的檢查間隔（秒）
+            "crash_check_area": None,  # 當機比對範圍 (x1, y1, x2, y2)，未設定時為全螢幕（多開時為該客戶端的區域範圍）
+            "transition_poll_interval": 0.25,  # 等待畫面轉換時的基本輪詢間隔（秒）
+            "transition_timeout": 3,  # 點擊後等待下一個畫面出現的最長時間（秒）
+            "channel_change_threshold": 0.02,  # 頻道區域變化像素比例達此值視為點擊生效
+            "channel_click_timeout": 1.5,  # 每次頻道切換點擊等待畫面反應的最長時間（秒）
+            "channel_click_retries": 2,  # 點擊無反應時的重試次數
+            "metrics_dump_interval": 60,  # 效能統計輸出到 metrics.json 的間隔（秒，0為停用）
+            "metrics_server_enabled": False,  # 在本機提供Prometheus格式的 /metrics 端點
+            "metrics_server_port": 9464,
+            "control_port": 9465,  # 無介面模式的本機控制埠
+            "detection_worker_enabled": False,  # 在獨立程序執行畫面擷取與檢測
+            "detection_worker_timeout": 5,  # 等待偵測工作程序回應的秒數
+            "frame_ring_enabled": False,  # 由單一擷取執行緒寫入共用截圖緩衝區，各功能共用最新畫格
+            "frame_ring_fps": 10,  # 共用截圖緩衝區的擷取頻率
+            "frame_ring_slots": 4,
+            "ui_refresh_interval_ms": 100,  # 介面套用狀態更新的間隔（毫秒）
             "detection_timeout": 30,
             "click_positions": {
                 "login": None,      # 階段C點位
@@ -557,1836 +2129,2713 @@ class GameMonitor:
                 "channel": []       # 階段F的4個點位
             },
             "telegram_bot_token": "",
+            "telegram_api_url": "",  # 留空使用官方 https://api.telegram.org
+            "telegram_poll_timeout": 25,  # getUpdates長輪詢的伺服器端等待秒數
+            "notification_workers": 2,  # 背景發送通知的工作執行緒數
+            "notification_queue_size": 100,
+            "notification_max_attempts": 4,  # 每則通知最多嘗試次數（間隔2、4、8秒）
+            "telegram_rate_per_chat": 1.0,  # 每個聊天室平均每秒最多發送的訊息數
+            "telegram_rate_burst": 3,  # 每個聊天室可連續發送的訊息數
+            "screenshot_format": "jpeg",  # /screenshot 的壓縮格式：jpeg 或 webp
+            "screenshot_quality": 80,
+            "screenshot_max_size": 1600,  # 截圖最長邊上限（像素，0為不縮小）
+            "screenshot_crop": "",  # 預設截取範圍：空白為全螢幕，detection 或 channel 為對應區域
             "send_welcome_message": True,
             "stage_timeout_seconds": 300,
             "stage_timeout_enabled": True
         }
         
-        # 先載入設定，再設定視窗位置
+        # 載入設定與參考截圖
         self.load_config()
-        self.load_window_geometry()
-        self.create_widgets()
-        self.setup_hotkeys()
+        startup_report.mark("engine_ready")
+        
+        self.telegram_bot = None
+        self.metrics_server = None
+        self.detection_worker = None
+        self.frame_ring = None
+        self.frame_ring_running = False
+    
+    def start_services(self):
+        """啟動Telegram Bot監聽與本機指標端點"""
+        if self.config.get("frame_ring_enabled", False):
+            self.start_frame_ring()
         
-        # 初始化Telegram Bot（在config載入後）
         self.telegram_bot = TelegramBot(self)
         self.telegram_bot.start_listener()
         
-        # 綁定視窗關閉事件
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-        
-    def create_widgets(self):
-        # 主框架
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # 可收合區塊狀態 - 從設定載入
-        self.section_collapsed = self.config.get("section_collapsed", {
-            "status": False,
-            "control": False,
-            "telegram": False,
-            "area": False,
-            "stage": True,  # 預設收合
-            "crash": True,  # 預設收合
-            "color": True,  # 預設收合
-            "position": True  # 預設收合
-        })
-        
-        # 狀態顯示
-        self.create_collapsible_section(main_frame, "status", "系統狀態", 0, self.create_status_widgets)
-        
-        # 控制按鈕
-        self.create_collapsible_section(main_frame, "control", "系統控制", 1, self.create_control_widgets)
-        
-        # Telegram設定
-        self.create_collapsible_section(main_frame, "telegram", "Telegram 設定", 2, self.create_telegram_widgets)
-        
-        # 區域設定
-        self.create_collapsible_section(main_frame, "area", "區域設定", 3, self.create_area_widgets)
-        
-        # 階段設定
-        self.create_collapsible_section(main_frame, "stage", "階段設定(點擊右鍵看大圖)", 4, self.create_stage_widgets)
-        
-        # 當機檢測設定
-        # self.create_collapsible_section(main_frame, "crash", "當機檢測設定(點擊右鍵看大圖)", 5, self.create_crash_widgets)
-        
-        # BOSS訊息判斷設定
-        self.create_collapsible_section(main_frame, "color", "BOSS訊息判斷設定", 6, self.create_color_widgets)
-        
-        # 點位設定
-        self.create_collapsible_section(main_frame, "position", "點擊設定", 7, self.create_position_widgets)
-        
-        # 底部按鈕
-        bottom_frame = ttk.Frame(main_frame)
-        bottom_frame.grid(row=8, column=0, columnspan=2, pady=10)
+        # 本機指標端點（供多開時集中抓取健康狀態）
+        if self.config.get("metrics_server_enabled", False):
+            self.metrics_server = MetricsServer(self, port=self.config.get("metrics_server_port", 9464))
+            if not self.metrics_server.start():
+                self.metrics_server = None
+    
+    def stop_services(self):
+        """停止Telegram Bot監聽與本機指標端點"""
+        if self.telegram_bot:
+            try:
+                self.telegram_bot.stop_listener()
+            except:
+                pass
         
-        ttk.Button(bottom_frame, text="儲存設定", command=self.save_config).grid(row=0, column=0, padx=5)
-        ttk.Button(bottom_frame, text="重新設定", command=self.reset_config).grid(row=0, column=1, padx=5)
-        ttk.Button(bottom_frame, text="取消點擊設定", command=self.cancel_position_recording).grid(row=0, column=2, padx=5)
+        if self.metrics_server:
+            try:
+                self.metrics_server.stop()
+            except:
+                pass
+            self.metrics_server = None
         
-        self.update_position_labels()
-        self.update_area_labels()
-        self.update_stage_labels()
-        # self.update_crash_labels()
+        self.stop_notifier()
+        self.stop_frame_ring()
     
-    def create_collapsible_section(self, parent, section_id, title, row, content_creator):
-        """創建可收合的區塊"""
-        # 主框架
-        section_frame = ttk.Frame(parent)
-        section_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=2)
-        
-        # 標題框架
-        title_frame = ttk.Frame(section_frame)
-        title_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
-        section_frame.grid_columnconfigure(0, weight=1)
+    def start_frame_ring(self):
+        """建立共用截圖緩衝區並啟動擷取執行緒，失敗時維持各功能自行擷取"""
+        try:
+            left, top, frame = self.capture.grab_full_screen()
+            self.frame_ring = FrameRing(frame.nbytes, slots=self.config.get("frame_ring_slots", 4))
+            self.frame_ring.write(frame, (left, top))
+        except Exception as e:
+            print(f"❌ 共用截圖緩衝區建立失敗: {e}")
+            self.frame_ring = None
+            return
         
-        # 收合按鈕
-        collapsed = self.section_collapsed[section_id]
-        button_text = "▶" if collapsed else "▼"
-        toggle_btn = tk.Button(title_frame, text=button_text, width=2, 
-                              command=lambda: self.toggle_section(section_id))
-        toggle_btn.grid(row=0, column=0, padx=5)
+        interval = 1.0 / max(1, self.config.get("frame_ring_fps", 10))
+        self.capture.attach_ring(self.frame_ring, max_age=interval * 2)
+        self.frame_ring_running = True
+        self.frame_producer_done = threading.Event()
+        threading.Thread(target=self.frame_producer_loop, args=(interval,), daemon=True).start()
+        print(f"✅ 共用截圖緩衝區已啟動 ({frame.shape[1]}x{frame.shape[0]}, {1 / interval:.0f} fps)")
+    
+    def stop_frame_ring(self):
+        """停止擷取執行緒並釋放共用截圖緩衝區"""
+        if not self.frame_ring:
+            return
+        self.frame_ring_running = False
+        self.capture.detach_ring()
+        self.frame_producer_done.wait(2)
+        self.frame_ring.close()
+        self.frame_ring = None
+    
+    def frame_producer_loop(self, interval):
+        """擷取執行緒：以固定頻率擷取全螢幕並寫入共用截圖緩衝區"""
+        try:
+            next_time = time.perf_counter()
+            while self.frame_ring_running:
+                try:
+                    left, top, frame = self.capture.grab_full_screen()
+                    self.frame_ring.write(frame, (left, top))
+                except Exception as e:
+                    print(f"截圖擷取錯誤: {e}")
+                
+                next_time = max(next_time + interval, time.perf_counter())
+                time.sleep(max(0, next_time - time.perf_counter()))
+        finally:
+            self.capture.close()
+            self.frame_producer_done.set()
+    
+    def get_config_errors(self):
+        """檢查啟動監控所需的設定，回傳錯誤訊息清單"""
+        errors = []
+        if not self.config.get("telegram_chat_id"):
+            errors.append("請設定Telegram聊天室ID")
+        if not self.config["detection_area"]:
+            errors.append("請設定王怪檢測區域")
+        if not self.config["click_positions"]["login"]:
+            errors.append("請設定登入按鈕位置")
+        return errors
+    
+    def start_monitoring(self):
+        """開始監控（監控循環與背景當機監控各自在獨立執行緒執行）"""
+        if self.is_running:
+            return False
         
-        # 標題
-        title_label = ttk.Label(title_frame, text=title, font=('Arial', 10, 'bold'))
-        title_label.grid(row=0, column=1, sticky=tk.W, padx=5)
+        self.is_running = True
+        self.is_paused = False
+        self.current_stage = "啟動中"
+        self.update_status()
+        self.metrics.reset()
         
-        # 內容框架
-        content_frame = ttk.LabelFrame(section_frame, text="", padding="5")
-        if not collapsed:
-            content_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=2)
+        # 重置BOSS檢測計時器
+        if hasattr(self, 'boss_check_start_time'):
+            delattr(self, 'boss_check_start_time')
         
-        # 儲存引用
-        setattr(self, f"{section_id}_toggle_btn", toggle_btn)
-        setattr(self, f"{section_id}_content_frame", content_frame)
+        self.active_crash_key = None
+        self.pending_crash_recovery = None
+        if self.config.get("detection_worker_enabled", False):
+            self.start_detection_worker()
+        self.start_worker_threads()
         
-        # 創建內容
-        content_creator(content_frame)
+        self.on_control_state_changed()
+        return True
     
-    def toggle_section(self, section_id):
-        """切換區塊收合狀態"""
-        self.section_collapsed[section_id] = not self.section_collapsed[section_id]
-        collapsed = self.section_collapsed[section_id]
-        
-        # 更新按鈕文字
-        toggle_btn = getattr(self, f"{section_id}_toggle_btn")
-        toggle_btn.config(text="▶" if collapsed else "▼")
-        
-        # 顯示/隱藏內容
-        content_frame = getattr(self, f"{section_id}_content_frame")
-        if collapsed:
-            content_frame.grid_remove()
-        else:
-            content_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=2)
-        
-        # 自動保存收合狀態
-        self.save_ui_state()
+    def start_worker_threads(self):
+        """啟動監控循環、背景當機監控與階段超時檢查執行緒"""
+        # 開始監控執行緒
+        self.monitoring_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
+        self.monitoring_thread.start()
+        
+        # 開始背景當機監控（獨立執行緒，不影響階段E的檢測速度）
+        self.crash_watchdog_thread = threading.Thread(target=self.crash_watchdog_loop, daemon=True)
+        self.crash_watchdog_thread.start()
+        
+        # 階段停留超時檢查
+        threading.Thread(target=self.stage_timeout_loop, daemon=True).start()
     
-    def create_status_widgets(self, parent):
-        """創建狀態顯示組件"""
-        self.status_label = ttk.Label(parent, text=f"目前狀態: {self.current_stage}")
-        self.status_label.grid(row=0, column=0, sticky=tk.W)
+    def stop_monitoring(self):
+        """停止監控"""
+        self.is_running = False
+        self.is_paused = False
+        self.current_stage = "已停止"
+        self.update_status()
+        self.dump_metrics()
+        self.stop_detection_worker()
+        self.on_control_state_changed()
     
-    def create_control_widgets(self, parent):
-        """創建控制按鈕組件"""
-        
-        self.start_stop_btn = ttk.Button(parent, text="開始", command=self.toggle_start_stop)
-        self.start_stop_btn.grid(row=0, column=0, padx=5)
-        
-        self.pause_continue_btn = ttk.Button(parent, text="暫停", command=self.toggle_pause_continue, state="disabled")
-        self.pause_continue_btn.grid(row=0, column=1, padx=5)
+    def start_detection_worker(self):
+        """啟動偵測工作程序，失敗時維持在本程序檢測"""
+        try:
+            self.detection_worker = DetectionWorker(self, timeout=self.config.get("detection_worker_timeout", 5))
+            self.detection_worker.start()
+            print("✅ 偵測工作程序已啟動")
+        except Exception as e:
+            print(f"❌ 偵測工作程序啟動失敗，改在本程序檢測: {e}")
+            self.stop_detection_worker()
     
-    def create_telegram_widgets(self, parent):
-        """創建Telegram設定組件"""
-        ttk.Label(parent, text="聊天室 ID:").grid(row=0, column=0, sticky=tk.W)
-        self.chat_id_entry = ttk.Entry(parent, width=20)
-        self.chat_id_entry.grid(row=0, column=1, padx=5)
-        self.chat_id_entry.insert(0, self.config["telegram_chat_id"])
-        
-        ttk.Button(parent, text="測試通知", command=self.test_telegram).grid(row=0, column=2, padx=5)
+    def stop_detection_worker(self):
+        """停止偵測工作程序"""
+        worker, self.detection_worker = self.detection_worker, None
+        if worker:
+            try:
+                worker.stop()
+            except Exception as e:
+                print(f"❌ 停止偵測工作程序失敗: {e}")
     
-    def create_area_widgets(self, parent):
-        """創建區域設定組件"""
-        ttk.Button(parent, text="設定王怪檢測區域", command=self.set_detection_area).grid(row=0, column=0, padx=5, pady=2)
-        ttk.Button(parent, text="設定頻道檢測區域", command=self.set_channel_area).grid(row=0, column=1, padx=5, pady=2)
-        
-        # 區域狀態顯示
-        ttk.Label(parent, text="王怪檢測區域:").grid(row=1, column=0, sticky=tk.W)
-        self.detection_area_label = ttk.Label(parent, text="未設定", foreground="red")
-        self.detection_area_label.grid(row=1, column=1, sticky=tk.W, padx=5)
-        
-        ttk.Label(parent, text="頻道檢測區域:").grid(row=2, column=0, sticky=tk.W)
-        self.channel_area_label = ttk.Label(parent, text="未設定", foreground="red")
-        self.channel_area_label.grid(row=2, column=1, sticky=tk.W, padx=5)
+    def call_detection_worker(self, method, *args):
+        """交給偵測工作程序執行；工作程序異常時關閉並改在本程序執行"""
+        try:
+            return self.detection_worker.call(method, *args)
+        except Exception as e:
+            print(f"❌ 偵測工作程序錯誤，改在本程序檢測: {e}")
+            self.stop_detection_worker()
+            return getattr(self, method)(*args)
     
-    def create_stage_widgets(self, parent):
-        """創建階段設定組件"""
-        # 相似度閾值設定
-        similarity_frame = tk.Frame(parent)
-        similarity_frame.grid(row=0, column=0, columnspan=6, sticky=(tk.W, tk.E), padx=5, pady=5)
-        
-        ttk.Label(similarity_frame, text="畫面相似度閾值:").grid(row=0, column=0, sticky=tk.W)
-        self.stage_similarity_entry = ttk.Entry(similarity_frame, width=10)
-        self.stage_similarity_entry.grid(row=0, column=1, padx=5)
-        # 如果設定中沒有這個值，使用預設值80%
-        similarity_threshold = self.config.get("stage_similarity_threshold", 80)
-        self.stage_similarity_entry.insert(0, str(similarity_threshold))
-        
-        # 說明標籤
-        similarity_help = ttk.Label(similarity_frame, text="(0-100%, 值越高越嚴格)", font=('Arial', 8), foreground="gray")
-        similarity_help.grid(row=0, column=2, sticky=tk.W, padx=5)
-        
-        # 階段按鈕區域
-        self.stage_labels = {}
-        self.stage_buttons = {}
-        self.stage_thumbnails = {}
-        stages = [
-            ("A", "頻道切換成功畫面"),
-            ("C", "登入畫面"),
-            ("D", "角色選擇畫面"),
-            ("E", "遊戲內畫面"),
-            ("F", "頻道切換目標畫面")
-        ]
-        
-        for i, (stage_key, stage_name) in enumerate(stages):
-            row = (i // 2) + 1  # 從第1行開始，第0行是閾值設定
-            col = i % 2
-            base_col = col * 3
-            
-            # 階段標籤
-            stage_label = ttk.Label(parent, text=f"階段{stage_key}: {stage_name}")
-            stage_label.grid(row=row, column=base_col, sticky=tk.W, padx=5, pady=2)
-            
-            # 設定按鈕或縮圖
-            self.stage_buttons[stage_key] = ttk.Button(parent, text="設定", 
-                                                     command=lambda k=stage_key: self.set_stage_screenshot(k))
-            self.stage_buttons[stage_key].grid(row=row, column=base_col+1, padx=5, pady=2)
-            
-            # 狀態標籤
-            self.stage_labels[stage_key] = ttk.Label(parent, text="未設定", foreground="red")
-            self.stage_labels[stage_key].grid(row=row, column=base_col+2, sticky=tk.W, padx=5, pady=2)
+    def pause_monitoring(self, highlight=False):
+        """暫停監控；highlight 表示由BOSS出現觸發，介面需要醒目提示"""
+        self.is_paused = True
+        self.on_control_state_changed(highlight)
     
-    def create_crash_widgets(self, parent):
-        """創建當機檢測設定組件"""
-        # 相似度閾值設定
-        similarity_frame = tk.Frame(parent)
-        similarity_frame.grid(row=0, column=0, columnspan=6, sticky=(tk.W, tk.E), padx=5, pady=5)
-        
-        ttk.Label(similarity_frame, text="當機畫面相似度閾值:").grid(row=0, column=0, sticky=tk.W)
-        self.crash_similarity_entry = ttk.Entry(similarity_frame, width=10)
-        self.crash_similarity_entry.grid(row=0, column=1, padx=5)
-        # 如果設定中沒有這個值，使用預設值85%
-        crash_similarity_threshold = self.config.get("crash_similarity_threshold", 85)
-        self.crash_similarity_entry.insert(0, str(crash_similarity_threshold))
-        
-        # 說明標籤
-        similarity_help = ttk.Label(similarity_frame, text="(0-100%, 值越高越嚴格)", font=('Arial', 8), foreground="gray")
-        similarity_help.grid(row=0, column=2, sticky=tk.W, padx=5)
-        
-        # 當機檢測開關
-        check_frame = tk.Frame(similarity_frame)
-        check_frame.grid(row=0, column=3, padx=10)
-        
-        self.crash_detection_var = tk.BooleanVar()
-        crash_detection_enabled = self.config.get("crash_detection_enabled", True)
-        self.crash_detection_var.set(crash_detection_enabled)
-        
-        crash_check = ttk.Checkbutton(check_frame, text="啟用當機檢測", 
-                                     variable=self.crash_detection_var)
-        crash_check.grid(row=0, column=0)
-        
-        # 當機畫面設定按鈕區域
-        self.crash_labels = {}
-        self.crash_buttons = {}
-        crash_types = [
-            ("disconnect", "斷線重連畫面"),
-            ("error", "錯誤/異常畫面"),
-            ("maintenance", "維護/更新畫面"),
-            ("timeout", "連線逾時畫面")
-        ]
+    def resume_monitoring(self):
+        """恢復監控"""
+        self.is_paused = False
+        self.on_control_state_changed()
+    
+    def on_control_state_changed(self, highlight=False):
+        """執行/暫停狀態變更時呼叫，介面層覆寫以更新按鈕"""
+        pass
+    
+    def show_status(self, text):
+        """顯示目前狀態，介面層覆寫以更新狀態列（狀態變更已輸出到主控台）"""
+        pass
+    
+    def update_status(self):
+        """更新狀態顯示"""
+        # 檢測狀態變化並更新時間記錄
+        if self.current_stage != self.last_stage_name:
+            self.current_stage_start_time = time.time()
+            self.last_stage_name = self.current_stage
+            self.timeout_notified_for_current_stage = False  # 重置超時通知狀態
+            print(f"{self.log_prefix}狀態變更: {self.current_stage}")
         
-        for i, (crash_key, crash_name) in enumerate(crash_types):
-            row = (i // 2) + 1  # 從第1行開始，第0行是閾值設定
-            col = i % 2
-            base_col = col * 3
+        # 階段停留超時由 stage_timeout_loop 另行定時檢查
+        self.show_status(f"目前狀態: {self.current_stage}")
+    
+    def stage_timeout_loop(self):
+        """定時檢查階段停留超時並定期輸出效能統計（與狀態更新頻率及介面無關）"""
+        while self.is_running:
+            self.check_stage_timeout()
+            self.dump_metrics_if_due()
+            time.sleep(1)
+    
+    def dump_metrics(self):
+        """輸出效能統計到 metrics.json"""
+        try:
+            self.metrics.dump("metrics.json")
+            self.last_metrics_dump = time.time()
+        except Exception as e:
+            print(f"❌ 輸出效能統計失敗: {e}")
+    
+    def dump_metrics_if_due(self):
+        """距離上次輸出超過 metrics_dump_interval 秒時輸出 metrics.json（0為停用）"""
+        dump_interval = self.config.get("metrics_dump_interval", 60)
+        if dump_interval and time.time() - self.last_metrics_dump >= dump_interval:
+            self.dump_metrics()
+    
+    def check_stage_timeout(self):
+        """檢查階段停留超時"""
+        try:
+            # 檢查是否啟用超時通知
+            if not self.config.get("stage_timeout_enabled", True):
+                return
             
-            # 當機類型標籤
-            crash_label = ttk.Label(parent, text=f"{crash_name}:")
-            crash_label.grid(row=row, column=base_col, sticky=tk.W, padx=5, pady=2)
+            # 如果已經通知過當前階段，跳過
+            if self.timeout_notified_for_current_stage:
+                return
             
-            # 設定按鈕或縮圖
-            self.crash_buttons[crash_key] = ttk.Button(parent, text="設定", 
-                                                     command=lambda k=crash_key: self.set_crash_screenshot(k))
-            self.crash_buttons[crash_key].grid(row=row, column=base_col+1, padx=5, pady=2)
+            # 計算當前階段停留時間
+            current_time = time.time()
+            elapsed_time = current_time - self.current_stage_start_time
+            timeout_threshold = self.config.get("stage_timeout_seconds", 300)
             
-            # 狀態標籤
-            self.crash_labels[crash_key] = ttk.Label(parent, text="未設定", foreground="red")
-            self.crash_labels[crash_key].grid(row=row, column=base_col+2, sticky=tk.W, padx=5, pady=2)
+            # 檢查是否超時
+            if elapsed_time > timeout_threshold:
+                self.send_stage_timeout_notification(elapsed_time, timeout_threshold)
+                self.timeout_notified_for_current_stage = True
+                self.last_timeout_notification_time = current_time
+                
+        except Exception as e:
+            print(f"❌ 檢查階段超時失敗: {e}")
     
-    def create_color_widgets(self, parent):
-        """創建BOSS訊息判斷設定組件"""
-        ttk.Label(parent, text="目標顏色:").grid(row=0, column=0, sticky=tk.W)
-        
-        # 顏色按鈕框架
-        color_frame = tk.Frame(parent)
-        color_frame.grid(row=0, column=1, columnspan=2, padx=5, sticky=tk.W)
-        
-        self.color_btn = ttk.Button(color_frame, text="選擇顏色", command=self.choose_color)
-        self.color_btn.grid(row=0, column=0, padx=2)
-        
-        self.eyedropper_btn = ttk.Button(color_frame, text="滴管取色", command=self.start_eyedropper)
-        self.eyedropper_btn.grid(row=0, column=1, padx=2)
-        
-        # 顏色預覽
-        self.color_preview = tk.Label(color_frame, text="    ", width=4, height=1, relief="solid", borderwidth=1)
-        self.color_preview.grid(row=0, column=2, padx=5)
-        self.update_color_preview()
-        
-        # 即時顏色預覽
-        self.realtime_color_preview = tk.Label(color_frame, text="    ", width=4, height=1, relief="solid", borderwidth=1, bg="white")
-        self.realtime_color_preview.grid(row=0, column=3, padx=5)
-        
-        # 標籤說明
-        tk.Label(parent, text="設定顏色:", font=('Arial', 8)).grid(row=6, column=0, sticky=tk.W)
-        tk.Label(parent, text="滑鼠顏色:", font=('Arial', 8)).grid(row=6, column=1, sticky=tk.W)
+    def send_stage_timeout_notification(self, elapsed_time, threshold_time):
+        """發送階段超時通知"""
+        try:
+            # 格式化時間顯示
+            elapsed_str = self.format_duration_for_timeout(elapsed_time)
+            threshold_str = self.format_duration_for_timeout(threshold_time)
+            
+            # 構建通知訊息
+            message = f"""⚠️ 階段停留過久
+
+目前階段：{self.current_stage}
+停留時間：{elapsed_str}
+設定閾值：{threshold_str}
+
+時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
+            
+            # 排入Telegram通知佇列（不等待發送完成）
+            chat_id = self.config.get("telegram_chat_id", "")
+            if chat_id:
+                self.notify(message, NotificationDispatcher.PRIORITY_TIMEOUT, chat_id)
+                print(f"✅ 已排入階段超時通知: {self.current_stage}")
+            else:
+                print("⚠️ 未設定Telegram Chat ID，無法發送超時通知")
+                
+        except Exception as e:
+            print(f"❌ 發送階段超時通知失敗: {e}")
+    
+    def format_duration_for_timeout(self, seconds):
+        """格式化超時時間顯示"""
+        if seconds < 60:
+            return f"{int(seconds)}秒"
+        elif seconds < 3600:
+            minutes = int(seconds // 60)
+            remaining_seconds = int(seconds % 60)
+            if remaining_seconds > 0:
+                return f"{minutes}分{remaining_seconds}秒"
+            else:
+                return f"{minutes}分鐘"
+        else:
+            hours = int(seconds // 3600)
+            remaining_minutes = int((seconds % 3600) // 60)
+            if remaining_minutes > 0:
+                return f"{hours}小時{remaining_minutes}分鐘"
+            else:
+                return f"{hours}小時"
+    
+    def monitoring_loop(self):
+        """主要監控循環"""
+        self.reset_stage_machine()
         
-        # 啟動即時顏色更新
-        self.start_realtime_preview()
+        while self.is_running:
+            if self.is_paused:
+                time.sleep(0.1)
+                continue
+            
+            self.run_stage_step()
+    
+    def reset_stage_machine(self):
+        """狀態機回到起點"""
+        self.stage_key = "A"  # 從階段A開始（頻道切換成功確認）
+        self.stage_started = self.cycle_started = time.perf_counter()
+    
+    def run_stage_step(self):
+        """執行狀態機的一個步驟（呼叫一次目前階段的處理函式）"""
+        # 背景當機監控偵測到當機畫面時，改走復原流程
+        if self.pending_crash_recovery:
+            self.stage_key = self.recover_from_crash()
+        
+        stage = self.stage_key
+        
+        # 每次循環所有檢測共用同一次截圖：各階段的步驟只讀取王怪檢測區域
+        # （階段F點擊確認的頻道區域一律即時擷取，不經過擷取週期）
+        self.capture.begin_tick([self.config["detection_area"]])
+        previous_stage = stage
+        try:
+            if stage == "A":
+                stage = self.stage_a()
+            elif stage == "C":
+                stage = self.stage_c()
+            elif stage == "D":
+                stage = self.stage_d()
+            elif stage == "E":
+                stage = self.stage_e()
+            elif stage == "F":
+                stage = self.stage_f()
+            # 各階段自行以 wait_until 等待畫面轉換，這裡不再固定延遲
+            
+            # 階段轉換時記錄停留時間；F回到A代表完成一個頻道
+            now = time.perf_counter()
+            if stage != previous_stage:
+                self.metrics.record(f"dwell_{previous_stage}", now - self.stage_started)
+                self.stage_started = now
+                if previous_stage == "F" and stage == "A":
+                    self.metrics.record_channel(now - self.cycle_started)
+                    self.cycle_started = now
+        except Exception as e:
+            print(f"監控循環錯誤: {e}")
+            self.current_stage = f"階段{stage}: 發生錯誤 - {str(e)}"
+            self.update_status()
+            time.sleep(1)
+        finally:
+            self.capture.end_tick()
+            self.stage_key = stage
+    
+    def crash_watchdog_loop(self):
+        """背景當機監控：以低頻率比對全螢幕縮圖雜湊與當機參考截圖"""
+        while self.is_running:
+            self.run_crash_check()
+            time.sleep(self.config.get("crash_check_interval", 5))
+    
+    def run_crash_check(self, current_hashes=None):
+        """執行一次當機檢查，偵測到新的當機畫面時排入復原流程並發送通知"""
+        if (self.is_paused or not self.crash_screenshots
+                or not self.config.get("crash_detection_enabled", True)):
+            return
+        try:
+            crash_key = self.check_crash_screens(current_hashes)
+            if crash_key and crash_key != self.active_crash_key:
+                self.active_crash_key = crash_key
+                self.pending_crash_recovery = crash_key
+                self.send_crash_alert(crash_key)
+            elif not crash_key:
+                self.active_crash_key = None
+        except Exception as e:
+            print(f"{self.log_prefix}當機監控錯誤: {e}")
+    
+    def get_crash_area(self):
+        """取得當機比對範圍 (x1, y1, x2, y2)，None 表示整張參考截圖"""
+        area = self.config.get("crash_check_area")
+        return tuple(area) if area else None
+    
+    def get_crash_hash(self, crash_key):
+        """取得當機參考截圖在比對範圍內的雜湊（BGR全螢幕截圖只在第一次使用或範圍變更時轉換）
+        
+        比對範圍超出參考截圖時回傳None。
+        """
+        cache_key = f"crash_hash_{crash_key}"
+        screenshot = self.crash_screenshots[crash_key]
+        area = self.get_crash_area() or (0, 0, screenshot.shape[1], screenshot.shape[0])
+        cached = self.reference_cache.get(cache_key)
+        if cached is None or cached["area"] != area:
+            x1, y1, x2, y2 = area
+            if y2 > screenshot.shape[0] or x2 > screenshot.shape[1]:
+                return None
+            gray = cv2.cvtColor(screenshot[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+            cached = {"area": area, "dhash": compute_dhash(gray)}
+            self.reference_cache[cache_key] = cached
+        return cached
+    
+    def check_crash_screens(self, current_hashes=None):
+        """比對目前畫面與當機參考截圖，回傳最接近且超過閾值的當機類型
+        
+        參考截圖與目前畫面都裁切到 get_crash_area 的範圍再比對；多開時每個客戶端只看自己的區域，
+        其他視窗當機不會讓健康的客戶端進入復原流程。current_hashes 為 {比對範圍: 目前畫面雜湊}，
+        多開時由所有客戶端共用，相同範圍只擷取一次。
+        """
+        max_distance = round((1 - self.config.get("crash_similarity_threshold", 85) / 100.0) * 256)
+        
+        best_key, best_distance = None, None
+        if current_hashes is None:
+            current_hashes = {}
+        for crash_key in list(self.crash_screenshots):
+            reference = self.get_crash_hash(crash_key)
+            if reference is None:
+                continue
+            
+            # 參考截圖與目前畫面以相同範圍擷取，同範圍只擷取一次
+            area = reference["area"]
+            if area not in current_hashes:
+                current_gray = self.capture.grab_gray(area)
+                current_hashes[area] = compute_dhash(current_gray)
+            
+            distance = hash_distance(current_hashes[area], reference["dhash"])
+            if distance <= max_distance and (best_distance is None or distance < best_distance):
+                best_key, best_distance = crash_key, distance
         
-        ttk.Label(parent, text="像素閾值:").grid(row=1, column=0, sticky=tk.W)
-        self.threshold_entry = ttk.Entry(parent, width=10)
-        self.threshold_entry.grid(row=1, column=1, padx=5)
-        self.threshold_entry.insert(0, str(self.config["color_threshold"]))
+        if best_key:
+            print(f"{self.log_prefix}當機監控: 偵測到 {best_key} 畫面 (雜湊距離{best_distance}, 上限{max_distance})")
+        return best_key
+    
+    def send_crash_alert(self, crash_key):
+        """發送當機畫面Telegram通知"""
+        crash_names = {
+            "disconnect": "斷線重連畫面",
+            "error": "錯誤/異常畫面",
+            "maintenance": "維護/更新畫面",
+            "timeout": "連線逾時畫面"
+        }
+        message = f"""🚨 偵測到當機畫面
+
+類型：{crash_names.get(crash_key, crash_key)}
+目前階段：{self.current_stage}
+處理方式：重新執行登入流程
+
+時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
         
-        # 顏色相似度閾值
-        ttk.Label(parent, text="顏色容差:").grid(row=2, column=0, sticky=tk.W)
-        self.color_tolerance_entry = ttk.Entry(parent, width=10)
-        self.color_tolerance_entry.grid(row=2, column=1, padx=5)
-        # 如果設定中沒有這個值，使用預設值50
-        color_tolerance = self.config.get("color_tolerance", 50)
-        self.color_tolerance_entry.insert(0, str(color_tolerance))
+        chat_id = self.config.get("telegram_chat_id", "")
+        if chat_id:
+            self.notify(message, NotificationDispatcher.PRIORITY_CRASH, chat_id)
+        else:
+            print("⚠️ 未設定Telegram Chat ID，無法發送當機通知")
+    
+    def recover_from_crash(self):
+        """當機復原：重置BOSS計時並回到登入流程（階段C）"""
+        crash_key = self.pending_crash_recovery
+        self.pending_crash_recovery = None
         
-        # 說明標籤
-        tolerance_help = ttk.Label(parent, text="(0-255, 值越大越寬鬆)", font=('Arial', 8), foreground="gray")
-        tolerance_help.grid(row=2, column=2, sticky=tk.W, padx=5)
+        if hasattr(self, 'boss_check_start_time'):
+            delattr(self, 'boss_check_start_time')
         
-        # 測試按鈕
-        self.boss_test_btn = ttk.Button(parent, text="測試BOSS檢測", command=self.test_boss_detection)
-        self.boss_test_btn.grid(row=3, column=0, columnspan=2, pady=5)
+        self.current_stage = f"當機復原: 偵測到 {crash_key} 畫面，重新執行登入流程"
+        self.update_status()
+        return "C"
+    
+    def click(self, x, y):
+        """點擊螢幕座標；多開時所有客戶端共用滑鼠鎖，點擊不會交錯"""
+        with MOUSE_LOCK:
+            pyautogui.click(x, y)
+    
+    def wait_until(self, predicate, timeout, poll=None, expected=None, regions=()):
+        """等待條件成立，回傳是否在逾時前成立
+        
+        regions 為 predicate 會讀取的區域，每次檢查前以這些區域開始新的擷取週期（共用一次聯集截圖）；
+        有預期轉換時間 expected 時，越接近該時間輪詢越快（最快為基本間隔的1/4）。
+        停止或暫停監控時立即結束。
+        """
+        if poll is None:
+            poll = self.config.get("transition_poll_interval", 0.25)
+        start_time = time.time()
+        deadline = start_time + timeout
         
-        # BOSS檢測延遲設定
-        ttk.Label(parent, text="無BOSS切換延遲:").grid(row=4, column=0, sticky=tk.W)
-        self.boss_wait_entry = ttk.Entry(parent, width=10)
-        self.boss_wait_entry.grid(row=4, column=1, padx=5)
-        # 如果設定中沒有這個值，使用預設值30秒
-        boss_wait_time = self.config.get("boss_wait_time", 30)
-        self.boss_wait_entry.insert(0, str(boss_wait_time))
+        while self.is_running and not self.is_paused:
+            self.capture.begin_tick(regions)
+            try:
+                if predicate():
+                    return True
+            finally:
+                self.capture.end_tick()
+            
+            now = time.time()
+            if now >= deadline:
+                return False
+            
+            interval = poll
+            if expected:
+                closeness = abs((now - start_time) - expected) / expected
+                interval = poll * min(1.0, max(0.25, closeness))
+            time.sleep(min(interval, deadline - now))
         
-        # 延遲說明標籤
-        wait_help = ttk.Label(parent, text="(秒，無BOSS時多久後切換頻道)", font=('Arial', 8), foreground="gray")
-        wait_help.grid(row=4, column=2, sticky=tk.W, padx=5)
+        return False
+    
+    def wait_for_stage_screen(self, stage_key, expected, timeout=None):
+        """點擊後等待指定階段畫面出現；未設定參考截圖時改為固定等待 expected 秒"""
+        if stage_key not in self.stage_screenshots:
+            time.sleep(expected)
+            return False
         
-        # BOSS後行為設定
-        ttk.Label(parent, text="檢測到BOSS後:").grid(row=5, column=0, sticky=tk.W)
-        self.boss_behavior_var = tk.BooleanVar()
-        auto_switch_after_boss = self.config.get("auto_channel_switch_after_boss", True)
-        self.boss_behavior_var.set(auto_switch_after_boss)
+        if timeout is None:
+            timeout = max(expected * 2, self.config.get("transition_timeout", 3))
+        return self.wait_until(lambda: self.detect_stage_match(stage_key), timeout, expected=expected,
+                               regions=[self.config["detection_area"]])
+    
+    @timed("stage_a")
+    def stage_a(self):
+        """階段A: 頻道切換成功確認"""
+        self.current_stage = "階段A: 檢查是否為頻道切換成功畫面"
+        self.update_status()
         
-        behavior_frame = tk.Frame(parent)
-        behavior_frame.grid(row=5, column=1, columnspan=2, sticky=tk.W, padx=5)
+        # 檢查是否有階段A的截圖設定
+        if "A" in self.stage_screenshots:
+            # 檢測當前畫面是否匹配階段A
+            if self.detect_stage_match("A"):
+                self.current_stage = "階段A: ✓ 匹配頻道切換成功畫面"
+                self.update_status()
+                return "C"
+            else:
+                self.current_stage = "階段A: ✗ 不匹配頻道切換成功畫面，繼續檢查"
+                self.update_status()
+                
+                # 持續檢查，畫面一出現就進入下一階段
+                if self.wait_until(lambda: self.detect_stage_match("A"), timeout=2,
+                                   regions=[self.config["detection_area"]]):
+                    self.current_stage = "階段A: ✓ 匹配頻道切換成功畫面"
+                    self.update_status()
+                    return "C"
+                return "A"
+        else:
+            self.current_stage = "階段A: 未設定參考畫面，跳過檢查"
+            self.update_status()
         
-        auto_radio = ttk.Radiobutton(behavior_frame, text="5秒後自動切換頻道", 
-                                   variable=self.boss_behavior_var, value=True)
-        auto_radio.grid(row=0, column=0, sticky=tk.W)
-        
-        manual_radio = ttk.Radiobutton(behavior_frame, text="暫停等待手動繼續", 
-                                     variable=self.boss_behavior_var, value=False)
-        manual_radio.grid(row=1, column=0, sticky=tk.W)
-        
-        # 階段超時設定
-        ttk.Label(parent, text="階段超時時間:").grid(row=6, column=0, sticky=tk.W)
-        self.stage_timeout_entry = ttk.Entry(parent, width=10)
-        self.stage_timeout_entry.grid(row=6, column=1, sticky=tk.W, padx=5)
-        # 載入現有設定（轉換為分鐘顯示）
-        timeout_minutes = self.config.get("stage_timeout_seconds", 300) // 60
-        self.stage_timeout_entry.insert(0, str(timeout_minutes))
-        
-        # 階段超時說明標籤
-        timeout_help = ttk.Label(parent, text="(分鐘，階段停留過久時發送通知)", font=('Arial', 8), foreground="gray")
-        timeout_help.grid(row=6, column=2, sticky=tk.W, padx=5)
-        
-        # 顏色資訊顯示
-        ttk.Label(parent, text="RGB值:").grid(row=7, column=0, sticky=tk.W)
-        self.rgb_label = ttk.Label(parent, text=f"({self.config['target_color'][0]}, {self.config['target_color'][1]}, {self.config['target_color'][2]})")
-        self.rgb_label.grid(row=7, column=1, sticky=tk.W, padx=5)
+        # 沒有匹配，等待一段時間後重新檢查
+        time.sleep(2)
+        return "A"  # 繼續停留在階段A檢查
     
-    def create_position_widgets(self, parent):
-        """創建點位設定組件"""
-        self.position_labels = {}
-        self.position_buttons = {}
-        positions = [
-            ("login", "登入按鈕"),
-            ("character", "角色選擇"),
-            ("channel_1", "頻道切換-1"),
-            ("channel_2", "頻道切換-2"),
-            ("channel_3", "頻道切換-3"),
-            ("channel_4", "頻道切換-4")
-        ]
-        
-        for i, (key, label) in enumerate(positions):
-            row = i
-            # 標籤
-            ttk.Label(parent, text=f"{label}:").grid(row=row, column=0, sticky=tk.W, padx=5, pady=2)
-            
-            # 設定按鈕
-            self.position_buttons[key] = ttk.Button(parent, text="設定", 
-                                                   command=lambda k=key: self.start_position_recording(k))
-            self.position_buttons[key].grid(row=row, column=1, padx=5, pady=2)
+    @timed("stage_c")
+    def stage_c(self):
+        """階段C: 等待登入畫面出現"""
+        # 檢查是否有階段C的截圖設定
+        if "C" in self.stage_screenshots:
+            # 檢測當前畫面是否匹配階段C（登入畫面）
+            if self.detect_stage_match("C"):
+                self.current_stage = "階段C: ✓ 檢測到登入畫面，執行登入點擊"
+                self.update_status()
+                
+                # 確認是登入畫面，執行登入點擊
+                login_pos = self.config["click_positions"]["login"]
+                if login_pos:
+                    self.click(login_pos[0], login_pos[1])
+                    self.wait_for_stage_screen("D", expected=2)
+                    return "D"  # 進入階段D等待角色選擇畫面
+                else:
+                    self.current_stage = "階段C: 未設定登入按鈕位置"
+                    self.update_status()
+                    time.sleep(2)
+                    return "C"
+            else:
+                self.current_stage = "階段C: 等待登入畫面出現"
+                self.update_status()
+        else:
+            # 沒有設定截圖，假設已經是登入畫面，直接點擊登入
+            self.current_stage = "階段C: 未設定參考畫面，執行登入點擊"
+            self.update_status()
             
-            # 狀態標籤
-            self.position_labels[key] = ttk.Label(parent, text="未設定", foreground="red")
-            self.position_labels[key].grid(row=row, column=2, sticky=tk.W, padx=5, pady=2)
-    
-    def setup_hotkeys(self):
-        """設定熱鍵和滑鼠監聽"""
-        self.recording_position = None
-        self.position_recording_active = False
-        # 設定滑鼠監聽器
-        try:
-            from pynput import mouse
-            self.mouse_listener = mouse.Listener(on_click=self.on_mouse_click)
-            self.mouse_listener.start()
-            print("滑鼠監聽器已啟動")
-        except ImportError:
-            print("pynput not installed, using alternative method")
-        except Exception as e:
-            print(f"滑鼠監聽器啟動失敗: {e}")
-    
-    def start_position_recording(self, position_key):
-        """開始記錄指定位置"""
-        if self.is_running:
-            messagebox.showerror("錯誤", "請先停止監控模式")
-            return
-        
-        self.recording_position = position_key
-        self.position_recording_active = True
+            login_pos = self.config["click_positions"]["login"]
+            if login_pos:
+                self.click(login_pos[0], login_pos[1])
+                self.wait_for_stage_screen("D", expected=2)
+                return "D"
         
-        # 更新按鈕狀態
-        for key, btn in self.position_buttons.items():
-            if key == position_key:
-                btn.config(text="點擊目標", style="Accent.TButton")
+        # 等待登入畫面出現
+        self.wait_for_stage_screen("C", expected=1)
+        return "C"
+    
+    @timed("stage_d")
+    def stage_d(self):
+        """階段D: 等待角色選擇畫面出現"""
+        # 檢查是否有階段D的截圖設定
+        if "D" in self.stage_screenshots:
+            # 同一次擷取同時比對角色選擇畫面（階段D）與登入畫面（階段C）
+            best_match = self.best_stage_match(self.classify_frame(["D", "C"]))
+            if best_match and best_match["key"] == "D":
+                self.current_stage = "階段D: ✓ 檢測到角色選擇畫面，執行角色點擊"
+                self.update_status()
+                
+                # 確認是角色選擇畫面，執行角色點擊
+                char_pos = self.config["click_positions"]["character"]
+                if char_pos:
+                    self.click(char_pos[0], char_pos[1])
+                    self.wait_for_stage_screen("E", expected=2)
+                    return "E"  # 進入階段E進行BOSS檢測
+                else:
+                    self.current_stage = "階段D: 未設定角色選擇按鈕位置"
+                    self.update_status()
+                    time.sleep(2)
+                    return "D"
             else:
-                btn.config(state="disabled")
-        
-        # 顯示提示
-        position_names = {
-            "login": "登入按鈕",
-            "character": "角色選擇",
-            "channel_1": "頻道切換-1",
-            "channel_2": "頻道切換-2", 
-            "channel_3": "頻道切換-3",
-            "channel_4": "頻道切換-4"
-        }
+                # 檢查是否還在上個階段（階段C）
+                if best_match and best_match["key"] == "C":
+                    self.current_stage = "階段D: 檢測到仍在登入畫面，執行登入點擊"
+                    self.update_status()
+                    
+                    # 還在登入畫面，執行登入點擊
+                    login_pos = self.config["click_positions"]["login"]
+                    if login_pos:
+                        self.click(login_pos[0], login_pos[1])
+                        self.wait_for_stage_screen("D", expected=2)
+                    return "D"  # 繼續等待角色選擇畫面
+                else:
+                    self.current_stage = "階段D: 等待角色選擇畫面出現"
+                    self.update_status()
+        else:
+            # 沒有設定截圖，假設已經是角色選擇畫面，直接點擊角色
+            self.current_stage = "階段D: 未設定參考畫面，執行角色點擊"
+            self.update_status()
+            
+            char_pos = self.config["click_positions"]["character"]
+            if char_pos:
+                self.click(char_pos[0], char_pos[1])
+                self.wait_for_stage_screen("E", expected=2)
+                return "E"
         
-        messagebox.showinfo("設定點位", 
-            f"正在設定 {position_names[position_key]} 位置\n\n"
-            f"請將滑鼠移動到目標位置，然後點擊滑鼠左鍵記錄位置")
+        # 等待角色選擇畫面出現
+        self.wait_for_stage_screen("D", expected=1)
+        return "D"
     
-    def on_mouse_click(self, x, y, button, pressed):
-        """滑鼠點擊事件處理"""
-        # 只處理左鍵按下事件
-        if not pressed:
-            return
+    @timed("stage_e")
+    def stage_e(self):
+        """階段E: 專心BOSS檢測，不被中斷"""
+        # 直接進行BOSS檢測，不進行任何畫面匹配判斷
+        if self.detect_boss():
+            self.metrics.increment("boss_detections")
             
-        # 檢查是否為左鍵
-        try:
-            if button.name != 'left':
-                return
-        except:
-            # 如果無法取得button.name，檢查button值
-            if str(button) != 'Button.left':
-                return
-        
-        # 檢查是否在點位記錄模式
-        if not self.position_recording_active or not self.recording_position:
-            return
-        
-        print(f"滑鼠點擊偵測: 位置({x}, {y}), 記錄位置: {self.recording_position}")
+            # 重置計時器 (檢測到BOSS後重新開始計時)
+            if hasattr(self, 'boss_check_start_time'):
+                delattr(self, 'boss_check_start_time')
             
-        # 記錄點擊位置
-        if self.recording_position in ["login", "character"]:
-            self.config["click_positions"][self.recording_position] = (x, y)
-        elif self.recording_position.startswith("channel_"):
-            index = int(self.recording_position.split("_")[1]) - 1
-            while len(self.config["click_positions"]["channel"]) <= index:
-                self.config["click_positions"]["channel"].append(None)
-            self.config["click_positions"]["channel"][index] = (x, y)
-        
-        # 重置狀態
-        self.position_recording_active = False
-        current_position = self.recording_position
-        self.recording_position = None
+            # 發送通知
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            message = f"BOSS出現！\n時間: {timestamp}"
+            
+            self.notify(message, NotificationDispatcher.PRIORITY_BOSS)
+            
+            # 檢查是否要自動進入頻道切換
+            auto_switch = self.config.get("auto_channel_switch_after_boss", True)
+            
+            if auto_switch:
+                # 自動模式：發送通知並暫停等待5秒
+                self.pause_monitoring(highlight=True)
+                self.current_stage = "檢測到BOSS！已暫停，5秒後自動切換頻道..."
+                self.update_status()
+                
+                # 等待5秒倒數
+                for i in range(5, 0, -1):
+                    if not self.is_running:
+                        return "E"
+                    if not self.is_paused:  # 如果用戶手動點擊繼續，提前結束等待
+                        break
+                    self.current_stage = f"檢測到BOSS！已暫停，{i}秒後自動切換頻道..."
+                    self.update_status()
+                    time.sleep(1)
+                
+                # 自動恢復並進入頻道切換
+                self.resume_monitoring()
+                return "F"  # 進入頻道切換
+            else:
+                # 手動模式：暫停等待使用者點繼續
+                self.pause_monitoring(highlight=True)
+                self.current_stage = "檢測到BOSS - 請打完後點繼續"
+                self.update_status()
+                
+                # 等待使用者點繼續
+                while self.is_paused and self.is_running:
+                    time.sleep(0.1)
+                
+                self.on_control_state_changed()
+                return "F"
+        else:
+            # 沒有檢測到BOSS，計時邏輯
+            if not hasattr(self, 'boss_check_start_time'):
+                self.boss_check_start_time = time.time()
+                
+            elapsed = time.time() - self.boss_check_start_time
+            wait_time = self.config.get("boss_wait_time", 30)
+            remaining = max(0, wait_time - elapsed)
+            
+            if remaining > 0:
+                self.current_stage = f"階段E: 專心BOSS檢測中... 無BOSS還有 {remaining:.0f} 秒切頻道"
+                self.update_status()
+                time.sleep(0.1)  # 快速檢測間隔，每0.1秒檢測一次
+                return "E"
+            else:
+                # 超過等待時間，切換頻道
+                if hasattr(self, 'boss_check_start_time'):
+                    delattr(self, 'boss_check_start_time')
+                return "F"
         
-        # 更新UI - 使用 after 方法在主執行緒中執行
-        self.root.after(100, self.update_position_labels)
-        self.root.after(100, self.reset_position_buttons)
-        
-        # 顯示結果
-        position_names = {
-            "login": "登入按鈕",
-            "character": "角色選擇",
-            "channel_1": "頻道切換-1",
-            "channel_2": "頻道切換-2", 
-            "channel_3": "頻道切換-3",
-            "channel_4": "頻道切換-4"
-        }
-        
-        # 使用 after 方法在主執行緒中顯示對話框
-        def show_success():
-            try:
-                messagebox.showinfo("設定完成", 
-                    f"{position_names[current_position]} 位置已設定\n座標: ({x}, {y})")
-            except Exception as e:
-                print(f"顯示對話框錯誤: {e}")
-        
-        self.root.after(200, show_success)
-    
-    def reset_position_buttons(self):
-        """重置點位設定按鈕狀態"""
-        for key, btn in self.position_buttons.items():
-            btn.config(text="設定", style="TButton", state="normal")
-    
-    def update_position_labels(self):
-        """更新位置標籤顯示"""
-        login_pos = self.config["click_positions"]["login"]
-        if login_pos:
-            self.position_labels["login"].config(text=f"({login_pos[0]}, {login_pos[1]})", foreground="green")
-        
-        char_pos = self.config["click_positions"]["character"]
-        if char_pos:
-            self.position_labels["character"].config(text=f"({char_pos[0]}, {char_pos[1]})", foreground="green")
-        
-        for i in range(4):
-            key = f"channel_{i+1}"
-            if i < len(self.config["click_positions"]["channel"]) and self.config["click_positions"]["channel"][i]:
-                pos = self.config["click_positions"]["channel"][i]
-                self.position_labels[key].config(text=f"({pos[0]}, {pos[1]})", foreground="green")
-    
-    def update_area_labels(self):
-        """更新區域標籤顯示"""
-        if self.config["detection_area"]:
-            coords = self.config["detection_area"]
-            self.detection_area_label.config(text=f"({coords[0]}, {coords[1]}) -> ({coords[2]}, {coords[3]})", foreground="green")
+        return "E"  # 繼續在階段E檢測BOSS
+        # 檢查是否有階段E的截圖設定
+        if "E" in self.stage_screenshots:
+            # 檢測當前畫面是否匹配階段E（遊戲內畫面）
+            if self.detect_stage_match("E"):
+                self.current_stage = "階段E: ✓ 檢測到遊戲內畫面，開始BOSS檢測"
+                self.update_status()
+                
+                # 確認在遊戲內，進行BOSS檢測
+                if self.detect_boss():
+                    # 重置計時器 (檢測到BOSS後重新開始計時)
+                    if hasattr(self, 'boss_check_start_time'):
+                        delattr(self, 'boss_check_start_time')
+                    
+                    # 發送通知
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    message = f"BOSS出現！\n時間: {timestamp}"
+                    
+                    self.notify(message, NotificationDispatcher.PRIORITY_BOSS)
+                    
+                    # 檢查是否要自動進入頻道切換
+                    auto_switch = self.config.get("auto_channel_switch_after_boss", True)
+                    
+                    if auto_switch:
+                        # 自動模式：發送通知並暫停等待5秒
+                        self.pause_monitoring(highlight=True)
+                        self.current_stage = "檢測到BOSS！已暫停，5秒後自動切換頻道..."
+                        self.update_status()
+                        
+                        # 等待5秒倒數
+                        for i in range(5, 0, -1):
+                            if not self.is_running:
+                                return "E"
+                            if not self.is_paused:  # 如果用戶手動點擊繼續，提前結束等待
+                                break
+                            self.current_stage = f"檢測到BOSS！已暫停，{i}秒後自動切換頻道..."
+                            self.update_status()
+                            time.sleep(1)
+                        
+                        # 自動恢復並進入頻道切換
+                        self.resume_monitoring()
+                        return "F"  # 進入頻道切換
+                    else:
+                        # 手動模式：暫停等待使用者點繼續
+                        self.pause_monitoring(highlight=True)
+                        self.current_stage = "檢測到BOSS - 請打完後點繼續"
+                        self.update_status()
+                        
+                        # 等待使用者點繼續
+                        while self.is_paused and self.is_running:
+                            time.sleep(0.1)
+                        
+                        self.on_control_state_changed()
+                        return "F"
+                
+                # 沒有檢測到BOSS，檢查是否達到等待時間
+                if not hasattr(self, 'boss_check_start_time'):
+                    self.boss_check_start_time = time.time()
+                
+                elapsed_time = time.time() - self.boss_check_start_time
+                wait_time = self.config.get("boss_wait_time", 30)
+                
+                remaining_time = max(0, int(wait_time - elapsed_time))
+                self.current_stage = f"階段E: BOSS檢測中 ({remaining_time}秒後切換頻道)"
+                self.update_status()
+                
+                if elapsed_time >= wait_time:
+                    # 重置計時器，準備下一輪檢測
+                    self.boss_check_start_time = time.time()
+                    return "F"  # 進入頻道切換
+            else:
+                # 檢查是否還在上個階段（階段D）
+                if "D" in self.stage_screenshots and self.detect_stage_match("D"):
+                    self.current_stage = "階段E: 檢測到仍在角色選擇畫面，執行角色點擊"
+                    self.update_status()
+                    
+                    # 還在角色選擇畫面，執行角色點擊
+                    char_pos = self.config["click_positions"]["character"]
+                    if char_pos:
+                        self.click(char_pos[0], char_pos[1])
+                        time.sleep(2)
+                    return "E"  # 繼續等待進入遊戲
+                else:
+                    self.current_stage = "階段E: 等待進入遊戲內畫面"
+                    self.update_status()
         else:
-            self.detection_area_label.config(text="未設定", foreground="red")
+            # 沒有設定截圖，直接進行BOSS檢測
+            self.current_stage = "階段E: 未設定參考畫面，直接進行BOSS檢測"
+            self.update_status()
             
-        if self.config["channel_area"]:
-            coords = self.config["channel_area"]
-            self.channel_area_label.config(text=f"({coords[0]}, {coords[1]}) -> ({coords[2]}, {coords[3]})", foreground="green")
-        else:
-            self.channel_area_label.config(text="未設定", foreground="red")
-    
-    def update_stage_labels(self):
-        """更新階段標籤顯示"""
-        for stage_key, label in self.stage_labels.items():
-            if stage_key in self.stage_screenshots:
-                label.config(text="已設定", foreground="green")
-                # 更新按鈕為縮圖
-                self.create_stage_thumbnail(stage_key)
-            else:
-                label.config(text="未設定", foreground="red")
-                # 恢復為設定按鈕
-                if stage_key in self.stage_buttons:
-                    self.stage_buttons[stage_key].config(text="設定", command=lambda k=stage_key: self.set_stage_screenshot(k))
-    
-    def create_stage_thumbnail(self, stage_key):
-        """創建階段縮圖按鈕"""
-        if stage_key not in self.stage_screenshots:
-            return
-        
-        try:
-            # 取得截圖並縮小
-            screenshot = self.stage_screenshots[stage_key]
+            # 進行BOSS檢測
+            if self.detect_boss():
+                # 重置計時器
+                if hasattr(self, 'boss_check_start_time'):
+                    delattr(self, 'boss_check_start_time')
+                
+                # 發送通知並暫停
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                message = f"BOSS出現！\n時間: {timestamp}"
+                
+                self.notify(message, NotificationDispatcher.PRIORITY_BOSS)
+                
+                # 自動暫停，等待使用者繼續
+                self.pause_monitoring(highlight=True)
+                self.current_stage = "檢測到BOSS - 請打完後點繼續"
+                self.update_status()
+                
+                # 等待使用者點繼續
+                while self.is_paused and self.is_running:
+                    time.sleep(0.1)
+                
+                self.on_control_state_changed()
+                return "F"
             
-            # 縮放圖片為縮圖大小
-            thumbnail_size = (60, 40)
-            h, w = screenshot.shape[:2]
+            # 沒有檢測到BOSS，檢查是否達到等待時間
+            if not hasattr(self, 'boss_check_start_time'):
+                self.boss_check_start_time = time.time()
             
-            # 計算縮放比例
-            scale = min(thumbnail_size[0]/w, thumbnail_size[1]/h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
+            elapsed_time = time.time() - self.boss_check_start_time
+            wait_time = self.config.get("boss_wait_time", 30)
             
-            # 縮放圖片
-            resized_img = cv2.resize(screenshot, (new_w, new_h))
+            remaining_time = max(0, int(wait_time - elapsed_time))
+            self.current_stage = f"階段E: BOSS檢測中 ({remaining_time}秒後切換頻道)"
+            self.update_status()
             
-            # 轉換為PhotoImage
-            pil_img = Image.fromarray(resized_img)
-            photo = ImageTk.PhotoImage(pil_img)
+            if elapsed_time >= wait_time:
+                self.boss_check_start_time = time.time()
+                return "F"
+        
+        time.sleep(1)
+        return "E"  # 繼續檢測
+    
+    def click_and_verify_channel(self, index, pos):
+        """點擊頻道切換點位，並以頻道檢測區域的畫面變化確認點擊生效
+        
+        點擊前先擷取頻道區域作為比對基準，點擊後持續比對，畫面一有反應就回傳 True；
+        逾時仍無變化則重新點擊，超過重試次數回傳 False。未設定頻道檢測區域時改為固定等待1秒。
+        """
+        channel_area = self.config.get("channel_area")
+        if not channel_area:
+            self.click(pos[0], pos[1])
+            time.sleep(1)
+            return True
+        
+        threshold = self.config.get("channel_change_threshold", 0.02)
+        timeout = self.config.get("channel_click_timeout", 1.5)
+        retries = self.config.get("channel_click_retries", 2)
+        
+        for attempt in range(retries + 1):
+            # 基準畫面必須是點擊前的即時畫面，不可沿用本輪擷取週期的快取或共用緩衝區中較舊的畫格
+            # （舊畫格可能還停在上一次點擊的畫面轉換中，會被誤判為已變化）；點擊後的比對同理
+            before = self.capture.grab_gray(channel_area, live=True).copy()
+            
+            self.click(pos[0], pos[1])
+            
+            # 輪詢只即時擷取頻道區域，不需要擷取週期
+            changed = self.wait_until(
+                lambda: self.calculate_screen_change(before, self.capture.grab_gray(channel_area, live=True)) >= threshold,
+                timeout,
+                poll=0.05
+            )
+            if changed:
+                return True
+            if not self.is_running or self.is_paused:
+                return False
             
-            # 更新按鈕顯示縮圖
-            button = self.stage_buttons[stage_key]
-            button.config(text="", image=photo, command=lambda k=stage_key: self.set_stage_screenshot(k))
+            if attempt < retries:
+                print(f"{self.log_prefix}⚠️ 階段F: 點位{index+1} 點擊後頻道區域無變化，重試 ({attempt+1}/{retries})")
+        
+        print(f"{self.log_prefix}❌ 階段F: 點位{index+1} 重試 {retries} 次後仍無反應")
+        return False
+    
+    @timed("stage_f")
+    def stage_f(self):
+        """階段F: 立即執行頻道切換，不等待任何條件"""
+        print(f"{self.log_prefix}階段F: 開始執行頻道切換")
+        self.current_stage = "階段F: 執行頻道切換..."
+        self.update_status()
+        
+        # 直接執行頻道切換，不進行任何畫面檢測
+        channel_positions = self.config["click_positions"]["channel"]
+        
+        # 檢查頻道切換點位是否已設定
+        if not channel_positions or len(channel_positions) < 4:
+            self.current_stage = "階段F: 未設定頻道切換點位，需要設定4個點位"
+            self.update_status()
+            time.sleep(2)
+            return "F"
+        
+        # 檢查前4個點位是否都已設定
+        if not all(channel_positions[i] for i in range(4)):
+            self.current_stage = "階段F: 頻道切換點位不完整，請確認已設定點位1-4"
+            self.update_status()
+            time.sleep(2)
+            return "F"
+        
+        # 立即執行所有4個點位的點擊
+        self.current_stage = "階段F: 立即執行4個點位點擊"
+        self.update_status()
+        
+        try:
+            # 依序執行所有點位，每次點擊都確認頻道區域有反應後才點下一個
+            for i in range(4):
+                if channel_positions[i] and self.is_running and not self.is_paused:
+                    print(f"{self.log_prefix}階段F: 點擊點位{i+1} ({channel_positions[i][0]}, {channel_positions[i][1]})")
+                    if not self.click_and_verify_channel(i, channel_positions[i]):
+                        if not self.is_running or self.is_paused:
+                            return "F"
+                        # 點擊被吞掉，從點位1重新開始，避免後續點擊落在錯誤的介面上
+                        self.current_stage = f"階段F: 點位{i+1} 點擊後畫面無反應，重新執行頻道切換"
+                        self.update_status()
+                        return "F"
             
-            # 綁定右鍵點擊事件
-            button.bind("<Button-3>", lambda event, k=stage_key: self.show_stage_preview(k))
+            # 頻道切換完成，重置BOSS檢測計時器
+            if hasattr(self, 'boss_check_start_time'):
+                delattr(self, 'boss_check_start_time')
             
-            # 保持引用避免被回收
-            if not hasattr(self, 'stage_photos'):
-                self.stage_photos = {}
-            self.stage_photos[stage_key] = photo
+            self.current_stage = "階段F: 頻道切換完成"
+            self.update_status()
+            print(f"{self.log_prefix}階段F: 所有點位點擊完成，返回階段A")
+            self.wait_for_stage_screen("A", expected=2)
+            return "A"  # 回到階段A檢查頻道切換結果
             
         except Exception as e:
-            print(f"創建階段 {stage_key} 縮圖失敗: {e}")
-            # 失敗時顯示文字
-            self.stage_buttons[stage_key].config(text="已設定", command=lambda k=stage_key: self.set_stage_screenshot(k))
+            print(f"{self.log_prefix}階段F點擊錯誤: {e}")
+            self.current_stage = f"階段F: 點擊錯誤 - {str(e)}"
+            self.update_status()
+            time.sleep(2)
+            return "F"
+        if "F" in self.stage_screenshots:
+            # 檢測當前畫面是否匹配階段F（頻道切換目標畫面）
+            if self.detect_stage_match("F"):
+                self.current_stage = "階段F: ✓ 檢測到頻道切換目標畫面，執行完成點擊"
+                self.update_status()
+                
+                # 已達到目標畫面，執行點位3和4
+                channel_positions = self.config["click_positions"]["channel"]
+                if len(channel_positions) >= 4:
+                    # 點擊第3個點位
+                    if channel_positions[2] and self.is_running and not self.is_paused:
+                        print(f"{self.log_prefix}階段F: 點擊點位3 ({channel_positions[2][0]}, {channel_positions[2][1]})")
+                        self.click(channel_positions[2][0], channel_positions[2][1])
+                        time.sleep(1)
+                    
+                    # 點擊第4個點位
+                    if channel_positions[3] and self.is_running and not self.is_paused:
+                        print(f"{self.log_prefix}階段F: 點擊點位4 ({channel_positions[3][0]}, {channel_positions[3][1]})")
+                        self.click(channel_positions[3][0], channel_positions[3][1])
+                        time.sleep(1)
+                
+                # 頻道切換完成，重置BOSS檢測計時器
+                if hasattr(self, 'boss_check_start_time'):
+                    delattr(self, 'boss_check_start_time')
+                
+                return "A"  # 回到階段A檢查頻道切換結果
+            else:
+                # 檢查是否還在上個階段（階段E）
+                if "E" in self.stage_screenshots and self.detect_stage_match("E"):
+                    self.current_stage = "階段F: 檢測到仍在遊戲內畫面，等待進入頻道切換"
+                    self.update_status()
+                    # 還在遊戲內，等待進入頻道切換界面
+                    time.sleep(1)
+                    return "F"
+                else:
+                    # 還沒達到目標畫面，執行點位1和2
+                    self.current_stage = "階段F: 執行頻道切換點位1和2"
+                    self.update_status()
+                    
+                    channel_positions = self.config["click_positions"]["channel"]
+                    if len(channel_positions) >= 2:
+                        # 點擊第1個點位
+                        if channel_positions[0] and self.is_running and not self.is_paused:
+                            print(f"{self.log_prefix}階段F: 點擊點位1 ({channel_positions[0][0]}, {channel_positions[0][1]})")
+                            self.click(channel_positions[0][0], channel_positions[0][1])
+                            time.sleep(1)
+                        
+                        # 點擊第2個點位
+                        if channel_positions[1] and self.is_running and not self.is_paused:
+                            print(f"{self.log_prefix}階段F: 點擊點位2 ({channel_positions[1][0]}, {channel_positions[1][1]})")
+                            self.click(channel_positions[1][0], channel_positions[1][1])
+                            time.sleep(1)
+        else:
+            # 沒有設定截圖，執行完整的頻道切換流程
+            self.current_stage = "階段F: 未設定參考畫面，執行完整頻道切換"
+            self.update_status()
+            
+            channel_positions = self.config["click_positions"]["channel"]
+            if len(channel_positions) >= 4:
+                # 依序點擊所有4個點位
+                for i, pos in enumerate(channel_positions):
+                    if pos and self.is_running and not self.is_paused:
+                        print(f"{self.log_prefix}階段F: 點擊點位{i+1} ({pos[0]}, {pos[1]})")
+                        self.click(pos[0], pos[1])
+                        time.sleep(1)
+                
+                # 頻道切換完成，重置BOSS檢測計時器
+                if hasattr(self, 'boss_check_start_time'):
+                    delattr(self, 'boss_check_start_time')
+                
+                return "A"  # 回到階段A檢查頻道切換結果
+        
+        return "F"  # 繼續在階段F，直到檢測到目標畫面
     
-    def update_crash_labels(self):
-        """更新當機檢測標籤顯示"""
-        for crash_key, label in self.crash_labels.items():
-            if crash_key in self.crash_screenshots:
-                label.config(text="已設定", foreground="green")
-                # 更新按鈕為縮圖
-                self.create_crash_thumbnail(crash_key)
+    @timed("detect_boss")
+    def detect_boss(self):
+        """檢測王怪"""
+        if self.detection_worker:
+            return self.call_detection_worker("detect_boss")
+        
+        if not self.config["detection_area"]:
+            return False
+        
+        try:
+            # 截圖檢測區域
+            bgra = self.capture.grab_bgra(self.config["detection_area"])
+            return self.evaluate_boss_frame(bgra)
+        except Exception as e:
+            print(f"王怪檢測錯誤: {e}")
+            return False
+    
+    def evaluate_boss_frame(self, bgra, progressive=None):
+        """判斷畫面中是否有BOSS訊息
+        
+        漸進模式的結果與完整掃描完全相同，只是能提前結束：
+        1. 沒有王（最常見）：每條規則只讀一個通道計算符合像素數的上限，全部不超過閾值即判定沒有王。
+           稀疏格點會漏掉比取樣間隔細的筆畫，因此取樣結果絕不用來判定沒有王。
+        2. 先在稀疏格點上計數，取樣像素是實際像素的子集，計數已超過閾值即可確定出王。
+        3. 否則依列分段掃描，累計超過閾值即出王，或所有規則即使剩下的像素全部符合也到不了
+           閾值時判定沒有王。
+        """
+        rules = self.get_boss_color_rules()
+        if progressive is None:
+            progressive = self.config.get("boss_progressive_scan", True)
+        
+        if not progressive:
+            # 所有顏色規則一次查表完成，任一規則超過自己的閾值即視為出王
+            matching_pixels = self.color_classifier.count_matches(bgra, rules)
+            return any(count > rule[3] for count, rule in zip(matching_pixels, rules))
+        
+        thresholds = [rule[3] for rule in rules]
+        upper_bounds = self.color_classifier.count_upper_bounds(bgra, rules)
+        if all(bound <= threshold for bound, threshold in zip(upper_bounds, thresholds)):
+            return False
+        
+        stride = int(self.config.get("boss_sampling_stride", 4))
+        if stride > 1 and min(bgra.shape[:2]) >= stride * 8:
+            sampled_counts = self.color_classifier.count_matches(bgra[::stride, ::stride], rules)
+            if any(count > threshold for count, threshold in zip(sampled_counts, thresholds)):
+                return True
+        
+        height, width = bgra.shape[:2]
+        band_rows = max(1, int(self.config.get("boss_scan_band_rows", 32)))
+        totals = [0] * len(rules)
+        for top in range(0, height, band_rows):
+            counts = self.color_classifier.count_matches(bgra[top:top + band_rows], rules)
+            totals = [total + count for total, count in zip(totals, counts)]
+            if any(total > threshold for total, threshold in zip(totals, thresholds)):
+                return True
+            remaining = (height - min(top + band_rows, height)) * width
+            if all(total + remaining <= threshold for total, threshold in zip(totals, thresholds)):
+                return False
+        return False
+    
+    def get_boss_color_rules(self):
+        """取得BOSS顏色規則：主要目標顏色 + 色盤中的其他顏色"""
+        rules = [("color", tuple(int(c) for c in self.config["target_color"]),
+                  int(self.config.get("color_tolerance", 50)), int(self.config["color_threshold"]))]
+        
+        for rule in self.config.get("boss_color_rules", []):
+            threshold = int(rule.get("threshold", self.config["color_threshold"]))
+            if "min" in rule and "max" in rule:
+                rules.append(("range", tuple(int(c) for c in rule["min"]), tuple(int(c) for c in rule["max"]), threshold))
             else:
-                label.config(text="未設定", foreground="red")
-                # 恢復為設定按鈕
-                if crash_key in self.crash_buttons:
-                    self.crash_buttons[crash_key].config(text="設定", command=lambda k=crash_key: self.set_crash_screenshot(k))
+                tolerance = int(rule.get("tolerance", self.config.get("color_tolerance", 50)))
+                rules.append(("color", tuple(int(c) for c in rule["color"]), tolerance, threshold))
+        
+        return rules[:ColorClassifier.MAX_RULES]
     
-    def create_crash_thumbnail(self, crash_key):
-        """創建當機檢測縮圖按鈕"""
-        if crash_key not in self.crash_screenshots:
-            return
+    @timed("detect_stage_match")
+    def detect_stage_match(self, stage_key):
+        """檢測當前畫面是否匹配指定階段"""
+        if stage_key not in self.stage_screenshots:
+            return False
+        if self.detection_worker:
+            return self.call_detection_worker("detect_stage_match", stage_key)
         
         try:
-            # 取得截圖並縮小
-            screenshot = self.crash_screenshots[crash_key]
-            
-            # 縮放圖片為縮圖大小
-            thumbnail_size = (60, 40)
-            h, w = screenshot.shape[:2]
-            
-            # 計算縮放比例
-            scale = min(thumbnail_size[0]/w, thumbnail_size[1]/h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
+            # 截取當前畫面的灰階（只在本次比對使用，重用預先配置的緩衝區）
+            current_gray = self.capture.grab_gray(self.config["detection_area"])
+            
+            # 取得目標階段預先計算的特徵（已轉灰階並縮放到擷取尺寸）
+            h, w = current_gray.shape
+            features = self.get_reference_features(stage_key, (w, h))
+            
+            # 先以雜湊預篩：明顯相同或明顯不同時直接判定，不確定時才計算SSIM
+            # dHash只看相鄰像素的明暗方向、與亮度無關，因此直接判定匹配前還要比對亮度與對比
+            if self.config.get("hash_prefilter_enabled", True):
+                distance = hash_distance(compute_dhash(current_gray), features["dhash"])
+                if (distance <= self.config.get("hash_match_distance", 10)
+                        and self.brightness_matches(current_gray, features)):
+                    self.prefilter_stats["match"] += 1
+                    print(f"階段{stage_key}匹配檢測: 雜湊距離{distance}, 預篩判定匹配")
+                    return True
+                if distance >= self.config.get("hash_reject_distance", 90):
+                    self.prefilter_stats["reject"] += 1
+                    print(f"階段{stage_key}匹配檢測: 雜湊距離{distance}, 預篩判定不匹配")
+                    return False
+                self.prefilter_stats["ssim"] += 1
             
-            # 縮放圖片
-            resized_img = cv2.resize(screenshot, (new_w, new_h))
-            
-            # 轉換為PhotoImage
-            pil_img = Image.fromarray(resized_img)
-            photo = ImageTk.PhotoImage(pil_img)
-            
-            # 更新按鈕顯示縮圖
-            button = self.crash_buttons[crash_key]
-            button.config(text="", image=photo, command=lambda k=crash_key: self.set_crash_screenshot(k))
+            # 計算相似度
+            similarity = self.calculate_image_similarity(current_gray, features)
             
-            # 綁定右鍵點擊事件
-            button.bind("<Button-3>", lambda event, k=crash_key: self.show_crash_preview(k))
+            # 從設定中取得相似度閾值
+            threshold_percent = self.config.get("stage_similarity_threshold", 80)
+            threshold = threshold_percent / 100.0  # 轉換為0-1範圍
             
-            # 保持引用避免被回收
-            if not hasattr(self, 'crash_photos'):
-                self.crash_photos = {}
-            self.crash_photos[crash_key] = photo
+            # 除錯訊息
+            print(f"階段{stage_key}匹配檢測: 相似度{similarity:.3f}, 閾值{threshold:.3f}, 匹配:{similarity > threshold}")
             
+            return similarity > threshold
         except Exception as e:
-            print(f"創建當機檢測 {crash_key} 縮圖失敗: {e}")
-            # 失敗時顯示文字
-            self.crash_buttons[crash_key].config(text="已設定", command=lambda k=crash_key: self.set_crash_screenshot(k))
+            print(f"階段匹配檢測錯誤: {e}")
+            return False
     
-    def set_crash_screenshot(self, crash_key):
-        """設定當機檢測截圖"""
-        if self.is_running:
-            messagebox.showerror("錯誤", "請先停止監控模式")
-            return
-        
-        crash_names = {
-            "disconnect": "斷線重連畫面",
-            "error": "錯誤/異常畫面", 
-            "maintenance": "維護/更新畫面",
-            "timeout": "連線逾時畫面"
+    def brightness_matches(self, current_gray, features):
+        """雜湊判定匹配的附加條件：參考截圖要有足夠紋理，且亮度與對比都接近參考截圖"""
+        if features["std"] < self.config.get("hash_match_min_contrast", 10):
+            return False  # 低紋理畫面（例如載入畫面）的雜湊幾乎沒有資訊，一律交給SSIM
+        mean, std = cv2.meanStdDev(current_gray)
+        tolerance = self.config.get("hash_match_brightness_tolerance", 12)
+        return (abs(float(mean[0, 0]) - features["mean"]) <= tolerance
+                and abs(float(std[0, 0]) - features["std"]) <= max(tolerance, features["std"] * 0.25))
+    
+    def build_reference_features(self, screenshot, size, bgr=False):
+        """預先計算參考截圖的比對特徵：灰階並縮放到擷取尺寸"""
+        if screenshot.ndim == 3 and screenshot.shape[2] == 4:
+            gray = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2GRAY if bgr else cv2.COLOR_RGBA2GRAY)
+        else:
+            gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY)
+        
+        if (gray.shape[1], gray.shape[0]) != size:
+            gray = cv2.resize(gray, size)
+        
+        gaussian = self.config.get("ssim_gaussian_weights", False)
+        mean, std = cv2.meanStdDev(gray)
+        return {
+            "size": size,
+            "gray": gray,
+            "mean": float(mean[0, 0]),
+            "std": float(std[0, 0]),
+            "dhash": compute_dhash(gray),
+            "ssim": self.ssim_scorer.prepare_reference(gray, gaussian)
         }
+    
+    def get_prefilter_summary(self):
+        """取得雜湊預篩統計摘要"""
+        stats = self.prefilter_stats
+        decided = stats["match"] + stats["reject"]
+        total = decided + stats["ssim"]
+        saved = decided / total * 100 if total else 0
+        return (f"畫面比對預篩：直接判定 {decided} 次（匹配 {stats['match']} / 不匹配 {stats['reject']}），"
+                f"SSIM {stats['ssim']} 次，節省 {saved:.0f}%")
+    
+    def get_reference_features(self, stage_key, size):
+        """取得階段參考截圖的快取特徵，快取不存在或尺寸不符時重新計算"""
+        features = self.reference_cache.get(stage_key)
+        if features is None or features["size"] != size:
+            features = self.build_reference_features(self.stage_screenshots[stage_key], size)
+            self.reference_cache[stage_key] = features
+        return features
+    
+    def get_crash_region_features(self, crash_key, size):
+        """取得當機參考截圖在王怪檢測區域範圍內的特徵（全螢幕BGR截圖裁切後轉灰階）"""
+        cache_key = f"crash_{crash_key}"
+        features = self.reference_cache.get(cache_key)
+        if features is None or features["size"] != size:
+            x1, y1, x2, y2 = self.config["detection_area"]
+            screenshot = self.crash_screenshots[crash_key]
+            if y2 > screenshot.shape[0] or x2 > screenshot.shape[1]:
+                return None
+            features = self.build_reference_features(screenshot[y1:y2, x1:x2], size, bgr=True)
+            self.reference_cache[cache_key] = features
+        return features
+    
+    def classify_frame(self, stage_keys=None, include_crash=False):
+        """以同一次擷取的畫面批次比對多張參考截圖
         
-        crash_name = crash_names.get(crash_key, f"當機類型 {crash_key}")
+        回傳依信心度 (SSIM) 由高到低排序的列表，每個項目為
+        {"type": "stage" 或 "crash", "key": 參考截圖代號, "confidence": 相似度}
+        """
+        if self.detection_worker:
+            return self.call_detection_worker("classify_frame", stage_keys, include_crash)
         
-        result = messagebox.askyesno("設定當機檢測截圖", 
-            f"即將設定 {crash_name} 的參考截圖\n\n"
-            f"請確保當前畫面顯示的是 {crash_name}\n"
-            f"點擊「是」開始截取畫面")
+        current_gray = self.capture.grab_gray(self.config["detection_area"])
+        h, w = current_gray.shape
+        
+        candidates = []
+        for stage_key in (stage_keys or list(self.stage_screenshots)):
+            if stage_key in self.stage_screenshots:
+                candidates.append(("stage", stage_key, self.get_reference_features(stage_key, (w, h))))
+        if include_crash:
+            for crash_key in list(self.crash_screenshots):
+                features = self.get_crash_region_features(crash_key, (w, h))
+                if features is not None:
+                    candidates.append(("crash", crash_key, features))
         
-        if result:
-            self.setting_crash = crash_key
-            self.capture_crash_screenshot()
-    
-    def capture_crash_screenshot(self):
-        """擷取當機檢測畫面截圖"""
         try:
-            # 隱藏主視窗避免干擾
-            self.root.withdraw()
-            time.sleep(0.5)  # 等待視窗隱藏
-            
-            # 截取全螢幕
-            screenshot = pyautogui.screenshot()
-            
-            # 轉換為OpenCV格式
-            screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-            
-            # 儲存截圖
-            self.crash_screenshots[self.setting_crash] = screenshot_cv
-            
-            # 顯示主視窗
-            self.root.deiconify()
-            
-            crash_names = {
-                "disconnect": "斷線重連畫面",
-                "error": "錯誤/異常畫面",
-                "maintenance": "維護/更新畫面", 
-                "timeout": "連線逾時畫面"
-            }
-            
-            crash_name = crash_names.get(self.setting_crash, f"當機類型 {self.setting_crash}")
-            
-            # 更新UI
-            self.update_crash_labels()
-            
-            messagebox.showinfo("截圖完成", f"{crash_name} 截圖已設定完成！")
-            
-            # 重置設定狀態
-            self.setting_crash = None
-            
+            scores = self.ssim_scorer.score_many(current_gray, [features["ssim"] for _, _, features in candidates])
         except Exception as e:
-            # 確保主視窗顯示
-            self.root.deiconify()
-            messagebox.showerror("錯誤", f"截圖失敗: {str(e)}")
-            self.setting_crash = None
+            print(f"批次畫面比對失敗: {e}")
+            return []
+        
+        ranked = [{"type": kind, "key": key, "confidence": score}
+                  for (kind, key, _), score in zip(candidates, scores)]
+        ranked.sort(key=lambda item: item["confidence"], reverse=True)
+        print("畫面分類: " + ", ".join(f"{item['key']}={item['confidence']:.3f}" for item in ranked))
+        return ranked
     
-    def show_crash_preview(self, crash_key):
-        """顯示當機檢測截圖預覽"""
-        if crash_key not in self.crash_screenshots:
+    def best_stage_match(self, ranked):
+        """從分類結果取得信心度超過階段相似度閾值的最佳項目"""
+        threshold = self.config.get("stage_similarity_threshold", 80) / 100.0
+        if ranked and ranked[0]["confidence"] > threshold:
+            return ranked[0]
+        return None
+    
+    def invalidate_reference_cache(self, stage_key=None):
+        """參考截圖或檢測區域變更時清除快取"""
+        if stage_key is None:
+            self.reference_cache = {}
+        else:
+            self.reference_cache.pop(stage_key, None)
+        if self.detection_worker:
+            self.detection_worker.needs_sync = True
+    
+    def prepare_reference_cache(self):
+        """依目前的檢測區域預先計算所有階段參考截圖的特徵"""
+        self.invalidate_reference_cache()
+        area = self.config["detection_area"]
+        if not area:
             return
         
+        size = (area[2] - area[0], area[3] - area[1])
+        for stage_key in list(self.stage_screenshots):
+            try:
+                self.get_reference_features(stage_key, size)
+            except Exception as e:
+                print(f"預先計算階段 {stage_key} 特徵失敗: {e}")
+    
+    def calculate_image_similarity(self, gray, features):
+        """計算即時灰階畫面與參考特徵的結構相似性 (SSIM)"""
         try:
-            # 創建預覽視窗
-            preview_window = tk.Toplevel(self.root)
-            preview_window.title(f"當機檢測預覽 - {crash_key}")
-            preview_window.attributes('-topmost', True)
-            
-            # 取得截圖
-            screenshot = self.crash_screenshots[crash_key]
-            
-            # 計算適當的顯示大小（最大800x600）
-            h, w = screenshot.shape[:2]
-            max_w, max_h = 800, 600
+            return self.ssim_scorer.score(gray, features["ssim"])
+        except Exception as e:
+            print(f"計算相似度失敗: {e}")
+            return 0
+    
+    def data_path(self, *parts):
+        """取得設定目錄下的檔案路徑"""
+        return os.path.join(self.base_dir, *parts)
+    
+    def load_config(self):
+        """載入設定"""
+        try:
+            config_path = self.data_path("config.json")
+            if os.path.exists(config_path):
+                with open(config_path, "r", encoding="utf-8") as f:
+                    saved_config = json.load(f)
+                    self.config.update(saved_config)
             
-            if w > max_w or h > max_h:
-                scale = min(max_w/w, max_h/h)
-                new_w = int(w * scale)
-                new_h = int(h * scale)
-                resized_img = cv2.resize(screenshot, (new_w, new_h))
-            else:
-                resized_img = screenshot
+            # 載入階段截圖
+            self.load_stage_screenshots()
             
-            # 轉換為PhotoImage
-            pil_img = Image.fromarray(resized_img)
-            photo = ImageTk.PhotoImage(pil_img)
+            # 載入當機檢測截圖
+            self.load_crash_screenshots()
+        except Exception as e:
+            print(f"載入設定失敗: {e}")
+    
+    def load_stage_screenshots(self):
+        """載入階段截圖"""
+        import os
+        
+        if not os.path.exists(self.data_path("stage_screenshots")):
+            return
+        
+        stages = ["A", "C", "D", "E", "F"]
+        for stage_key in stages:
+            screenshot_path = self.data_path("stage_screenshots", f"stage_{stage_key}.png")
+            if os.path.exists(screenshot_path):
+                try:
+                    # 載入圖片並轉換為numpy陣列
+                    pil_img = Image.open(screenshot_path)
+                    screenshot = np.array(pil_img)
+                    self.stage_screenshots[stage_key] = screenshot
+                    print(f"已載入階段 {stage_key} 截圖")
+                except Exception as e:
+                    print(f"載入階段 {stage_key} 截圖失敗: {e}")
+        
+        # 載入後立即計算比對特徵，監控時每次只需處理即時畫面
+        self.prepare_reference_cache()
+    
+    def load_crash_screenshots(self):
+        """載入當機檢測截圖"""
+        import os
+        
+        if not os.path.exists(self.data_path("crash_screenshots")):
+            return
+        
+        crash_types = ["disconnect", "error", "maintenance", "timeout"]
+        for crash_key in crash_types:
+            screenshot_path = self.data_path("crash_screenshots", f"crash_{crash_key}.png")
+            if os.path.exists(screenshot_path):
+                try:
+                    # 載入圖片並轉換為numpy陣列
+                    pil_img = Image.open(screenshot_path)
+                    screenshot = np.array(pil_img)
+                    self.crash_screenshots[crash_key] = screenshot
+                    print(f"已載入當機檢測 {crash_key} 截圖")
+                except Exception as e:
+                    print(f"載入當機檢測 {crash_key} 截圖失敗: {e}")
+    
+    def take_full_screenshot(self):
+        """截取全螢幕"""
+        return self.capture.grab_rgb(None)
+    
+    def take_area_screenshot(self, area_coords):
+        """截取指定區域（回傳獨立的RGB陣列，可安全保存）"""
+        if not area_coords:
+            return self.take_full_screenshot()
+        
+        return self.capture.grab_rgb(area_coords)
+    
+    def calculate_screen_change(self, img1, img2):
+        """計算兩張圖片的變化程度"""
+        try:
+            # 調整大小以加速比較
+            h1, w1 = img1.shape[:2]
+            h2, w2 = img2.shape[:2]
             
-            # 顯示圖片
-            label = ttk.Label(preview_window, image=photo)
-            label.pack(padx=10, pady=10)
+            if h1 != h2 or w1 != w2:
+                img2 = cv2.resize(img2, (w1, h1))
             
-            # 保持引用
-            label.image = photo
+            # 轉換為灰階（支援RGB截圖、BGRA擷取畫面與已是灰階的輸入）
+            gray1 = self.to_gray(img1)
+            gray2 = self.to_gray(img2)
             
-            # 關閉按鈕
-            close_btn = ttk.Button(preview_window, text="關閉", command=preview_window.destroy)
-            close_btn.pack(pady=5)
+            # 計算差異
+            diff = cv2.absdiff(gray1, gray2)
             
-        except Exception as e:
-            messagebox.showerror("錯誤", f"無法顯示預覽: {str(e)}")
-    
-    def set_detection_area(self):
-        """設定王怪檢測區域"""
-        messagebox.showinfo("區域選擇", "請用滑鼠拖曳選擇王怪檢測區域\n按ESC取消選擇")
-        self.select_area("detection")
+            # 計算變化像素比例
+            total_pixels = diff.size
+            changed_pixels = np.count_nonzero(diff > 30)  # 閾值30
+            
+            return changed_pixels / total_pixels
+        except:
+            return 0
     
-    def set_channel_area(self):
-        """設定頻道檢測區域"""
-        messagebox.showinfo("區域選擇", "請用滑鼠拖曳選擇頻道檢測區域\n按ESC取消選擇")
-        self.select_area("channel")
+    def to_gray(self, image):
+        """將RGB/BGRA/灰階影像轉為灰階"""
+        if image.ndim == 2:
+            return image
+        if image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+class GameMonitor(MonitorEngine):
+    """Tkinter圖形介面"""
     
-    def select_area(self, area_type):
-        """選擇螢幕區域"""
-        self.root.withdraw()  # 隱藏主視窗
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Artale找Boss神器")
         
-        # 創建全螢幕選擇視窗
-        selection_window = tk.Toplevel()
-        selection_window.attributes('-fullscreen', True)
-        selection_window.attributes('-alpha', 0.3)
-        selection_window.configure(bg='black')
-        selection_window.attributes('-topmost', True)
+        # 設定視窗永遠在最上層
+        self.root.attributes('-topmost', True)
         
-        # 建立畫布
-        canvas = tk.Canvas(selection_window, highlightthickness=0)
-        canvas.pack(fill=tk.BOTH, expand=True)
+        # 引擎狀態與設定（含載入設定檔與參考截圖）
+        super().__init__()
         
-        # 顯示提示訊息
-        screen_width = selection_window.winfo_screenwidth()
-        screen_height = selection_window.winfo_screenheight()
+        # 階段/當機截圖設定狀態
+        self.setting_stage = None
+        self.setting_crash = None
         
-        instruction_text = "請拖曳滑鼠選擇區域 (按ESC取消)"
-        canvas.create_text(screen_width//2, 50, text=instruction_text, 
-                          fill='white', font=('Arial', 16))
+        # 滴管取色狀態
+        self.eyedropper_active = False
         
-        # 選擇狀態變數
-        start_x = start_y = end_x = end_y = 0
-        selection_rect = None
-        is_selecting = False
+        # BOSS檢測測試狀態
+        self.boss_test_active = False
+        self.boss_test_thread = None
         
-        def on_button_press(event):
-            nonlocal start_x, start_y, is_selecting, selection_rect
-            start_x, start_y = event.x, event.y
-            is_selecting = True
-            if selection_rect:
-                canvas.delete(selection_rect)
+        # 工作執行緒的介面更新先放入信箱，由Tk執行緒以固定頻率套用最新狀態
+        self.ui_mailbox = LatestStateMailbox()
+        self.shown_status = None
         
-        def on_mouse_drag(event):
-            nonlocal end_x, end_y, selection_rect
-            if is_selecting:
-                end_x, end_y = event.x, event.y
-                if selection_rect:
-                    canvas.delete(selection_rect)
-                
-                # 繪製選擇框
-                selection_rect = canvas.create_rectangle(
-                    start_x, start_y, end_x, end_y,
-                    outline='red', width=2, fill='red', stipple='gray50'
-                )
-                
-                # 顯示座標資訊
-                canvas.delete("coords_info")
-                coords_text = f"({start_x}, {start_y}) -> ({end_x}, {end_y})"
-                canvas.create_text(screen_width//2, screen_height-50, 
-                                 text=coords_text, fill='white', 
-                                 font=('Arial', 12), tags="coords_info")
+        # 設定視窗位置並建立介面
+        self.load_window_geometry()
+        self.create_widgets()
+        self.setup_hotkeys()
+        self.root.after(self.config.get("ui_refresh_interval_ms", 100), self.drain_ui_updates)
         
-        def on_button_release(event):
-            nonlocal is_selecting
-            if is_selecting:
-                is_selecting = False
-                # 確保座標順序正確
-                x1, y1 = min(start_x, end_x), min(start_y, end_y)
-                x2, y2 = max(start_x, end_x), max(start_y, end_y)
-                
-                if abs(x2 - x1) > 10 and abs(y2 - y1) > 10:  # 確保選擇區域夠大
-                    coords = (x1, y1, x2, y2)
-                    if area_type == "detection":
-                        self.config["detection_area"] = coords
-                        area_name = "王怪檢測"
-                    else:
-                        self.config["channel_area"] = coords
-                        area_name = "頻道檢測"
-                    
-                    selection_window.destroy()
-                    self.root.deiconify()  # 顯示主視窗
-                    self.update_area_labels()  # 更新區域狀態顯示
-                    messagebox.showinfo("設定完成", 
-                                      f"{area_name}區域已設定\n座標: {coords}")
-                else:
-                    canvas.create_text(screen_width//2, screen_height//2, 
-                                     text="選擇區域太小，請重新選擇", 
-                                     fill='yellow', font=('Arial', 14))
+        # 啟動Telegram Bot與指標端點（在config載入後）
+        self.start_services()
         
-        def on_escape(event):
-            selection_window.destroy()
-            self.root.deiconify()  # 顯示主視窗
+        # 綁定視窗關閉事件
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # 綁定事件
-        canvas.bind("<Button-1>", on_button_press)
-        canvas.bind("<B1-Motion>", on_mouse_drag)
-        canvas.bind("<ButtonRelease-1>", on_button_release)
-        selection_window.bind("<Escape>", on_escape)
-        selection_window.focus_set()
+    def create_widgets(self):
+        # 主框架
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        # 滑鼠游標樣式
-        canvas.configure(cursor="crosshair")
-    
-    def choose_color(self):
-        """選擇目標顏色"""
-        color = colorchooser.askcolor(title="選擇BOSS訊息顏色", initialcolor=self.config["target_color"])
-        if color[0]:
-            self.config["target_color"] = tuple(int(c) for c in color[0])
-            self.update_color_display()
-    
-    def start_eyedropper(self):
-        """開始滴管取色"""
-        if self.is_running:
-            messagebox.showerror("錯誤", "請先停止監控模式")
-            return
+        # 可收合區塊狀態 - 從設定載入
+        self.section_collapsed = self.config.get("section_collapsed", {
+            "status": False,
+            "control": False,
+            "telegram": False,
+            "area": False,
+            "stage": True,  # 預設收合
+            "crash": True,  # 預設收合
+            "color": True,  # 預設收合
+            "position": True  # 預設收合
+        })
         
-        self.eyedropper_active = True
-        self.eyedropper_btn.config(text="點擊位置取色", style="Accent.TButton")
+        # 狀態顯示
+        self.create_collapsible_section(main_frame, "status", "系統狀態", 0, self.create_status_widgets)
         
-        messagebox.showinfo("滴管取色", "請移動滑鼠到要取色的位置，然後點擊滑鼠左鍵")
+        # 控制按鈕
+        self.create_collapsible_section(main_frame, "control", "系統控制", 1, self.create_control_widgets)
         
-        # 設定滑鼠點擊監聽
-        def on_click(x, y, button, pressed):
-            if self.eyedropper_active and pressed and button.name == 'left':
-                color = self.get_pixel_color(x, y)
-                if color:
-                    self.config["target_color"] = color
-                    self.update_color_display()
-                    self.root.after(100, lambda: messagebox.showinfo("取色完成", 
-                        f"已取得顏色 RGB{color}\n位置: ({x}, {y})"))
-                
-                # 停止取色模式
-                self.stop_eyedropper_mode()
-                return False  # 停止監聽
+        # Telegram設定
+        self.create_collapsible_section(main_frame, "telegram", "Telegram 設定", 2, self.create_telegram_widgets)
         
-        # 啟動滑鼠監聽
-        try:
-            from pynput import mouse
-            self.eyedropper_mouse_listener = mouse.Listener(on_click=on_click)
-            self.eyedropper_mouse_listener.start()
-        except Exception as e:
-            print(f"滑鼠監聽啟動失敗: {e}")
-            self.stop_eyedropper_mode()
-    
-    def stop_eyedropper_mode(self):
-        """停止滴管取色模式"""
-        self.eyedropper_active = False
-        self.eyedropper_btn.config(text="滴管取色", style="TButton")
+        # 區域設定
+        self.create_collapsible_section(main_frame, "area", "區域設定", 3, self.create_area_widgets)
         
-        if hasattr(self, 'eyedropper_mouse_listener'):
-            try:
-                self.eyedropper_mouse_listener.stop()
-            except:
-                pass
-    
-    def get_pixel_color(self, x, y):
-        """取得指定位置的像素顏色"""
-        try:
-            # 使用pyautogui作為主要方法
-            pixel = pyautogui.screenshot().getpixel((x, y))
-            print(f"取色成功: 位置({x}, {y}) RGB{pixel}")
-            return pixel
-        except Exception as e:
-            print(f"pyautogui取色失敗: {e}")
-            # 使用mss作為備用方法
-            try:
-                with mss.mss() as sct:
-                    monitor = {"top": y, "left": x, "width": 1, "height": 1}
-                    screenshot = sct.grab(monitor)
-                    pixel = screenshot.pixel(0, 0)
-                    r, g, b = pixel[2], pixel[1], pixel[0]  # BGRA to RGB
-                    print(f"mss備用取色成功: RGB({r}, {g}, {b})")
-                    return (r, g, b)
-            except Exception as e2:
-                print(f"mss備用取色也失敗: {e2}")
-                return (0, 0, 0)
-    
-    def update_color_display(self):
-        """更新顏色顯示"""
-        color = self.config["target_color"]
+        # 階段設定
+        self.create_collapsible_section(main_frame, "stage", "階段設定(點擊右鍵看大圖)", 4, self.create_stage_widgets)
         
-        # 更新按鈕文字
-        self.color_btn.config(text=f"RGB{color}")
+        # 當機檢測設定
+        self.create_collapsible_section(main_frame, "crash", "當機檢測設定(點擊右鍵看大圖)", 5, self.create_crash_widgets)
         
-        # 更新RGB標籤
-        self.rgb_label.config(text=f"({color[0]}, {color[1]}, {color[2]})")
+        # BOSS訊息判斷設定
+        self.create_collapsible_section(main_frame, "color", "BOSS訊息判斷設定", 6, self.create_color_widgets)
         
-        # 更新顏色預覽
-        self.update_color_preview()
-    
-    def update_color_preview(self):
-        """更新顏色預覽"""
-        color = self.config["target_color"]
-        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-        self.color_preview.config(bg=hex_color)
-    
-    def start_realtime_preview(self):
-        """開始即時顏色預覽"""
-        def update_realtime():
-            try:
-                if hasattr(self, 'realtime_color_preview') and self.realtime_color_preview.winfo_exists():
-                    x, y = pyautogui.position()
-                    color = self.get_pixel_color_simple(x, y)
-                    if color:
-                        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-                        self.realtime_color_preview.config(bg=hex_color)
-                    
-                    # 每300ms更新一次 (平衡性能和流暢度)
-                    self.root.after(300, update_realtime)
-            except:
-                # 發生錯誤時重試
-                self.root.after(1000, update_realtime)
+        # 點位設定
+        self.create_collapsible_section(main_frame, "position", "點擊設定", 7, self.create_position_widgets)
         
-        # 延遲500ms開始，確保界面完全載入
-        self.root.after(500, update_realtime)
-    
-    def get_pixel_color_simple(self, x, y):
-        """簡化的取色方法，專用於即時預覽"""
-        try:
-            # 使用pyautogui快速取色
-            pixel = pyautogui.screenshot().getpixel((x, y))
-            return pixel
-        except:
-            return (255, 255, 255)  # 失敗時返回白色
+        # 底部按鈕
+        bottom_frame = ttk.Frame(main_frame)
+        bottom_frame.grid(row=8, column=0, columnspan=2, pady=10)
+        
+        ttk.Button(bottom_frame, text="儲存設定", command=self.save_config).grid(row=0, column=0, padx=5)
+        ttk.Button(bottom_frame, text="重新設定", command=self.reset_config).grid(row=0, column=1, padx=5)
+        ttk.Button(bottom_frame, text="取消點擊設定", command=self.cancel_position_recording).grid(row=0, column=2, padx=5)
+        
+        self.update_position_labels()
+        self.update_area_labels()
+        self.update_stage_labels()
+        self.update_crash_labels()
     
-    def test_boss_detection(self):
-        """測試BOSS檢測功能"""
-        if self.is_running or self.boss_test_active:
-            messagebox.showerror("錯誤", "請先停止監控或測試模式")
-            return
+    def create_collapsible_section(self, parent, section_id, title, row, content_creator):
+        """創建可收合的區塊"""
+        # 主框架
+        section_frame = ttk.Frame(parent)
+        section_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=2)
         
-        # 檢查設定完整性
-        if not self.config["detection_area"]:
-            messagebox.showerror("設定錯誤", "請先設定王怪檢測區域")
-            return
+        # 標題框架
+        title_frame = ttk.Frame(section_frame)
+        title_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        section_frame.grid_columnconfigure(0, weight=1)
         
-        # 更新設定值
-        try:
-            self.config["color_threshold"] = int(self.threshold_entry.get())
-            self.config["color_tolerance"] = int(self.color_tolerance_entry.get())
-        except ValueError:
-            messagebox.showerror("設定錯誤", "請輸入有效的數值")
-            return
+        # 收合按鈕
+        collapsed = self.section_collapsed[section_id]
+        button_text = "▶" if collapsed else "▼"
+        toggle_btn = tk.Button(title_frame, text=button_text, width=2, 
+                              command=lambda: self.toggle_section(section_id))
+        toggle_btn.grid(row=0, column=0, padx=5)
         
-        # 開始測試
-        self.boss_test_active = True
-        self.boss_test_btn.config(text="測試中...", state="disabled")
+        # 標題
+        title_label = ttk.Label(title_frame, text=title, font=('Arial', 10, 'bold'))
+        title_label.grid(row=0, column=1, sticky=tk.W, padx=5)
         
-        messagebox.showinfo("開始測試", "將在5秒內檢測王怪區域是否符合BOSS設定\n請確保遊戲畫面可見")
+        # 內容框架
+        content_frame = ttk.LabelFrame(section_frame, text="", padding="5")
+        if not collapsed:
+            content_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=2)
         
-        # 啟動測試執行緒
-        self.boss_test_thread = threading.Thread(target=self.run_boss_test, daemon=True)
-        self.boss_test_thread.start()
+        # 儲存引用
+        setattr(self, f"{section_id}_toggle_btn", toggle_btn)
+        setattr(self, f"{section_id}_content_frame", content_frame)
+        
+        # 創建內容
+        content_creator(content_frame)
     
-    def run_boss_test(self):
-        """執行BOSS檢測測試 - 5秒內檢測王怪區域"""
-        test_duration = 5  # 測試5秒
-        check_interval = 0.2  # 每0.2秒檢測一次
-        start_time = time.time()
-        boss_detected = False
-        detection_time = None
+    def toggle_section(self, section_id):
+        """切換區塊收合狀態"""
+        self.section_collapsed[section_id] = not self.section_collapsed[section_id]
+        collapsed = self.section_collapsed[section_id]
         
-        try:
-            # 更新狀態顯示
-            for i in range(5, 0, -1):
-                if not self.boss_test_active:
-                    break
-                    
-                self.root.after(0, lambda seconds=i: self.update_test_status(f"測試中... 剩餘 {seconds} 秒"))
-                
-                # 在這1秒內檢測5次
-                for j in range(5):
-                    if not self.boss_test_active:
-                        break
-                        
-                    # 執行BOSS檢測
-                    if self.detect_boss():
-                        boss_detected = True
-                        detection_time = time.time() - start_time
-                        break
-                    
-                    time.sleep(0.2)
-                
-                if boss_detected:
-                    break
-            
-            # 更新UI必須在主執行緒中
-            if boss_detected:
-                self.root.after(0, lambda: self.show_test_result(True, detection_time))
-            else:
-                self.root.after(0, lambda: self.show_test_result(False))
-                
-        except Exception as e:
-            print(f"測試過程發生錯誤: {e}")
-            self.root.after(0, lambda: self.show_test_result(False, error_msg=str(e)))
+        # 更新按鈕文字
+        toggle_btn = getattr(self, f"{section_id}_toggle_btn")
+        toggle_btn.config(text="▶" if collapsed else "▼")
         
-        # 重置測試狀態
-        self.boss_test_active = False
-        self.root.after(0, self.reset_boss_test_button)
-    
-    def update_test_status(self, status_text):
-        """更新測試狀態顯示"""
-        self.boss_test_btn.config(text=status_text)
-    
-    def show_test_result(self, detected, detection_time=None, error_msg=None):
-        """顯示測試結果"""
-        if error_msg:
-            messagebox.showerror("測試錯誤", f"測試過程發生錯誤:\n{error_msg}")
-        elif detected:
-            # 取得當前設定值顯示
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            result_msg = f"✅ 偵測到BOSS！\n\n"
-            result_msg += f"檢測時間: {timestamp}\n"
-            if detection_time:
-                result_msg += f"偵測用時: {detection_time:.1f} 秒\n"
-            result_msg += f"目標顏色: RGB{self.config['target_color']}\n"
-            result_msg += f"顏色容差: {self.config['color_tolerance']}\n"
-            result_msg += f"像素閾值: {self.config['color_threshold']}\n\n"
-            result_msg += "✓ 當前設定可以成功檢測到BOSS訊息"
-            
-            messagebox.showinfo("測試結果", result_msg)
+        # 顯示/隱藏內容
+        content_frame = getattr(self, f"{section_id}_content_frame")
+        if collapsed:
+            content_frame.grid_remove()
         else:
-            result_msg = f"❌ 5秒內未偵測到BOSS\n\n"
-            result_msg += f"測試時間: 5秒 (完整測試)\n"
-            result_msg += f"目標顏色: RGB{self.config['target_color']}\n"
-            result_msg += f"顏色容差: {self.config['color_tolerance']}\n"
-            result_msg += f"像素閾值: {self.config['color_threshold']}\n"
-            result_msg += f"檢測區域: {self.config['detection_area']}\n\n"
-            result_msg += "建議調整:\n"
-            result_msg += "• 檢查目標顏色是否正確 (使用滴管取色)\n"
-            result_msg += "• 增加顏色容差值 (建議50-100)\n"
-            result_msg += "• 降低像素閾值 (建議50-200)\n"
-            result_msg += "• 確認王怪檢測區域包含BOSS訊息\n"
-            result_msg += "• 確保測試時遊戲畫面中有BOSS訊息"
-            
-            messagebox.showwarning("測試結果", result_msg)
+            content_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=2)
+        
+        # 自動保存收合狀態
+        self.save_ui_state()
     
-    def reset_boss_test_button(self):
-        """重置測試按鈕狀態"""
-        self.boss_test_btn.config(text="測試BOSS檢測", state="normal")
+    def create_status_widgets(self, parent):
+        """創建狀態顯示組件"""
+        self.status_label = ttk.Label(parent, text=f"目前狀態: {self.current_stage}")
+        self.status_label.grid(row=0, column=0, sticky=tk.W)
+        
+        self.metrics_label = ttk.Label(parent, text=self.metrics.format_brief(), foreground="gray")
+        self.metrics_label.grid(row=1, column=0, sticky=tk.W)
+        self.root.after(2000, self.refresh_metrics)
     
-    def test_telegram(self):
-        """測試Telegram通知"""
-        chat_id = self.chat_id_entry.get().strip()
-        if not chat_id:
-            messagebox.showerror("錯誤", "請輸入聊天室ID")
-            return
+    def create_control_widgets(self, parent):
+        """創建控制按鈕組件"""
         
-        success = self.send_telegram_message(chat_id, "測試訊息：系統運作正常！")
-        if success:
-            messagebox.showinfo("成功", "Telegram通知測試成功！")
-        else:
-            messagebox.showerror("失敗", "Telegram通知測試失敗，請檢查聊天室ID")
+        self.start_stop_btn = ttk.Button(parent, text="開始", command=self.toggle_start_stop)
+        self.start_stop_btn.grid(row=0, column=0, padx=5)
+        
+        self.pause_continue_btn = ttk.Button(parent, text="暫停", command=self.toggle_pause_continue, state="disabled")
+        self.pause_continue_btn.grid(row=0, column=1, padx=5)
     
-    def send_telegram_message(self, chat_id, message):
-        """發送Telegram訊息"""
-        try:
-            url = f"https://api.telegram.org/bot{self.config['telegram_bot_token']}/sendMessage"
-            data = {
-                "chat_id": chat_id,
-                "text": message
-            }
-            response = requests.post(url, data=data, timeout=10)
-            return response.status_code == 200
-        except Exception as e:
-            print(f"Telegram發送失敗: {e}")
-            return False
-    
-    def toggle_start_stop(self):
-        """開始/停止按鈕"""
-        if not self.is_running:
-            # 停止測試模式
-            if self.boss_test_active:
-                self.boss_test_active = False
-                self.reset_boss_test_button()
-            
-            # 檢查設定完整性
-            if not self.validate_config():
-                return
-            
-            self.is_running = True
-            self.start_stop_btn.config(text="停止")
-            self.pause_continue_btn.config(state="normal")
-            self.current_stage = "啟動中"
-            self.update_status()
-            
-            # 重置BOSS檢測計時器
-            if hasattr(self, 'boss_check_start_time'):
-                delattr(self, 'boss_check_start_time')
-            
-            # 開始監控執行緒
-            self.monitoring_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
-            self.monitoring_thread.start()
-        else:
-            self.is_running = False
-            self.is_paused = False
-            self.start_stop_btn.config(text="開始")
-            self.pause_continue_btn.config(text="暫停", state="disabled")
-            self.current_stage = "已停止"
-            self.update_status()
-    
-    def toggle_pause_continue(self):
-        """暫停/繼續按鈕"""
-        if not self.is_paused:
-            self.is_paused = True
-            self.pause_continue_btn.config(text="繼續")
-            self.current_stage = "已暫停"
-        else:
-            self.is_paused = False
-            self.pause_continue_btn.config(text="暫停")
-            self.current_stage = "運行中"
-        self.update_status()
+    def create_telegram_widgets(self, parent):
+        """創建Telegram設定組件"""
+        ttk.Label(parent, text="聊天室 ID:").grid(row=0, column=0, sticky=tk.W)
+        self.chat_id_entry = ttk.Entry(parent, width=20)
+        self.chat_id_entry.grid(row=0, column=1, padx=5)
+        self.chat_id_entry.insert(0, self.config["telegram_chat_id"])
+        
+        ttk.Button(parent, text="測試通知", command=self.test_telegram).grid(row=0, column=2, padx=5)
     
-    def update_status(self):
-        """更新狀態顯示"""
-        # 檢測狀態變化並更新時間記錄
-        if self.current_stage != self.last_stage_name:
-            self.current_stage_start_time = time.time()
-            self.last_stage_name = self.current_stage
-            self.timeout_notified_for_current_stage = False  # 重置超時通知狀態
-            print(f"狀態變更: {self.current_stage}")
+    def create_area_widgets(self, parent):
+        """創建區域設定組件"""
+        ttk.Button(parent, text="設定王怪檢測區域", command=self.set_detection_area).grid(row=0, column=0, padx=5, pady=2)
+        ttk.Button(parent, text="設定頻道檢測區域", command=self.set_channel_area).grid(row=0, column=1, padx=5, pady=2)
         
-        # 檢查階段停留超時
-        self.check_stage_timeout()
+        # 區域狀態顯示
+        ttk.Label(parent, text="王怪檢測區域:").grid(row=1, column=0, sticky=tk.W)
+        self.detection_area_label = ttk.Label(parent, text="未設定", foreground="red")
+        self.detection_area_label.grid(row=1, column=1, sticky=tk.W, padx=5)
         
-        self.status_label.config(text=f"目前狀態: {self.current_stage}")
+        ttk.Label(parent, text="頻道檢測區域:").grid(row=2, column=0, sticky=tk.W)
+        self.channel_area_label = ttk.Label(parent, text="未設定", foreground="red")
+        self.channel_area_label.grid(row=2, column=1, sticky=tk.W, padx=5)
     
-    def check_stage_timeout(self):
-        """檢查階段停留超時"""
-        try:
-            # 檢查是否啟用超時通知
-            if not self.config.get("stage_timeout_enabled", True):
-                return
-            
-            # 如果已經通知過當前階段，跳過
-            if self.timeout_notified_for_current_stage:
-                return
-            
-            # 計算當前階段停留時間
-            current_time = time.time()
-            elapsed_time = current_time - self.current_stage_start_time
-            timeout_threshold = self.config.get("stage_timeout_seconds", 300)
+    def create_stage_widgets(self, parent):
+        """創建階段設定組件"""
+        # 相似度閾值設定
+        similarity_frame = tk.Frame(parent)
+        similarity_frame.grid(row=0, column=0, columnspan=6, sticky=(tk.W, tk.E), padx=5, pady=5)
+        
+        ttk.Label(similarity_frame, text="畫面相似度閾值:").grid(row=0, column=0, sticky=tk.W)
+        self.stage_similarity_entry = ttk.Entry(similarity_frame, width=10)
+        self.stage_similarity_entry.grid(row=0, column=1, padx=5)
+        # 如果設定中沒有這個值，使用預設值80%
+        similarity_threshold = self.config.get("stage_similarity_threshold", 80)
+        self.stage_similarity_entry.insert(0, str(similarity_threshold))
+        
+        # 說明標籤
+        similarity_help = ttk.Label(similarity_frame, text="(0-100%, 值越高越嚴格)", font=('Arial', 8), foreground="gray")
+        similarity_help.grid(row=0, column=2, sticky=tk.W, padx=5)
+        
+        # 階段按鈕區域
+        self.stage_labels = {}
+        self.stage_buttons = {}
+        self.stage_thumbnails = {}
+        stages = [
+            ("A", "頻道切換成功畫面"),
+            ("C", "登入畫面"),
+            ("D", "角色選擇畫面"),
+            ("E", "遊戲內畫面"),
+            ("F", "頻道切換目標畫面")
+        ]
+        
+        for i, (stage_key, stage_name) in enumerate(stages):
+            row = (i // 2) + 1  # 從第1行開始，第0行是閾值設定
+            col = i % 2
+            base_col = col * 3
             
-            # 檢查是否超時
-            if elapsed_time > timeout_threshold:
-                self.send_stage_timeout_notification(elapsed_time, timeout_threshold)
-                self.timeout_notified_for_current_stage = True
-                self.last_timeout_notification_time = current_time
-                
-        except Exception as e:
-            print(f"❌ 檢查階段超時失敗: {e}")
-    
-    def send_stage_timeout_notification(self, elapsed_time, threshold_time):
-        """發送階段超時通知"""
-        try:
-            # 格式化時間顯示
-            elapsed_str = self.format_duration_for_timeout(elapsed_time)
-            threshold_str = self.format_duration_for_timeout(threshold_time)
+            # 階段標籤
+            stage_label = ttk.Label(parent, text=f"階段{stage_key}: {stage_name}")
+            stage_label.grid(row=row, column=base_col, sticky=tk.W, padx=5, pady=2)
             
-            # 構建通知訊息
-            message = f"""⚠️ 階段停留過久
-
-目前階段：{self.current_stage}
-停留時間：{elapsed_str}
-設定閾值：{threshold_str}
-
-時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
+            # 設定按鈕或縮圖
+            self.stage_buttons[stage_key] = ttk.Button(parent, text="設定", 
+                                                     command=lambda k=stage_key: self.set_stage_screenshot(k))
+            self.stage_buttons[stage_key].grid(row=row, column=base_col+1, padx=5, pady=2)
             
-            # 發送Telegram通知
-            if hasattr(self, 'telegram_bot') and self.telegram_bot:
-                chat_id = self.config.get("telegram_chat_id", "")
-                if chat_id:
-                    self.telegram_bot.send_message(message)
-                    print(f"✅ 已發送階段超時通知: {self.current_stage}")
-                else:
-                    print("⚠️ 未設定Telegram Chat ID，無法發送超時通知")
-            else:
-                print("⚠️ Telegram Bot未初始化，無法發送超時通知")
-                
-        except Exception as e:
-            print(f"❌ 發送階段超時通知失敗: {e}")
-    
-    def format_duration_for_timeout(self, seconds):
-        """格式化超時時間顯示"""
-        if seconds < 60:
-            return f"{int(seconds)}秒"
-        elif seconds < 3600:
-            minutes = int(seconds // 60)
-            remaining_seconds = int(seconds % 60)
-            if remaining_seconds > 0:
-                return f"{minutes}分{remaining_seconds}秒"
-            else:
-                return f"{minutes}分鐘"
-        else:
-            hours = int(seconds // 3600)
-            remaining_minutes = int((seconds % 3600) // 60)
-            if remaining_minutes > 0:
-                return f"{hours}小時{remaining_minutes}分鐘"
-            else:
-                return f"{hours}小時"
+            # 狀態標籤
+            self.stage_labels[stage_key] = ttk.Label(parent, text="未設定", foreground="red")
+            self.stage_labels[stage_key].grid(row=row, column=base_col+2, sticky=tk.W, padx=5, pady=2)
     
-    def validate_config(self):
-        """驗證設定完整性"""
-        chat_id = self.chat_id_entry.get().strip()
-        if not chat_id:
-            messagebox.showerror("設定錯誤", "請設定Telegram聊天室ID")
-            return False
+    def create_crash_widgets(self, parent):
+        """創建當機檢測設定組件"""
+        # 相似度閾值設定
+        similarity_frame = tk.Frame(parent)
+        similarity_frame.grid(row=0, column=0, columnspan=6, sticky=(tk.W, tk.E), padx=5, pady=5)
         
-        if not self.config["detection_area"]:
-            messagebox.showerror("設定錯誤", "請設定王怪檢測區域")
-            return False
+        ttk.Label(similarity_frame, text="當機畫面相似度閾值:").grid(row=0, column=0, sticky=tk.W)
+        self.crash_similarity_entry = ttk.Entry(similarity_frame, width=10)
+        self.crash_similarity_entry.grid(row=0, column=1, padx=5)
+        # 如果設定中沒有這個值，使用預設值85%
+        crash_similarity_threshold = self.config.get("crash_similarity_threshold", 85)
+        self.crash_similarity_entry.insert(0, str(crash_similarity_threshold))
         
-        if not self.config["click_positions"]["login"]:
-            messagebox.showerror("設定錯誤", "請設定登入按鈕位置")
-            return False
+        # 說明標籤
+        similarity_help = ttk.Label(similarity_frame, text="(0-100%, 值越高越嚴格)", font=('Arial', 8), foreground="gray")
+        similarity_help.grid(row=0, column=2, sticky=tk.W, padx=5)
         
-        return True
-    
-    def monitoring_loop(self):
-        """主要監控循環"""
-        self.config["telegram_chat_id"] = self.chat_id_entry.get().strip()
-        self.config["color_threshold"] = int(self.threshold_entry.get())
-        self.config["auto_channel_switch_after_boss"] = self.boss_behavior_var.get()
+        # 當機檢測開關
+        check_frame = tk.Frame(similarity_frame)
+        check_frame.grid(row=0, column=3, padx=10)
+        
+        self.crash_detection_var = tk.BooleanVar()
+        crash_detection_enabled = self.config.get("crash_detection_enabled", True)
+        self.crash_detection_var.set(crash_detection_enabled)
         
-        stage = "A"  # 從階段A開始（頻道切換成功確認）
+        crash_check = ttk.Checkbutton(check_frame, text="啟用當機檢測", 
+                                     variable=self.crash_detection_var)
+        crash_check.grid(row=0, column=0)
         
-        while self.is_running:
-            if self.is_paused:
-                time.sleep(0.1)
-                continue
+        # 當機畫面設定按鈕區域
+        self.crash_labels = {}
+        self.crash_buttons = {}
+        crash_types = [
+            ("disconnect", "斷線重連畫面"),
+            ("error", "錯誤/異常畫面"),
+            ("maintenance", "維護/更新畫面"),
+            ("timeout", "連線逾時畫面")
+        ]
+        
+        for i, (crash_key, crash_name) in enumerate(crash_types):
+            row = (i // 2) + 1  # 從第1行開始，第0行是閾值設定
+            col = i % 2
+            base_col = col * 3
             
-            try:
-                if stage == "A":
-                    stage = self.stage_a()
-                elif stage == "C":
-                    stage = self.stage_c()
-                elif stage == "D":
-                    stage = self.stage_d()
-                elif stage == "E":
-                    stage = self.stage_e()
-                elif stage == "F":
-                    stage = self.stage_f()
-                
-                time.sleep(0.5)  # 縮短基本延遲，提高響應速度
-            except Exception as e:
-                print(f"監控循環錯誤: {e}")
-                self.current_stage = f"階段{stage}: 發生錯誤 - {str(e)}"
-                self.update_status()
-                time.sleep(1)
+            # 當機類型標籤
+            crash_label = ttk.Label(parent, text=f"{crash_name}:")
+            crash_label.grid(row=row, column=base_col, sticky=tk.W, padx=5, pady=2)
+            
+            # 設定按鈕或縮圖
+            self.crash_buttons[crash_key] = ttk.Button(parent, text="設定", 
+                                                     command=lambda k=crash_key: self.set_crash_screenshot(k))
+            self.crash_buttons[crash_key].grid(row=row, column=base_col+1, padx=5, pady=2)
+            
+            # 狀態標籤
+            self.crash_labels[crash_key] = ttk.Label(parent, text="未設定", foreground="red")
+            self.crash_labels[crash_key].grid(row=row, column=base_col+2, sticky=tk.W, padx=5, pady=2)
     
-    def stage_a(self):
-        """階段A: 頻道切換成功確認"""
-        self.current_stage = "階段A: 檢查是否為頻道切換成功畫面"
-        self.update_status()
+    def create_color_widgets(self, parent):
+        """創建BOSS訊息判斷設定組件"""
+        ttk.Label(parent, text="目標顏色:").grid(row=0, column=0, sticky=tk.W)
         
-        # 檢查是否有階段A的截圖設定
-        if "A" in self.stage_screenshots:
-            # 檢測當前畫面是否匹配階段A
-            if self.detect_stage_match("A"):
-                self.current_stage = "階段A: ✓ 匹配頻道切換成功畫面"
-                self.update_status()
-                time.sleep(1)
-                return "C"
-            else:
-                self.current_stage = "階段A: ✗ 不匹配頻道切換成功畫面，繼續檢查"
-                self.update_status()
-        else:
-            self.current_stage = "階段A: 未設定參考畫面，跳過檢查"
-            self.update_status()
+        # 顏色按鈕框架
+        color_frame = tk.Frame(parent)
+        color_frame.grid(row=0, column=1, columnspan=2, padx=5, sticky=tk.W)
         
-        # 沒有匹配，等待一段時間後重新檢查
-        time.sleep(2)
-        return "A"  # 繼續停留在階段A檢查
+        self.color_btn = ttk.Button(color_frame, text="選擇顏色", command=self.choose_color)
+        self.color_btn.grid(row=0, column=0, padx=2)
+        
+        self.eyedropper_btn = ttk.Button(color_frame, text="滴管取色", command=self.start_eyedropper)
+        self.eyedropper_btn.grid(row=0, column=1, padx=2)
+        
+        # 顏色預覽
+        self.color_preview = tk.Label(color_frame, text="    ", width=4, height=1, relief="solid", borderwidth=1)
+        self.color_preview.grid(row=0, column=2, padx=5)
+        self.update_color_preview()
+        
+        # 即時顏色預覽
+        self.realtime_color_preview = tk.Label(color_frame, text="    ", width=4, height=1, relief="solid", borderwidth=1, bg="white")
+        self.realtime_color_preview.grid(row=0, column=3, padx=5)
+        
+        # 標籤說明
+        tk.Label(parent, text="設定顏色:", font=('Arial', 8)).grid(row=6, column=0, sticky=tk.W)
+        tk.Label(parent, text="滑鼠顏色:", font=('Arial', 8)).grid(row=6, column=1, sticky=tk.W)
+        
+        # 啟動即時顏色更新
+        self.start_realtime_preview()
+        
+        ttk.Label(parent, text="像素閾值:").grid(row=1, column=0, sticky=tk.W)
+        self.threshold_entry = ttk.Entry(parent, width=10)
+        self.threshold_entry.grid(row=1, column=1, padx=5)
+        self.threshold_entry.insert(0, str(self.config["color_threshold"]))
+        
+        # 顏色相似度閾值
+        ttk.Label(parent, text="顏色容差:").grid(row=2, column=0, sticky=tk.W)
+        self.color_tolerance_entry = ttk.Entry(parent, width=10)
+        self.color_tolerance_entry.grid(row=2, column=1, padx=5)
+        # 如果設定中沒有這個值，使用預設值50
+        color_tolerance = self.config.get("color_tolerance", 50)
+        self.color_tolerance_entry.insert(0, str(color_tolerance))
+        
+        # 說明標籤
+        tolerance_help = ttk.Label(parent, text="(0-255, 值越大越寬鬆)", font=('Arial', 8), foreground="gray")
+        tolerance_help.grid(row=2, column=2, sticky=tk.W, padx=5)
+        
+        # 測試按鈕
+        self.boss_test_btn = ttk.Button(parent, text="測試BOSS檢測", command=self.test_boss_detection)
+        self.boss_test_btn.grid(row=3, column=0, columnspan=2, pady=5)
+        
+        # BOSS檢測延遲設定
+        ttk.Label(parent, text="無BOSS切換延遲:").grid(row=4, column=0, sticky=tk.W)
+        self.boss_wait_entry = ttk.Entry(parent, width=10)
+        self.boss_wait_entry.grid(row=4, column=1, padx=5)
+        # 如果設定中沒有這個值，使用預設值30秒
+        boss_wait_time = self.config.get("boss_wait_time", 30)
+        self.boss_wait_entry.insert(0, str(boss_wait_time))
+        
+        # 延遲說明標籤
+        wait_help = ttk.Label(parent, text="(秒，無BOSS時多久後切換頻道)", font=('Arial', 8), foreground="gray")
+        wait_help.grid(row=4, column=2, sticky=tk.W, padx=5)
+        
+        # BOSS後行為設定
+        ttk.Label(parent, text="檢測到BOSS後:").grid(row=5, column=0, sticky=tk.W)
+        self.boss_behavior_var = tk.BooleanVar()
+        auto_switch_after_boss = self.config.get("auto_channel_switch_after_boss", True)
+        self.boss_behavior_var.set(auto_switch_after_boss)
+        
+        behavior_frame = tk.Frame(parent)
+        behavior_frame.grid(row=5, column=1, columnspan=2, sticky=tk.W, padx=5)
+        
+        auto_radio = ttk.Radiobutton(behavior_frame, text="5秒後自動切換頻道", 
+                                   variable=self.boss_behavior_var, value=True)
+        auto_radio.grid(row=0, column=0, sticky=tk.W)
+        
+        manual_radio = ttk.Radiobutton(behavior_frame, text="暫停等待手動繼續", 
+                                     variable=self.boss_behavior_var, value=False)
+        manual_radio.grid(row=1, column=0, sticky=tk.W)
+        
+        # 階段超時設定
+        ttk.Label(parent, text="階段超時時間:").grid(row=6, column=0, sticky=tk.W)
+        self.stage_timeout_entry = ttk.Entry(parent, width=10)
+        self.stage_timeout_entry.grid(row=6, column=1, sticky=tk.W, padx=5)
+        # 載入現有設定（轉換為分鐘顯示）
+        timeout_minutes = self.config.get("stage_timeout_seconds", 300) // 60
+        self.stage_timeout_entry.insert(0, str(timeout_minutes))
+        
+        # 階段超時說明標籤
+        timeout_help = ttk.Label(parent, text="(分鐘，階段停留過久時發送通知)", font=('Arial', 8), foreground="gray")
+        timeout_help.grid(row=6, column=2, sticky=tk.W, padx=5)
+        
+        # 顏色資訊顯示
+        ttk.Label(parent, text="RGB值:").grid(row=7, column=0, sticky=tk.W)
+        self.rgb_label = ttk.Label(parent, text=f"({self.config['target_color'][0]}, {self.config['target_color'][1]}, {self.config['target_color'][2]})")
+        self.rgb_label.grid(row=7, column=1, sticky=tk.W, padx=5)
+        
+        # 色盤：漸層的BOSS訊息可加入多個顏色，任一顏色超過閾值即判定出王
+        ttk.Label(parent, text="色盤:").grid(row=8, column=0, sticky=(tk.W, tk.N))
+        self.palette_listbox = tk.Listbox(parent, height=4, width=36)
+        self.palette_listbox.grid(row=8, column=1, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        
+        palette_frame = tk.Frame(parent)
+        palette_frame.grid(row=9, column=1, columnspan=2, sticky=tk.W, padx=5)
+        ttk.Button(palette_frame, text="加入目前顏色", command=self.add_current_color_to_palette).grid(row=0, column=0, padx=2)
+        self.palette_eyedropper_btn = ttk.Button(palette_frame, text="滴管加入色盤",
+                                                 command=lambda: self.start_eyedropper(append_to_palette=True))
+        self.palette_eyedropper_btn.grid(row=0, column=1, padx=2)
+        ttk.Button(palette_frame, text="刪除選取", command=self.remove_palette_color).grid(row=0, column=2, padx=2)
+        
+        palette_help = ttk.Label(parent, text="(加入時使用目前的顏色容差與像素閾值)", font=('Arial', 8), foreground="gray")
+        palette_help.grid(row=10, column=1, columnspan=2, sticky=tk.W, padx=5)
+        
+        self.update_palette_list()
     
-    def stage_c(self):
-        """階段C: 等待登入畫面出現"""
-        # 檢查是否有階段C的截圖設定
-        if "C" in self.stage_screenshots:
-            # 檢測當前畫面是否匹配階段C（登入畫面）
-            if self.detect_stage_match("C"):
-                self.current_stage = "階段C: ✓ 檢測到登入畫面，執行登入點擊"
-                self.update_status()
-                
-                # 確認是登入畫面，執行登入點擊
-                login_pos = self.config["click_positions"]["login"]
-                if login_pos:
-                    pyautogui.click(login_pos[0], login_pos[1])
-                    time.sleep(2)
-                    return "D"  # 進入階段D等待角色選擇畫面
-                else:
-                    self.current_stage = "階段C: 未設定登入按鈕位置"
-                    self.update_status()
-                    time.sleep(2)
-                    return "C"
-            else:
-                self.current_stage = "階段C: 等待登入畫面出現"
-                self.update_status()
-        else:
-            # 沒有設定截圖，假設已經是登入畫面，直接點擊登入
-            self.current_stage = "階段C: 未設定參考畫面，執行登入點擊"
-            self.update_status()
-            
-            login_pos = self.config["click_positions"]["login"]
-            if login_pos:
-                pyautogui.click(login_pos[0], login_pos[1])
-                time.sleep(2)
-                return "D"
+    def create_position_widgets(self, parent):
+        """創建點位設定組件"""
+        self.position_labels = {}
+        self.position_buttons = {}
+        positions = [
+            ("login", "登入按鈕"),
+            ("character", "角色選擇"),
+            ("channel_1", "頻道切換-1"),
+            ("channel_2", "頻道切換-2"),
+            ("channel_3", "頻道切換-3"),
+            ("channel_4", "頻道切換-4")
+        ]
         
-        # 等待登入畫面出現
-        time.sleep(1)
-        return "C"
+        for i, (key, label) in enumerate(positions):
+            row = i
+            # 標籤
+            ttk.Label(parent, text=f"{label}:").grid(row=row, column=0, sticky=tk.W, padx=5, pady=2)
+            
+            # 設定按鈕
+            self.position_buttons[key] = ttk.Button(parent, text="設定", 
+                                                   command=lambda k=key: self.start_position_recording(k))
+            self.position_buttons[key].grid(row=row, column=1, padx=5, pady=2)
+            
+            # 狀態標籤
+            self.position_labels[key] = ttk.Label(parent, text="未設定", foreground="red")
+            self.position_labels[key].grid(row=row, column=2, sticky=tk.W, padx=5, pady=2)
     
-    def stage_d(self):
-        """階段D: 等待角色選擇畫面出現"""
-        # 檢查是否有階段D的截圖設定
-        if "D" in self.stage_screenshots:
-            # 檢測當前畫面是否匹配階段D（角色選擇畫面）
-            if self.detect_stage_match("D"):
-                self.current_stage = "階段D: ✓ 檢測到角色選擇畫面，執行角色點擊"
-                self.update_status()
-                
-                # 確認是角色選擇畫面，執行角色點擊
-                char_pos = self.config["click_positions"]["character"]
-                if char_pos:
-                    pyautogui.click(char_pos[0], char_pos[1])
-                    time.sleep(2)
-                    return "E"  # 進入階段E進行BOSS檢測
-                else:
-                    self.current_stage = "階段D: 未設定角色選擇按鈕位置"
-                    self.update_status()
-                    time.sleep(2)
-                    return "D"
+    def setup_hotkeys(self):
+        """設定熱鍵和滑鼠監聽"""
+        self.recording_position = None
+        self.position_recording_active = False
+        # 設定滑鼠監聽器
+        try:
+            from pynput import mouse
+            self.mouse_listener = mouse.Listener(on_click=self.on_mouse_click)
+            self.mouse_listener.start()
+            print("滑鼠監聽器已啟動")
+        except ImportError:
+            print("pynput not installed, using alternative method")
+        except Exception as e:
+            print(f"滑鼠監聽器啟動失敗: {e}")
+    
+    def start_position_recording(self, position_key):
+        """開始記錄指定位置"""
+        if self.is_running:
+            messagebox.showerror("錯誤", "請先停止監控模式")
+            return
+        
+        self.recording_position = position_key
+        self.position_recording_active = True
+        
+        # 更新按鈕狀態
+        for key, btn in self.position_buttons.items():
+            if key == position_key:
+                btn.config(text="點擊目標", style="Accent.TButton")
             else:
-                # 檢查是否還在上個階段（階段C）
-                if "C" in self.stage_screenshots and self.detect_stage_match("C"):
-                    self.current_stage = "階段D: 檢測到仍在登入畫面，執行登入點擊"
-                    self.update_status()
-                    
-                    # 還在登入畫面，執行登入點擊
-                    login_pos = self.config["click_positions"]["login"]
-                    if login_pos:
-                        pyautogui.click(login_pos[0], login_pos[1])
-                        time.sleep(2)
-                    return "D"  # 繼續等待角色選擇畫面
-                else:
-                    self.current_stage = "階段D: 等待角色選擇畫面出現"
-                    self.update_status()
-        else:
-            # 沒有設定截圖，假設已經是角色選擇畫面，直接點擊角色
-            self.current_stage = "階段D: 未設定參考畫面，執行角色點擊"
-            self.update_status()
-            
-            char_pos = self.config["click_positions"]["character"]
-            if char_pos:
-                pyautogui.click(char_pos[0], char_pos[1])
-                time.sleep(2)
-                return "E"
+                btn.config(state="disabled")
         
-        # 等待角色選擇畫面出現
-        time.sleep(1)
-        return "D"
+        # 顯示提示
+        position_names = {
+            "login": "登入按鈕",
+            "character": "角色選擇",
+            "channel_1": "頻道切換-1",
+            "channel_2": "頻道切換-2", 
+            "channel_3": "頻道切換-3",
+            "channel_4": "頻道切換-4"
+        }
+        
+        messagebox.showinfo("設定點位", 
+            f"正在設定 {position_names[position_key]} 位置\n\n"
+            f"請將滑鼠移動到目標位置，然後點擊滑鼠左鍵記錄位置")
     
-    def stage_e(self):
-        """階段E: 專心BOSS檢測，不被中斷"""
-        # 直接進行BOSS檢測，不進行任何畫面匹配判斷
-        if self.detect_boss():
-            # 重置計時器 (檢測到BOSS後重新開始計時)
-            if hasattr(self, 'boss_check_start_time'):
-                delattr(self, 'boss_check_start_time')
+    def on_mouse_click(self, x, y, button, pressed):
+        """滑鼠點擊事件處理"""
+        # 只處理左鍵按下事件
+        if not pressed:
+            return
             
-            # 發送通知
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            message = f"BOSS出現！\n時間: {timestamp}"
-            
-            self.send_telegram_message(self.config["telegram_chat_id"], message)
+        # 檢查是否為左鍵
+        try:
+            if button.name != 'left':
+                return
+        except:
+            # 如果無法取得button.name，檢查button值
+            if str(button) != 'Button.left':
+                return
+        
+        # 檢查是否在點位記錄模式
+        if not self.position_recording_active or not self.recording_position:
+            return
+        
+        print(f"滑鼠點擊偵測: 位置({x}, {y}), 記錄位置: {self.recording_position}")
             
-            # 檢查是否要自動進入頻道切換
-            auto_switch = self.config.get("auto_channel_switch_after_boss", True)
+        # 記錄點擊位置
+        if self.recording_position in ["login", "character"]:
+            self.config["click_positions"][self.recording_position] = (x, y)
+        elif self.recording_position.startswith("channel_"):
+            index = int(self.recording_position.split("_")[1]) - 1
+            while len(self.config["click_positions"]["channel"]) <= index:
+                self.config["click_positions"]["channel"].append(None)
+            self.config["click_positions"]["channel"][index] = (x, y)
+        
+        # 重置狀態
+        self.position_recording_active = False
+        current_position = self.recording_position
+        self.recording_position = None
+        
+        # 更新UI - 使用 after 方法在主執行緒中執行
+        self.root.after(100, self.update_position_labels)
+        self.root.after(100, self.reset_position_buttons)
+        
+        # 顯示結果
+        position_names = {
+            "login": "登入按鈕",
+            "character": "角色選擇",
+            "channel_1": "頻道切換-1",
+            "channel_2": "頻道切換-2", 
+            "channel_3": "頻道切換-3",
+            "channel_4": "頻道切換-4"
+        }
+        
+        # 使用 after 方法在主執行緒中顯示對話框
+        def show_success():
+            try:
+                messagebox.showinfo("設定完成", 
+                    f"{position_names[current_position]} 位置已設定\n座標: ({x}, {y})")
+            except Exception as e:
+                print(f"顯示對話框錯誤: {e}")
+        
+        self.root.after(200, show_success)
+    
+    def reset_position_buttons(self):
+        """重置點位設定按鈕狀態"""
+        for key, btn in self.position_buttons.items():
+            btn.config(text="設定", style="TButton", state="normal")
+    
+    def update_position_labels(self):
+        """更新位置標籤顯示"""
+        login_pos = self.config["click_positions"]["login"]
+        if login_pos:
+            self.position_labels["login"].config(text=f"({login_pos[0]}, {login_pos[1]})", foreground="green")
+        
+        char_pos = self.config["click_positions"]["character"]
+        if char_pos:
+            self.position_labels["character"].config(text=f"({char_pos[0]}, {char_pos[1]})", foreground="green")
+        
+        for i in range(4):
+            key = f"channel_{i+1}"
+            if i < len(self.config["click_positions"]["channel"]) and self.config["click_positions"]["channel"][i]:
+                pos = self.config["click_positions"]["channel"][i]
+                self.position_labels[key].config(text=f"({pos[0]}, {pos[1]})", foreground="green")
+    
+    def update_area_labels(self):
+        """更新區域標籤顯示"""
+        if self.config["detection_area"]:
+            coords = self.config["detection_area"]
+            self.detection_area_label.config(text=f"({coords[0]}, {coords[1]}) -> ({coords[2]}, {coords[3]})", foreground="green")
+        else:
+            self.detection_area_label.config(text="未設定", foreground="red")
             
-            if auto_switch:
-                # 自動模式：發送通知並暫停等待5秒
-                self.is_paused = True
-                self.pause_continue_btn.config(text="繼續", style="Accent.TButton")
-                self.current_stage = "檢測到BOSS！已暫停，5秒後自動切換頻道..."
-                self.update_status()
-                
-                # 等待5秒倒數
-                for i in range(5, 0, -1):
-                    if not self.is_running:
-                        return "E"
-                    if not self.is_paused:  # 如果用戶手動點擊繼續，提前結束等待
-                        break
-                    self.current_stage = f"檢測到BOSS！已暫停，{i}秒後自動切換頻道..."
-                    self.update_status()
-                    time.sleep(1)
-                
-                # 自動恢復並進入頻道切換
-                self.is_paused = False
-                self.pause_continue_btn.config(text="暫停", style="TButton")
-                return "F"  # 進入頻道切換
-            else:
-                # 手動模式：暫停等待使用者點繼續
-                self.is_paused = True
-                self.pause_continue_btn.config(text="繼續", style="Accent.TButton")
-                self.current_stage = "檢測到BOSS - 請打完後點繼續"
-                self.update_status()
-                
-                # 等待使用者點繼續
-                while self.is_paused and self.is_running:
-                    time.sleep(0.1)
-                
-                self.pause_continue_btn.config(style="TButton")
-                return "F"
+        if self.config["channel_area"]:
+            coords = self.config["channel_area"]
+            self.channel_area_label.config(text=f"({coords[0]}, {coords[1]}) -> ({coords[2]}, {coords[3]})", foreground="green")
         else:
-            # 沒有檢測到BOSS，計時邏輯
-            if not hasattr(self, 'boss_check_start_time'):
-                self.boss_check_start_time = time.time()
-                
-            elapsed = time.time() - self.boss_check_start_time
-            wait_time = self.config.get("boss_wait_time", 30)
-            remaining = max(0, wait_time - elapsed)
+            self.channel_area_label.config(text="未設定", foreground="red")
+    
+    def update_stage_labels(self):
+        """更新階段標籤顯示"""
+        for stage_key, label in self.stage_labels.items():
+            if stage_key in self.stage_screenshots:
+                label.config(text="已設定", foreground="green")
+                # 更新按鈕為縮圖
+                self.create_stage_thumbnail(stage_key)
+            else:
+                label.config(text="未設定", foreground="red")
+                # 恢復為設定按鈕
+                if stage_key in self.stage_buttons:
+                    self.stage_buttons[stage_key].config(text="設定", command=lambda k=stage_key: self.set_stage_screenshot(k))
+    
+    def create_stage_thumbnail(self, stage_key):
+        """創建階段縮圖按鈕"""
+        if stage_key not in self.stage_screenshots:
+            return
+        
+        try:
+            # 取得截圖並縮小
+            screenshot = self.stage_screenshots[stage_key]
             
-            if remaining > 0:
-                self.current_stage = f"階段E: 專心BOSS檢測中... 無BOSS還有 {remaining:.0f} 秒切頻道"
-                self.update_status()
-                time.sleep(0.1)  # 快速檢測間隔，每0.1秒檢測一次
-                return "E"
+            # 縮放圖片為縮圖大小
+            thumbnail_size = (60, 40)
+            h, w = screenshot.shape[:2]
+            
+            # 計算縮放比例
+            scale = min(thumbnail_size[0]/w, thumbnail_size[1]/h)
+            new_w = int(w * scale)
+            new_h = int(h * scale)
+            
+            # 縮放圖片
+            resized_img = cv2.resize(screenshot, (new_w, new_h))
+            
+            # 轉換為PhotoImage
+            pil_img = Image.fromarray(resized_img)
+            photo = ImageTk.PhotoImage(pil_img)
+            
+            # 更新按鈕顯示縮圖
+            button = self.stage_buttons[stage_key]
+            button.config(text="", image=photo, command=lambda k=stage_key: self.set_stage_screenshot(k))
+            
+            # 綁定右鍵點擊事件
+            button.bind("<Button-3>", lambda event, k=stage_key: self.show_stage_preview(k))
+            
+            # 保持引用避免被回收
+            if not hasattr(self, 'stage_photos'):
+                self.stage_photos = {}
+            self.stage_photos[stage_key] = photo
+            
+        except Exception as e:
+            print(f"創建階段 {stage_key} 縮圖失敗: {e}")
+            # 失敗時顯示文字
+            self.stage_buttons[stage_key].config(text="已設定", command=lambda k=stage_key: self.set_stage_screenshot(k))
+    
+    def update_crash_labels(self):
+        """更新當機檢測標籤顯示"""
+        for crash_key, label in self.crash_labels.items():
+            if crash_key in self.crash_screenshots:
+                label.config(text="已設定", foreground="green")
+                # 更新按鈕為縮圖
+                self.create_crash_thumbnail(crash_key)
             else:
-                # 超過等待時間，切換頻道
-                if hasattr(self, 'boss_check_start_time'):
-                    delattr(self, 'boss_check_start_time')
-                return "F"
+                label.config(text="未設定", foreground="red")
+                # 恢復為設定按鈕
+                if crash_key in self.crash_buttons:
+                    self.crash_buttons[crash_key].config(text="設定", command=lambda k=crash_key: self.set_crash_screenshot(k))
+    
+    def create_crash_thumbnail(self, crash_key):
+        """創建當機檢測縮圖按鈕"""
+        if crash_key not in self.crash_screenshots:
+            return
         
-        return "E"  # 繼續在階段E檢測BOSS
-        # 檢查是否有階段E的截圖設定
-        if "E" in self.stage_screenshots:
-            # 檢測當前畫面是否匹配階段E（遊戲內畫面）
-            if self.detect_stage_match("E"):
-                self.current_stage = "階段E: ✓ 檢測到遊戲內畫面，開始BOSS檢測"
-                self.update_status()
-                
-                # 確認在遊戲內，進行BOSS檢測
-                if self.detect_boss():
-                    # 重置計時器 (檢測到BOSS後重新開始計時)
-                    if hasattr(self, 'boss_check_start_time'):
-                        delattr(self, 'boss_check_start_time')
-                    
-                    # 發送通知
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    message = f"BOSS出現！\n時間: {timestamp}"
-                    
-                    self.send_telegram_message(self.config["telegram_chat_id"], message)
-                    
-                    # 檢查是否要自動進入頻道切換
-                    auto_switch = self.config.get("auto_channel_switch_after_boss", True)
-                    
-                    if auto_switch:
-                        # 自動模式：發送通知並暫停等待5秒
-                        self.is_paused = True
-                        self.pause_continue_btn.config(text="繼續", style="Accent.TButton")
-                        self.current_stage = "檢測到BOSS！已暫停，5秒後自動切換頻道..."
-                        self.update_status()
-                        
-                        # 等待5秒倒數
-                        for i in range(5, 0, -1):
-                            if not self.is_running:
-                                return "E"
-                            if not self.is_paused:  # 如果用戶手動點擊繼續，提前結束等待
-                                break
-                            self.current_stage = f"檢測到BOSS！已暫停，{i}秒後自動切換頻道..."
-                            self.update_status()
-                            time.sleep(1)
-                        
-                        # 自動恢復並進入頻道切換
-                        self.is_paused = False
-                        self.pause_continue_btn.config(text="暫停", style="TButton")
-                        return "F"  # 進入頻道切換
-                    else:
-                        # 手動模式：暫停等待使用者點繼續
-                        self.is_paused = True
-                        self.pause_continue_btn.config(text="繼續", style="Accent.TButton")
-                        self.current_stage = "檢測到BOSS - 請打完後點繼續"
-                        self.update_status()
-                        
-                        # 等待使用者點繼續
-                        while self.is_paused and self.is_running:
-                            time.sleep(0.1)
-                        
-                        self.pause_continue_btn.config(style="TButton")
-                        return "F"
-                
-                # 沒有檢測到BOSS，檢查是否達到等待時間
-                if not hasattr(self, 'boss_check_start_time'):
-                    self.boss_check_start_time = time.time()
+        try:
+            # 取得截圖並縮小
+            screenshot = self.crash_screenshots[crash_key]
+            
+            # 縮放圖片為縮圖大小
+            thumbnail_size = (60, 40)
+            h, w = screenshot.shape[:2]
+            
+            # 計算縮放比例
+            scale = min(thumbnail_size[0]/w, thumbnail_size[1]/h)
+            new_w = int(w * scale)
+            new_h = int(h * scale)
+            
+            # 縮放圖片
+            resized_img = cv2.resize(screenshot, (new_w, new_h))
+            
+            # 轉換為PhotoImage
+            pil_img = Image.fromarray(resized_img)
+            photo = ImageTk.PhotoImage(pil_img)
+            
+            # 更新按鈕顯示縮圖
+            button = self.crash_buttons[crash_key]
+            button.config(text="", image=photo, command=lambda k=crash_key: self.set_crash_screenshot(k))
+            
+            # 綁定右鍵點擊事件
+            button.bind("<Button-3>", lambda event, k=crash_key: self.show_crash_preview(k))
+            
+            # 保持引用避免被回收
+            if not hasattr(self, 'crash_photos'):
+                self.crash_photos = {}
+            self.crash_photos[crash_key] = photo
+            
+        except Exception as e:
+            print(f"創建當機檢測 {crash_key} 縮圖失敗: {e}")
+            # 失敗時顯示文字
+            self.crash_buttons[crash_key].config(text="已設定", command=lambda k=crash_key: self.set_crash_screenshot(k))
+    
+    def set_crash_screenshot(self, crash_key):
+        """設定當機檢測截圖"""
+        if self.is_running:
+            messagebox.showerror("錯誤", "請先停止監控模式")
+            return
+        
+        crash_names = {
+            "disconnect": "斷線重連畫面",
+            "error": "錯誤/異常畫面", 
+            "maintenance": "維護/更新畫面",
+            "timeout": "連線逾時畫面"
+        }
+        
+        crash_name = crash_names.get(crash_key, f"當機類型 {crash_key}")
+        
+        result = messagebox.askyesno("設定當機檢測截圖", 
+            f"即將設定 {crash_name} 的參考截圖\n\n"
+            f"請確保當前畫面顯示的是 {crash_name}\n"
+            f"點擊「是」開始截取畫面")
+        
+        if result:
+            self.setting_crash = crash_key
+            self.capture_crash_screenshot()
+    
+    def capture_crash_screenshot(self):
+        """擷取當機檢測畫面截圖"""
+        try:
+            # 隱藏主視窗避免干擾
+            self.root.withdraw()
+            time.sleep(0.5)  # 等待視窗隱藏
+            
+            # 截取全螢幕
+            screenshot = pyautogui.screenshot()
+            
+            # 轉換為OpenCV格式
+            screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            
+            # 儲存截圖
+            self.crash_screenshots[self.setting_crash] = screenshot_cv
+            self.invalidate_reference_cache(f"crash_{self.setting_crash}")
+            self.invalidate_reference_cache(f"crash_hash_{self.setting_crash}")
+            
+            # 顯示主視窗
+            self.root.deiconify()
+            
+            crash_names = {
+                "disconnect": "斷線重連畫面",
+                "error": "錯誤/異常畫面",
+                "maintenance": "維護/更新畫面", 
+                "timeout": "連線逾時畫面"
+            }
+            
+            crash_name = crash_names.get(self.setting_crash, f"當機類型 {self.setting_crash}")
+            
+            # 更新UI
+            self.update_crash_labels()
+            
+            messagebox.showinfo("截圖完成", f"{crash_name} 截圖已設定完成！")
+            
+            # 重置設定狀態
+            self.setting_crash = None
+            
+        except Exception as e:
+            # 確保主視窗顯示
+            self.root.deiconify()
+            messagebox.showerror("錯誤", f"截圖失敗: {str(e)}")
+            self.setting_crash = None
+    
+    def show_crash_preview(self, crash_key):
+        """顯示當機檢測截圖預覽"""
+        if crash_key not in self.crash_screenshots:
+            return
+        
+        try:
+            # 創建預覽視窗
+            preview_window = tk.Toplevel(self.root)
+            preview_window.title(f"當機檢測預覽 - {crash_key}")
+            preview_window.attributes('-topmost', True)
+            
+            # 取得截圖
+            screenshot = self.crash_screenshots[crash_key]
+            
+            # 計算適當的顯示大小（最大800x600）
+            h, w = screenshot.shape[:2]
+            max_w, max_h = 800, 600
+            
+            if w > max_w or h > max_h:
+                scale = min(max_w/w, max_h/h)
+                new_w = int(w * scale)
+                new_h = int(h * scale)
+                resized_img = cv2.resize(screenshot, (new_w, new_h))
+            else:
+                resized_img = screenshot
+            
+            # 轉換為PhotoImage
+            pil_img = Image.fromarray(resized_img)
+            photo = ImageTk.PhotoImage(pil_img)
+            
+            # 顯示圖片
+            label = ttk.Label(preview_window, image=photo)
+            label.pack(padx=10, pady=10)
+            
+            # 保持引用
+            label.image = photo
+            
+            # 關閉按鈕
+            close_btn = ttk.Button(preview_window, text="關閉", command=preview_window.destroy)
+            close_btn.pack(pady=5)
+            
+        except Exception as e:
+            messagebox.showerror("錯誤", f"無法顯示預覽: {str(e)}")
+    
+    def set_detection_area(self):
+        """設定王怪檢測區域"""
+        messagebox.showinfo("區域選擇", "請用滑鼠拖曳選擇王怪檢測區域\n按ESC取消選擇")
+        self.select_area("detection")
+    
+    def set_channel_area(self):
+        """設定頻道檢測區域"""
+        messagebox.showinfo("區域選擇", "請用滑鼠拖曳選擇頻道檢測區域\n按ESC取消選擇")
+        self.select_area("channel")
+    
+    def select_area(self, area_type):
+        """選擇螢幕區域"""
+        self.root.withdraw()  # 隱藏主視窗
+        
+        # 創建全螢幕選擇視窗
+        selection_window = tk.Toplevel()
+        selection_window.attributes('-fullscreen', True)
+        selection_window.attributes('-alpha', 0.3)
+        selection_window.configure(bg='black')
+        selection_window.attributes('-topmost', True)
+        
+        # 建立畫布
+        canvas = tk.Canvas(selection_window, highlightthickness=0)
+        canvas.pack(fill=tk.BOTH, expand=True)
+        
+        # 顯示提示訊息
+        screen_width = selection_window.winfo_screenwidth()
+        screen_height = selection_window.winfo_screenheight()
+        
+        instruction_text = "請拖曳滑鼠選擇區域 (按ESC取消)"
+        canvas.create_text(screen_width//2, 50, text=instruction_text, 
+                          fill='white', font=('Arial', 16))
+        
+        # 選擇狀態變數
+        start_x = start_y = end_x = end_y = 0
+        selection_rect = None
+        is_selecting = False
+        
+        def on_button_press(event):
+            nonlocal start_x, start_y, is_selecting, selection_rect
+            start_x, start_y = event.x, event.y
+            is_selecting = True
+            if selection_rect:
+                canvas.delete(selection_rect)
+        
+        def on_mouse_drag(event):
+            nonlocal end_x, end_y, selection_rect
+            if is_selecting:
+                end_x, end_y = event.x, event.y
+                if selection_rect:
+                    canvas.delete(selection_rect)
                 
-                elapsed_time = time.time() - self.boss_check_start_time
-                wait_time = self.config.get("boss_wait_time", 30)
+                # 繪製選擇框
+                selection_rect = canvas.create_rectangle(
+                    start_x, start_y, end_x, end_y,
+                    outline='red', width=2, fill='red', stipple='gray50'
+                )
                 
-                remaining_time = max(0, int(wait_time - elapsed_time))
-                self.current_stage = f"階段E: BOSS檢測中 ({remaining_time}秒後切換頻道)"
-                self.update_status()
+                # 顯示座標資訊
+                canvas.delete("coords_info")
+                coords_text = f"({start_x}, {start_y}) -> ({end_x}, {end_y})"
+                canvas.create_text(screen_width//2, screen_height-50, 
+                                 text=coords_text, fill='white', 
+                                 font=('Arial', 12), tags="coords_info")
+        
+        def on_button_release(event):
+            nonlocal is_selecting
+            if is_selecting:
+                is_selecting = False
+                # 確保座標順序正確
+                x1, y1 = min(start_x, end_x), min(start_y, end_y)
+                x2, y2 = max(start_x, end_x), max(start_y, end_y)
                 
-                if elapsed_time >= wait_time:
-                    # 重置計時器，準備下一輪檢測
-                    self.boss_check_start_time = time.time()
-                    return "F"  # 進入頻道切換
-            else:
-                # 檢查是否還在上個階段（階段D）
-                if "D" in self.stage_screenshots and self.detect_stage_match("D"):
-                    self.current_stage = "階段E: 檢測到仍在角色選擇畫面，執行角色點擊"
-                    self.update_status()
+                if abs(x2 - x1) > 10 and abs(y2 - y1) > 10:  # 確保選擇區域夠大
+                    coords = (x1, y1, x2, y2)
+                    if area_type == "detection":
+                        self.config["detection_area"] = coords
+                        self.prepare_reference_cache()  # 擷取尺寸改變，重新計算參考特徵
+                        area_name = "王怪檢測"
+                    else:
+                        self.config["channel_area"] = coords
+                        area_name = "頻道檢測"
                     
-                    # 還在角色選擇畫面，執行角色點擊
-                    char_pos = self.config["click_positions"]["character"]
-                    if char_pos:
-                        pyautogui.click(char_pos[0], char_pos[1])
-                        time.sleep(2)
-                    return "E"  # 繼續等待進入遊戲
+                    selection_window.destroy()
+                    self.root.deiconify()  # 顯示主視窗
+                    self.update_area_labels()  # 更新區域狀態顯示
+                    messagebox.showinfo("設定完成", 
+                                      f"{area_name}區域已設定\n座標: {coords}")
                 else:
-                    self.current_stage = "階段E: 等待進入遊戲內畫面"
-                    self.update_status()
-        else:
-            # 沒有設定截圖，直接進行BOSS檢測
-            self.current_stage = "階段E: 未設定參考畫面，直接進行BOSS檢測"
-            self.update_status()
-            
-            # 進行BOSS檢測
-            if self.detect_boss():
-                # 重置計時器
-                if hasattr(self, 'boss_check_start_time'):
-                    delattr(self, 'boss_check_start_time')
-                
-                # 發送通知並暫停
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                message = f"BOSS出現！\n時間: {timestamp}"
-                
-                self.send_telegram_message(self.config["telegram_chat_id"], message)
-                
-                # 自動暫停，等待使用者繼續
-                self.is_paused = True
-                self.pause_continue_btn.config(text="繼續", style="Accent.TButton")
-                self.current_stage = "檢測到BOSS - 請打完後點繼續"
-                self.update_status()
-                
-                # 等待使用者點繼續
-                while self.is_paused and self.is_running:
-                    time.sleep(0.1)
+                    canvas.create_text(screen_width//2, screen_height//2, 
+                                     text="選擇區域太小，請重新選擇", 
+                                     fill='yellow', font=('Arial', 14))
+        
+        def on_escape(event):
+            selection_window.destroy()
+            self.root.deiconify()  # 顯示主視窗
+        
+        # 綁定事件
+        canvas.bind("<Button-1>", on_button_press)
+        canvas.bind("<B1-Motion>", on_mouse_drag)
+        canvas.bind("<ButtonRelease-1>", on_button_release)
+        selection_window.bind("<Escape>", on_escape)
+        selection_window.focus_set()
+        
+        # 滑鼠游標樣式
+        canvas.configure(cursor="crosshair")
+    
+    def choose_color(self):
+        """選擇目標顏色"""
+        color = colorchooser.askcolor(title="選擇BOSS訊息顏色", initialcolor=self.config["target_color"])
+        if color[0]:
+            self.config["target_color"] = tuple(int(c) for c in color[0])
+            self.update_color_display()
+    
+    def start_eyedropper(self, append_to_palette=False):
+        """開始滴管取色（append_to_palette=True 時取得的顏色加入色盤）"""
+        if self.is_running:
+            messagebox.showerror("錯誤", "請先停止監控模式")
+            return
+        
+        if append_to_palette and not self.check_palette_capacity():
+            return
+        
+        self.eyedropper_active = True
+        eyedropper_btn = self.palette_eyedropper_btn if append_to_palette else self.eyedropper_btn
+        eyedropper_btn.config(text="點擊位置取色", style="Accent.TButton")
+        
+        messagebox.showinfo("滴管取色", "請移動滑鼠到要取色的位置，然後點擊滑鼠左鍵")
+        
+        # 設定滑鼠點擊監聽
+        def on_click(x, y, button, pressed):
+            if self.eyedropper_active and pressed and button.name == 'left':
+                color = self.get_pixel_color(x, y)
+                if color and append_to_palette:
+                    self.root.after(0, lambda: self.add_color_to_palette(color))
+                    self.root.after(100, lambda: messagebox.showinfo("取色完成", 
+                        f"已將顏色 RGB{color} 加入色盤\n位置: ({x}, {y})"))
+                elif color:
+                    self.config["target_color"] = color
+                    self.update_color_display()
+                    self.root.after(100, lambda: messagebox.showinfo("取色完成", 
+                        f"已取得顏色 RGB{color}\n位置: ({x}, {y})"))
                 
-                self.pause_continue_btn.config(style="TButton")
-                return "F"
-            
-            # 沒有檢測到BOSS，檢查是否達到等待時間
-            if not hasattr(self, 'boss_check_start_time'):
-                self.boss_check_start_time = time.time()
-            
-            elapsed_time = time.time() - self.boss_check_start_time
-            wait_time = self.config.get("boss_wait_time", 30)
-            
-            remaining_time = max(0, int(wait_time - elapsed_time))
-            self.current_stage = f"階段E: BOSS檢測中 ({remaining_time}秒後切換頻道)"
-            self.update_status()
-            
-            if elapsed_time >= wait_time:
-                self.boss_check_start_time = time.time()
-                return "F"
+                # 停止取色模式
+                self.stop_eyedropper_mode()
+                return False  # 停止監聽
+        
+        # 啟動滑鼠監聽
+        try:
+            from pynput import mouse
+            self.eyedropper_mouse_listener = mouse.Listener(on_click=on_click)
+            self.eyedropper_mouse_listener.start()
+        except Exception as e:
+            print(f"滑鼠監聽啟動失敗: {e}")
+            self.stop_eyedropper_mode()
+    
+    def stop_eyedropper_mode(self):
+        """停止滴管取色模式"""
+        self.eyedropper_active = False
+        self.eyedropper_btn.config(text="滴管取色", style="TButton")
+        self.palette_eyedropper_btn.config(text="滴管加入色盤", style="TButton")
+        
+        if hasattr(self, 'eyedropper_mouse_listener'):
+            try:
+                self.eyedropper_mouse_listener.stop()
+            except:
+                pass
+    
+    def check_palette_capacity(self):
+        """檢查色盤是否還能加入顏色"""
+        if len(self.config.get("boss_color_rules", [])) >= ColorClassifier.MAX_RULES - 1:
+            messagebox.showerror("色盤已滿", f"色盤最多 {ColorClassifier.MAX_RULES - 1} 個顏色（另加目標顏色）")
+            return False
+        return True
+    
+    def add_color_to_palette(self, color):
+        """將顏色加入色盤，使用目前的顏色容差與像素閾值"""
+        try:
+            tolerance = int(self.color_tolerance_entry.get())
+            threshold = int(self.threshold_entry.get())
+        except ValueError:
+            messagebox.showerror("設定錯誤", "請輸入有效的數值")
+            return
+        
+        self.config.setdefault("boss_color_rules", []).append({
+            "color": [int(c) for c in color],
+            "tolerance": tolerance,
+            "threshold": threshold
+        })
+        self.update_palette_list()
+    
+    def add_current_color_to_palette(self):
+        """將目前的目標顏色加入色盤"""
+        if self.check_palette_capacity():
+            self.add_color_to_palette(self.config["target_color"])
+    
+    def remove_palette_color(self):
+        """刪除色盤中選取的顏色"""
+        selection = self.palette_listbox.curselection()
+        if not selection:
+            return
+        del self.config["boss_color_rules"][selection[0]]
+        self.update_palette_list()
+    
+    def update_palette_list(self):
+        """更新色盤清單顯示"""
+        self.palette_listbox.delete(0, tk.END)
+        for rule in self.config.get("boss_color_rules", []):
+            if "min" in rule and "max" in rule:
+                text = f"RGB{tuple(rule['min'])} ~ RGB{tuple(rule['max'])}  閾值{rule.get('threshold', '-')}"
+            else:
+                text = f"RGB{tuple(rule['color'])}  容差{rule.get('tolerance', '-')}  閾值{rule.get('threshold', '-')}"
+            self.palette_listbox.insert(tk.END, text)
+    
+    def get_pixel_color(self, x, y):
+        """取得指定位置的像素顏色"""
+        try:
+            # 使用pyautogui作為主要方法
+            pixel = pyautogui.screenshot().getpixel((x, y))
+            print(f"取色成功: 位置({x}, {y}) RGB{pixel}")
+            return pixel
+        except Exception as e:
+            print(f"pyautogui取色失敗: {e}")
+            # 使用mss作為備用方法
+            try:
+                with mss.mss() as sct:
+                    monitor = {"top": y, "left": x, "width": 1, "height": 1}
+                    screenshot = sct.grab(monitor)
+                    pixel = screenshot.pixel(0, 0)
+                    r, g, b = pixel[2], pixel[1], pixel[0]  # BGRA to RGB
+                    print(f"mss備用取色成功: RGB({r}, {g}, {b})")
+                    return (r, g, b)
+            except Exception as e2:
+                print(f"mss備用取色也失敗: {e2}")
+                return (0, 0, 0)
+    
+    def update_color_display(self):
+        """更新顏色顯示"""
+        color = self.config["target_color"]
+        
+        # 更新按鈕文字
+        self.color_btn.config(text=f"RGB{color}")
+        
+        # 更新RGB標籤
+        self.rgb_label.config(text=f"({color[0]}, {color[1]}, {color[2]})")
+        
+        # 更新顏色預覽
+        self.update_color_preview()
+    
+    def update_color_preview(self):
+        """更新顏色預覽"""
+        color = self.config["target_color"]
+        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+        self.color_preview.config(bg=hex_color)
+    
+    def start_realtime_preview(self):
+        """開始即時顏色預覽"""
+        def update_realtime():
+            try:
+                if hasattr(self, 'realtime_color_preview') and self.realtime_color_preview.winfo_exists():
+                    x, y = pyautogui.position()
+                    color = self.get_pixel_color_simple(x, y)
+                    if color:
+                        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+                        self.realtime_color_preview.config(bg=hex_color)
+                    
+                    # 每300ms更新一次 (平衡性能和流暢度)
+                    self.root.after(300, update_realtime)
+            except:
+                # 發生錯誤時重試
+                self.root.after(1000, update_realtime)
         
-        time.sleep(1)
-        return "E"  # 繼續檢測
+        # 延遲500ms開始，確保界面完全載入
+        self.root.after(500, update_realtime)
     
-    def stage_f(self):
-        """階段F: 立即執行頻道切換，不等待任何條件"""
-        print("階段F: 開始執行頻道切換")
-        self.current_stage = "階段F: 執行頻道切換..."
-        self.update_status()
+    def get_pixel_color_simple(self, x, y):
+        """簡化的取色方法，專用於即時預覽"""
+        try:
+            # 只擷取游標所在的像素（啟用共用截圖緩衝區時直接從最新畫格讀取）
+            pixel = self.capture.grab_rgb((x, y, x + 1, y + 1))[0, 0]
+            return tuple(int(c) for c in pixel)
+        except:
+            return (255, 255, 255)  # 失敗時返回白色
+    
+    def test_boss_detection(self):
+        """測試BOSS檢測功能"""
+        if self.is_running or self.boss_test_active:
+            messagebox.showerror("錯誤", "請先停止監控或測試模式")
+            return
         
-        # 直接執行頻道切換，不進行任何畫面檢測
-        channel_positions = self.config["click_positions"]["channel"]
+        # 檢查設定完整性
+        if not self.config["detection_area"]:
+            messagebox.showerror("設定錯誤", "請先設定王怪檢測區域")
+            return
         
-        # 檢查頻道切換點位是否已設定
-        if not channel_positions or len(channel_positions) < 4:
-            self.current_stage = "階段F: 未設定頻道切換點位，需要設定4個點位"
-            self.update_status()
-            time.sleep(2)
-            return "F"
+        # 更新設定值
+        try:
+            self.config["color_threshold"] = int(self.threshold_entry.get())
+            self.config["color_tolerance"] = int(self.color_tolerance_entry.get())
+        except ValueError:
+            messagebox.showerror("設定錯誤", "請輸入有效的數值")
+            return
         
-        # 檢查前4個點位是否都已設定
-        if not all(channel_positions[i] for i in range(4)):
-            self.current_stage = "階段F: 頻道切換點位不完整，請確認已設定點位1-4"
-            self.update_status()
-            time.sleep(2)
-            return "F"
+        # 開始測試
+        self.boss_test_active = True
+        self.boss_test_btn.config(text="測試中...", state="disabled")
         
-        # 立即執行所有4個點位的點擊
-        self.current_stage = "階段F: 立即執行4個點位點擊"
-        self.update_status()
+        messagebox.showinfo("開始測試", "將在5秒內檢測王怪區域是否符合BOSS設定\n請確保遊戲畫面可見")
+        
+        # 啟動測試執行緒
+        self.boss_test_thread = threading.Thread(target=self.run_boss_test, daemon=True)
+        self.boss_test_thread.start()
+    
+    def run_boss_test(self):
+        """執行BOSS檢測測試 - 5秒內檢測王怪區域"""
+        test_duration = 5  # 測試5秒
+        check_interval = 0.2  # 每0.2秒檢測一次
+        start_time = time.time()
+        boss_detected = False
+        detection_time = None
+        self.boss_test_sampling_stats = {"frames": 0, "mismatches": 0}
         
         try:
-            # 依序執行所有點位
-            for i in range(4):
-                if channel_positions[i] and self.is_running and not self.is_paused:
-                    print(f"階段F: 點擊點位{i+1} ({channel_positions[i][0]}, {channel_positions[i][1]})")
-                    pyautogui.click(channel_positions[i][0], channel_positions[i][1])
-                    time.sleep(1)
-            
-            # 頻道切換完成，重置BOSS檢測計時器
-            if hasattr(self, 'boss_check_start_time'):
-                delattr(self, 'boss_check_start_time')
-            
-            self.current_stage = "階段F: 頻道切換完成"
-            self.update_status()
-            print("階段F: 所有點位點擊完成，返回階段A")
-            time.sleep(2)
-            return "A"  # 回到階段A檢查頻道切換結果
-            
-        except Exception as e:
-            print(f"階段F點擊錯誤: {e}")
-            self.current_stage = f"階段F: 點擊錯誤 - {str(e)}"
-            self.update_status()
-            time.sleep(2)
-            return "F"
-        if "F" in self.stage_screenshots:
-            # 檢測當前畫面是否匹配階段F（頻道切換目標畫面）
-            if self.detect_stage_match("F"):
-                self.current_stage = "階段F: ✓ 檢測到頻道切換目標畫面，執行完成點擊"
-                self.update_status()
-                
-                # 已達到目標畫面，執行點位3和4
-                channel_positions = self.config["click_positions"]["channel"]
-                if len(channel_positions) >= 4:
-                    # 點擊第3個點位
-                    if channel_positions[2] and self.is_running and not self.is_paused:
-                        print(f"階段F: 點擊點位3 ({channel_positions[2][0]}, {channel_positions[2][1]})")
-                        pyautogui.click(channel_positions[2][0], channel_positions[2][1])
-                        time.sleep(1)
+            # 更新狀態顯示
+            for i in range(5, 0, -1):
+                if not self.boss_test_active:
+                    break
                     
-                    # 點擊第4個點位
-                    if channel_positions[3] and self.is_running and not self.is_paused:
-                        print(f"階段F: 點擊點位4 ({channel_positions[3][0]}, {channel_positions[3][1]})")
-                        pyautogui.click(channel_positions[3][0], channel_positions[3][1])
-                        time.sleep(1)
+                self.root.after(0, lambda seconds=i: self.update_test_status(f"測試中... 剩餘 {seconds} 秒"))
                 
-                # 頻道切換完成，重置BOSS檢測計時器
-                if hasattr(self, 'boss_check_start_time'):
-                    delattr(self, 'boss_check_start_time')
+                # 在這1秒內檢測5次
+                for j in range(5):
+                    if not self.boss_test_active:
+                        break
+                        
+                    # 執行BOSS檢測（同一張畫面同時驗證取樣模式與完整掃描的結果是否一致）
+                    bgra = self.capture.grab_bgra(self.config["detection_area"])
+                    full_result = self.evaluate_boss_frame(bgra, progressive=False)
+                    sampled_result = self.evaluate_boss_frame(bgra, progressive=True)
+                    self.boss_test_sampling_stats["frames"] += 1
+                    if sampled_result != full_result:
+                        self.boss_test_sampling_stats["mismatches"] += 1
+                    
+                    if full_result:
+                        boss_detected = True
+                        detection_time = time.time() - start_time
+                        break
+                    
+                    time.sleep(0.2)
                 
-                return "A"  # 回到階段A檢查頻道切換結果
+                if boss_detected:
+                    break
+            
+            # 更新UI必須在主執行緒中
+            if boss_detected:
+                self.root.after(0, lambda: self.show_test_result(True, detection_time))
             else:
-                # 檢查是否還在上個階段（階段E）
-                if "E" in self.stage_screenshots and self.detect_stage_match("E"):
-                    self.current_stage = "階段F: 檢測到仍在遊戲內畫面，等待進入頻道切換"
-                    self.update_status()
-                    # 還在遊戲內，等待進入頻道切換界面
-                    time.sleep(1)
-                    return "F"
-                else:
-                    # 還沒達到目標畫面，執行點位1和2
-                    self.current_stage = "階段F: 執行頻道切換點位1和2"
-                    self.update_status()
-                    
-                    channel_positions = self.config["click_positions"]["channel"]
-                    if len(channel_positions) >= 2:
-                        # 點擊第1個點位
-                        if channel_positions[0] and self.is_running and not self.is_paused:
-                            print(f"階段F: 點擊點位1 ({channel_positions[0][0]}, {channel_positions[0][1]})")
-                            pyautogui.click(channel_positions[0][0], channel_positions[0][1])
-                            time.sleep(1)
-                        
-                        # 點擊第2個點位
-                        if channel_positions[1] and self.is_running and not self.is_paused:
-                            print(f"階段F: 點擊點位2 ({channel_positions[1][0]}, {channel_positions[1][1]})")
-                            pyautogui.click(channel_positions[1][0], channel_positions[1][1])
-                            time.sleep(1)
+                self.root.after(0, lambda: self.show_test_result(False))
+                
+        except Exception as e:
+            print(f"測試過程發生錯誤: {e}")
+            self.root.after(0, lambda: self.show_test_result(False, error_msg=str(e)))
+        
+        # 重置測試狀態
+        self.boss_test_active = False
+        self.root.after(0, self.reset_boss_test_button)
+    
+    def update_test_status(self, status_text):
+        """更新測試狀態顯示"""
+        self.boss_test_btn.config(text=status_text)
+    
+    def show_test_result(self, detected, detection_time=None, error_msg=None):
+        """顯示測試結果"""
+        if error_msg:
+            messagebox.showerror("測試錯誤", f"測試過程發生錯誤:\n{error_msg}")
+        elif detected:
+            # 取得當前設定值顯示
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            result_msg = f"✅ 偵測到BOSS！\n\n"
+            result_msg += f"檢測時間: {timestamp}\n"
+            if detection_time:
+                result_msg += f"偵測用時: {detection_time:.1f} 秒\n"
+            result_msg += f"目標顏色: RGB{self.config['target_color']}\n"
+            result_msg += f"顏色容差: {self.config['color_tolerance']}\n"
+            result_msg += f"像素閾值: {self.config['color_threshold']}\n"
+            result_msg += f"色盤顏色: {len(self.config.get('boss_color_rules', []))} 個\n"
+            result_msg += self.format_sampling_check() + "\n"
+            result_msg += "✓ 當前設定可以成功檢測到BOSS訊息"
+            
+            messagebox.showinfo("測試結果", result_msg)
         else:
-            # 沒有設定截圖，執行完整的頻道切換流程
-            self.current_stage = "階段F: 未設定參考畫面，執行完整頻道切換"
-            self.update_status()
+            result_msg = f"❌ 5秒內未偵測到BOSS\n\n"
+            result_msg += f"測試時間: 5秒 (完整測試)\n"
+            result_msg += f"目標顏色: RGB{self.config['target_color']}\n"
+            result_msg += f"顏色容差: {self.config['color_tolerance']}\n"
+            result_msg += f"像素閾值: {self.config['color_threshold']}\n"
+            result_msg += f"色盤顏色: {len(self.config.get('boss_color_rules', []))} 個\n"
+            result_msg += f"檢測區域: {self.config['detection_area']}\n"
+            result_msg += self.format_sampling_check() + "\n"
+            result_msg += "建議調整:\n"
+            result_msg += "• 檢查目標顏色是否正確 (使用滴管取色)\n"
+            result_msg += "• 增加顏色容差值 (建議50-100)\n"
+            result_msg += "• 降低像素閾值 (建議50-200)\n"
+            result_msg += "• 確認王怪檢測區域包含BOSS訊息\n"
+            result_msg += "• 確保測試時遊戲畫面中有BOSS訊息"
             
-            channel_positions = self.config["click_positions"]["channel"]
-            if len(channel_positions) >= 4:
-                # 依序點擊所有4個點位
-                for i, pos in enumerate(channel_positions):
-                    if pos and self.is_running and not self.is_paused:
-                        print(f"階段F: 點擊點位{i+1} ({pos[0]}, {pos[1]})")
-                        pyautogui.click(pos[0], pos[1])
-                        time.sleep(1)
-                
-                # 頻道切換完成，重置BOSS檢測計時器
-                if hasattr(self, 'boss_check_start_time'):
-                    delattr(self, 'boss_check_start_time')
-                
-                return "A"  # 回到階段A檢查頻道切換結果
+            messagebox.showwarning("測試結果", result_msg)
+    
+    def format_sampling_check(self):
+        """格式化取樣模式驗證結果"""
+        stats = getattr(self, 'boss_test_sampling_stats', None)
+        if not stats or not stats["frames"]:
+            return ""
+        if stats["mismatches"]:
+            return f"⚠️ 取樣模式與完整掃描有 {stats['mismatches']}/{stats['frames']} 張畫面結果不一致，建議關閉取樣模式\n"
+        return f"取樣模式驗證: {stats['frames']} 張畫面結果一致\n"
+    
+    def reset_boss_test_button(self):
+        """重置測試按鈕狀態"""
+        self.boss_test_btn.config(text="測試BOSS檢測", state="normal")
+    
+    def test_telegram(self):
+        """測試Telegram通知"""
+        chat_id = self.chat_id_entry.get().strip()
+        if not chat_id:
+            messagebox.showerror("錯誤", "請輸入聊天室ID")
+            return
         
-        return "F"  # 繼續在階段F，直到檢測到目標畫面
+        success = self.send_telegram_message(chat_id, "測試訊息：系統運作正常！")
+        if success:
+            messagebox.showinfo("成功", "Telegram通知測試成功！")
+        else:
+            messagebox.showerror("失敗", "Telegram通知測試失敗，請檢查聊天室ID")
+    
+    def toggle_start_stop(self):
+        """開始/停止按鈕"""
+        if not self.is_running:
+            # 停止測試模式
+            if self.boss_test_active:
+                self.boss_test_active = False
+                self.reset_boss_test_button()
+            
+            # 檢查設定完整性
+            if not self.validate_config():
+                return
+            
+            # 監控開始前在介面執行緒讀入目前輸入的設定
+            self.sync_config_from_ui()
+            self.start_monitoring()
+        else:
+            self.stop_monitoring()
+    
+    def sync_config_from_ui(self):
+        """將介面上尚未儲存的監控設定寫入config"""
+        self.config["telegram_chat_id"] = self.chat_id_entry.get().strip()
+        self.config["color_threshold"] = int(self.threshold_entry.get())
+        self.config["auto_channel_switch_after_boss"] = self.boss_behavior_var.get()
+        self.config["crash_detection_enabled"] = self.crash_detection_var.get()
+        self.config["crash_similarity_threshold"] = int(self.crash_similarity_entry.get())
     
-    def detect_boss(self):
-        """檢測王怪"""
-        if not self.config["detection_area"]:
-            return False
-        
-        try:
-            # 截圖檢測區域
-            x1, y1, x2, y2 = self.config["detection_area"]
-            with mss.mss() as sct:
-                monitor = {"top": y1, "left": x1, "width": x2-x1, "height": y2-y1}
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-                img_array = np.array(img)
-            
-            # 檢測目標顏色
-            target_color = np.array(self.config["target_color"])
-            color_diff = np.abs(img_array - target_color)
-            color_distance = np.sum(color_diff, axis=2)
-            
-            # 使用設定的顏色容差
-            color_tolerance = self.config.get("color_tolerance", 50)
-            matching_pixels = np.sum(color_distance < color_tolerance)
-            
-            return matching_pixels > self.config["color_threshold"]
-        except Exception as e:
-            print(f"王怪檢測錯誤: {e}")
-            return False
+    def on_control_state_changed(self, highlight=False):
+        """控制按鈕更新送入信箱（可能由監控或Telegram執行緒呼叫）"""
+        self.ui_mailbox.post("controls", highlight)
     
-    def detect_stage_match(self, stage_key):
-        """檢測當前畫面是否匹配指定階段"""
-        if stage_key not in self.stage_screenshots:
-            return False
-        
+    def show_status(self, text):
+        """狀態列更新送入信箱（可能由監控執行緒呼叫）"""
+        self.ui_mailbox.post("status", text)
+    
+    def drain_ui_updates(self):
+        """Tk執行緒定時套用信箱中的最新狀態，內容未變時不重繪"""
         try:
-            # 截取當前畫面
-            current_screenshot = self.take_area_screenshot(self.config["detection_area"])
-            
-            # 取得目標階段截圖
-            target_screenshot = self.stage_screenshots[stage_key]
-            
-            # 計算相似度
-            similarity = self.calculate_image_similarity(current_screenshot, target_screenshot)
-            
-            # 從設定中取得相似度閾值
-            threshold_percent = self.config.get("stage_similarity_threshold", 80)
-            threshold = threshold_percent / 100.0  # 轉換為0-1範圍
+            pending = self.ui_mailbox.drain()
             
-            # 除錯訊息
-            print(f"階段{stage_key}匹配檢測: 相似度{similarity:.3f}, 閾值{threshold:.3f}, 匹配:{similarity > threshold}")
+            text = pending.get("status")
+            if text is not None and text != self.shown_status:
+                self.status_label.config(text=text)
+                self.shown_status = text
             
-            return similarity > threshold
+            if "controls" in pending:
+                self.apply_control_state(pending["controls"])
         except Exception as e:
-            print(f"階段匹配檢測錯誤: {e}")
-            return False
+            print(f"❌ 更新介面狀態失敗: {e}")
+        
+        self.root.after(self.config.get("ui_refresh_interval_ms", 100), self.drain_ui_updates)
+    
+    def apply_control_state(self, highlight=False):
+        """依執行/暫停狀態更新控制按鈕"""
+        if self.is_running:
+            self.start_stop_btn.config(text="停止")
+            if self.is_paused:
+                self.pause_continue_btn.config(text="繼續", state="normal",
+                                               style="Accent.TButton" if highlight else "TButton")
+            else:
+                self.pause_continue_btn.config(text="暫停", state="normal", style="TButton")
+        else:
+            self.start_stop_btn.config(text="開始")
+            self.pause_continue_btn.config(text="暫停", state="disabled", style="TButton")
+    
+    def toggle_pause_continue(self):
+        """暫停/繼續按鈕"""
+        if not self.is_paused:
+            self.pause_monitoring()
+            self.current_stage = "已暫停"
+        else:
+            self.resume_monitoring()
+            self.current_stage = "運行中"
+        self.update_status()
     
-    def calculate_image_similarity(self, img1, img2):
-        """計算兩張圖片的相似度"""
+    def refresh_metrics(self):
+        """定期更新效能統計顯示（metrics.json 由監控引擎定期輸出）"""
         try:
-            # 調整大小以匹配
-            h1, w1 = img1.shape[:2]
-            h2, w2 = img2.shape[:2]
-            
-            if h1 != h2 or w1 != w2:
-                img2 = cv2.resize(img2, (w1, h1))
-            
-            # 轉換為灰階
-            gray1 = cv2.cvtColor(img1, cv2.COLOR_RGB2GRAY)
-            gray2 = cv2.cvtColor(img2, cv2.COLOR_RGB2GRAY)
-            
-            # 計算結構相似性
-            from skimage.metrics import structural_similarity as ssim
-            similarity = ssim(gray1, gray2)
-            
-            return similarity
-        except:
-            # 如果沒有skimage，使用簡單的像素比較
-            try:
-                diff = cv2.absdiff(img1, img2)
-                total_pixels = diff.size
-                different_pixels = np.count_nonzero(diff > 30)
-                similarity = 1 - (different_pixels / total_pixels)
-                return similarity
-            except:
-                return 0
+            self.metrics_label.config(text=self.metrics.format_brief())
+        except Exception as e:
+            print(f"❌ 更新效能統計失敗: {e}")
+        
+        self.root.after(2000, self.refresh_metrics)
+    
+    def validate_config(self):
+        """驗證設定完整性"""
+        # 以輸入框目前的聊天室ID檢查，其餘檢查與無介面模式共用
+        self.config["telegram_chat_id"] = self.chat_id_entry.get().strip()
+        errors = self.get_config_errors()
+        if errors:
+            messagebox.showerror("設定錯誤", errors[0])
+            return False
+        
+        return True
     
     def save_config(self):
         """儲存設定"""
@@ -2395,6 +4844,8 @@ class GameMonitor:
         self.config["color_tolerance"] = int(self.color_tolerance_entry.get())
         self.config["boss_wait_time"] = int(self.boss_wait_entry.get())
         self.config["stage_similarity_threshold"] = int(self.stage_similarity_entry.get())
+        self.config["crash_similarity_threshold"] = int(self.crash_similarity_entry.get())
+        self.config["crash_detection_enabled"] = self.crash_detection_var.get()
         # 階段超時設定（轉換分鐘為秒）
         timeout_minutes = int(self.stage_timeout_entry.get())
         self.config["stage_timeout_seconds"] = timeout_minutes * 60
@@ -2449,62 +4900,6 @@ class GameMonitor:
             except Exception as e:
                 print(f"儲存當機檢測 {crash_key} 截圖失敗: {e}")
     
-    def load_config(self):
-        """載入設定"""
-        try:
-            if os.path.exists("config.json"):
-                with open("config.json", "r", encoding="utf-8") as f:
-                    saved_config = json.load(f)
-                    self.config.update(saved_config)
-            
-            # 載入階段截圖
-            self.load_stage_screenshots()
-            
-            # 載入當機檢測截圖
-            self.load_crash_screenshots()
-        except Exception as e:
-            print(f"載入設定失敗: {e}")
-    
-    def load_stage_screenshots(self):
-        """載入階段截圖"""
-        import os
-        
-        if not os.path.exists("stage_screenshots"):
-            return
-        
-        stages = ["A", "C", "D", "E", "F"]
-        for stage_key in stages:
-            screenshot_path = f"stage_screenshots/stage_{stage_key}.png"
-            if os.path.exists(screenshot_path):
-                try:
-                    # 載入圖片並轉換為numpy陣列
-                    pil_img = Image.open(screenshot_path)
-                    screenshot = np.array(pil_img)
-                    self.stage_screenshots[stage_key] = screenshot
-                    print(f"已載入階段 {stage_key} 截圖")
-                except Exception as e:
-                    print(f"載入階段 {stage_key} 截圖失敗: {e}")
-    
-    def load_crash_screenshots(self):
-        """載入當機檢測截圖"""
-        import os
-        
-        if not os.path.exists("crash_screenshots"):
-            return
-        
-        crash_types = ["disconnect", "error", "maintenance", "timeout"]
-        for crash_key in crash_types:
-            screenshot_path = f"crash_screenshots/crash_{crash_key}.png"
-            if os.path.exists(screenshot_path):
-                try:
-                    # 載入圖片並轉換為numpy陣列
-                    pil_img = Image.open(screenshot_path)
-                    screenshot = np.array(pil_img)
-                    self.crash_screenshots[crash_key] = screenshot
-                    print(f"已載入當機檢測 {crash_key} 截圖")
-                except Exception as e:
-                    print(f"載入當機檢測 {crash_key} 截圖失敗: {e}")
-    
     def save_ui_state(self):
         """儲存UI狀態"""
         self.config["section_collapsed"] = self.section_collapsed
@@ -2598,6 +4993,10 @@ class GameMonitor:
                 "channel_area": None,
                 "target_color": (255, 0, 0),
                 "color_threshold": 100,
+                "boss_color_rules": [],
+                "boss_progressive_scan": True,
+                "boss_sampling_stride": 4,
+                "boss_scan_band_rows": 32,
                 "detection_timeout": 30,
                 "color_tolerance": 50,
                 "boss_wait_time": 30,
@@ -2621,6 +5020,7 @@ class GameMonitor:
             self.stage_similarity_entry.delete(0, tk.END)
             self.stage_similarity_entry.insert(0, "80")
             self.stage_screenshots = {}
+            self.invalidate_reference_cache()
             
             # 刪除階段截圖檔案
             import os
@@ -2635,6 +5035,7 @@ class GameMonitor:
             
             self.update_position_labels()
             self.update_stage_labels()
+            self.update_palette_list()
             self.reset_position_buttons()
             messagebox.showinfo("完成", "設定已重置")
     
@@ -2682,8 +5083,10 @@ class GameMonitor:
         confirmed = self.show_stage_confirmation_dialog(current_screenshot, stage_key, stage_names[stage_key], area_name)
         
         if confirmed:
-            # 儲存階段截圖
+            # 儲存階段截圖並重新計算比對特徵
             self.stage_screenshots[stage_key] = current_screenshot
+            self.invalidate_reference_cache(stage_key)
+            self.prepare_reference_cache()
             self.update_stage_labels()
             messagebox.showinfo("設定完成", f"階段 {stage_key} 截圖已設定")
         
@@ -2741,23 +5144,6 @@ class GameMonitor:
         
         return result["confirmed"]
     
-    def take_area_screenshot(self, area_coords):
-        """截取指定區域"""
-        if not area_coords:
-            # 如果沒有區域設定，截取全螢幕
-            with mss.mss() as sct:
-                monitor = sct.monitors[0]  # 主螢幕
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-                return np.array(img)
-        
-        x1, y1, x2, y2 = area_coords
-        with mss.mss() as sct:
-            monitor = {"top": y1, "left": x1, "width": x2-x1, "height": y2-y1}
-            screenshot = sct.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            return np.array(img)
-    
     def toggle_recording(self):
         """開始/停止錄製"""
         if not self.is_recording:
@@ -2809,6 +5195,7 @@ class GameMonitor:
         self.is_recording = True
         self.recording_stage = "A"
         self.stage_screenshots = {}
+        self.invalidate_reference_cache()
         self.recording_start_time = time.time()
         
         # 更新UI
@@ -2836,7 +5223,6 @@ class GameMonitor:
         # 顯示錄製結果
         self.show_recording_summary()
     
-    
     def recording_loop(self):
         """錄製主循環 - 偵測指定區域的畫面變化"""
         screenshot_interval = 1.0  # 每秒截圖
@@ -2868,6 +5254,7 @@ class GameMonitor:
                         if stage_confirmed:
                             # 儲存階段截圖並進入下一階段
                             self.stage_screenshots[self.recording_stage] = current_screenshot
+                            self.invalidate_reference_cache(self.recording_stage)
                             self.advance_recording_stage()
                 
                 self.last_screenshot = current_screenshot
@@ -2877,51 +5264,6 @@ class GameMonitor:
                 print(f"錄製循環錯誤: {e}")
                 time.sleep(1)
     
-    def take_full_screenshot(self):
-        """截取全螢幕"""
-        with mss.mss() as sct:
-            monitor = sct.monitors[0]  # 主螢幕
-            screenshot = sct.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            return np.array(img)
-    
-    def take_area_screenshot(self, area_coords):
-        """截取指定區域"""
-        if not area_coords:
-            return self.take_full_screenshot()
-        
-        x1, y1, x2, y2 = area_coords
-        with mss.mss() as sct:
-            monitor = {"top": y1, "left": x1, "width": x2-x1, "height": y2-y1}
-            screenshot = sct.grab(monitor)
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            return np.array(img)
-    
-    def calculate_screen_change(self, img1, img2):
-        """計算兩張圖片的變化程度"""
-        try:
-            # 調整大小以加速比較
-            h1, w1 = img1.shape[:2]
-            h2, w2 = img2.shape[:2]
-            
-            if h1 != h2 or w1 != w2:
-                img2 = cv2.resize(img2, (w1, h1))
-            
-            # 轉換為灰階
-            gray1 = cv2.cvtColor(img1, cv2.COLOR_RGB2GRAY)
-            gray2 = cv2.cvtColor(img2, cv2.COLOR_RGB2GRAY)
-            
-            # 計算差異
-            diff = cv2.absdiff(gray1, gray2)
-            
-            # 計算變化像素比例
-            total_pixels = diff.size
-            changed_pixels = np.count_nonzero(diff > 30)  # 閾值30
-            
-            return changed_pixels / total_pixels
-        except:
-            return 0
-    
     def ask_stage_confirmation(self, screenshot, change_ratio, area_name="檢測區域"):
         """詢問使用者是否確認階段轉換"""
         # 暫停錄製循環
@@ -3018,8 +5360,16 @@ class GameMonitor:
     
     def run(self):
         """啟動應用程式"""
+        self.root.after(0, self.report_startup)
         self.root.mainloop()
-
+    
+    def report_startup(self):
+        """主迴圈開始處理事件（視窗已顯示）時輸出啟動報告"""
+        startup_report.mark("window_shown")
+        print(startup_report.format_summary())
+        startup_report.path = "startup_report.json"  # 之後的里程碑（如第一次擷取）會更新檔案
+        startup_report.save(startup_report.path)
+    
     def load_window_geometry(self):
         """載入視窗位置和大小"""
         try:
@@ -3070,12 +5420,8 @@ class GameMonitor:
                 except:
                     pass
             
-            # 停止Telegram Bot監聽
-            if hasattr(self, 'telegram_bot'):
-                try:
-                    self.telegram_bot.stop_listener()
-                except:
-                    pass
+            # 停止Telegram Bot監聽與指標端點
+            self.stop_services()
             
             print("程式正常關閉")
             
@@ -3085,6 +5431,390 @@ class GameMonitor:
             # 銷毀視窗
             self.root.destroy()
 
+class DaemonMixin:
+    """無介面執行共用的主迴圈與本機控制埠
+    
+    控制埠接受一行一個指令：status、pause、resume、start、stop、metrics、quit，
+    回應可能有多行，以單獨一行 "." 結束。例如 `echo status | nc 127.0.0.1 9465`。
+    使用的類別需提供 config、telegram_bot、shutdown_event、control_server，
+    以及 get_config_errors/start_services/stop_services/start_monitoring/stop_monitoring。
+    """
+    
+    def run(self):
+        """啟動監控並阻塞到收到 quit 指令或 Ctrl+C，回傳程式結束代碼"""
+        errors = self.get_config_errors()
+        if errors:
+            for error in errors:
+                print(f"❌ 設定錯誤: {error}")
+            return 1
+        
+        self.start_services()
+        self.start_control_server()
+        self.start_monitoring()
+        print("✅ 無介面模式已啟動")
+        
+        startup_report.mark("monitoring_started")
+        print(startup_report.format_summary())
+        startup_report.path = "startup_report.json"
+        startup_report.save(startup_report.path)
+        
+        try:
+            while not self.shutdown_event.wait(1):
+                pass
+        except KeyboardInterrupt:
+            print("收到中斷訊號，準備關閉")
+        finally:
+            if self.is_running:
+                self.stop_monitoring()
+            self.stop_control_server()
+            self.stop_services()
+            print("程式正常關閉")
+        return 0
+    
+    def start_control_server(self):
+        """啟動本機控制埠"""
+        monitor = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw_line in self.rfile:
+                    command = raw_line.decode("utf-8", "ignore").strip().lower()
+                    if not command:
+                        continue
+                    response = monitor.handle_control_command(command)
+                    self.wfile.write((response + "\n.\n").encode("utf-8"))
+                    if command == "quit":
+                        break
+        
+        port = self.config.get("control_port", 9465)
+        try:
+            self.control_server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+            self.control_server.daemon_threads = True
+        except OSError as e:
+            print(f"❌ 控制埠啟動失敗 (127.0.0.1:{port}): {e}")
+            self.control_server = None
+            return False
+        
+        threading.Thread(target=self.control_server.serve_forever, daemon=True).start()
+        print(f"✅ 控制埠已啟動: 127.0.0.1:{self.control_server.server_address[1]}")
+        return True
+    
+    def stop_control_server(self):
+        """停止本機控制埠"""
+        if self.control_server:
+            self.control_server.shutdown()
+            self.control_server.server_close()
+            self.control_server = None
+    
+    def handle_control_command(self, command):
+        """處理控制埠指令，回應文字與Telegram指令相同"""
+        bot = self.telegram_bot
+        if command == "status":
+            return bot.handle_status(None)
+        if command == "pause":
+            return bot.handle_pause(None)
+        if command == "resume":
+            return bot.handle_resume(None)
+        if command == "stop":
+            return bot.handle_stop(None)
+        if command == "metrics":
+            return bot.handle_metrics(None)
+        if command == "start":
+            errors = self.get_config_errors()
+            if errors:
+                return f"❌ 設定錯誤: {errors[0]}"
+            return "✅ 監控已啟動" if self.start_monitoring() else "⚠️ 監控已經在運行中"
+        if command == "quit":
+            self.shutdown_event.set()
+            return "✅ 程式即將關閉"
+        return "❓ 無效指令，可用指令: status, pause, resume, start, stop, metrics, quit"
+
+class HeadlessMonitor(DaemonMixin, MonitorEngine):
+    """無介面模式：不建立Tk視窗，透過Telegram或本機控制埠操作"""
+    
+    def __init__(self):
+        super().__init__()
+        self.control_server = None
+        self.shutdown_event = threading.Event()
+
+class ClientEngine(MonitorEngine):
+    """多開時的單一客戶端：各自的設定目錄、區域、點位與階段狀態
+    
+    不自行執行監控循環，由 MultiClientOrchestrator 排程呼叫 run_stage_step；
+    截圖引擎、顏色查找表、SSIM計算、效能統計與Telegram連線都與其他客戶端共用。
+    """
+    
+    def __init__(self, name, base_dir, orchestrator):
+        self.name = name
+        self.orchestrator = orchestrator
+        super().__init__(base_dir=base_dir, capture=orchestrator.capture, metrics=orchestrator.metrics,
+                         color_classifier=orchestrator.color_classifier, ssim_scorer=orchestrator.ssim_scorer)
+        self.log_prefix = f"[{name}] "
+        
+        # 客戶端未設定聊天室時使用共用設定
+        if not self.config.get("telegram_chat_id"):
+            self.config["telegram_chat_id"] = orchestrator.config.get("telegram_chat_id", "")
+    
+    def get_crash_area(self):
+        """當機比對範圍：未設定時為本客戶端檢測區域與頻道區域的外框，不看其他視窗"""
+        area = super().get_crash_area()
+        if area:
+            return area
+        regions = [region for region in (self.config.get("detection_area"), self.config.get("channel_area")) if region]
+        if not regions:
+            return None
+        return (min(r[0] for r in regions), min(r[1] for r in regions),
+                max(r[2] for r in regions), max(r[3] for r in regions))
+    
+    def run_crash_check(self, current_hashes=None):
+        """尚未設定任何區域時無法分辨是哪個視窗當機，不做檢查"""
+        if self.get_crash_area() is None:
+            return
+        super().run_crash_check(current_hashes)
+    
+    def start_worker_threads(self):
+        """只啟動超時檢查；階段步驟與當機監控都由排程器統一執行"""
+        self.reset_stage_machine()
+        threading.Thread(target=self.stage_timeout_loop, daemon=True).start()
+    
+    def detect_boss(self):
+        """BOSS檢測（取得共用的檢測名額，限制同時進行的影像運算）"""
+        with self.orchestrator.detection_slots:
+            return super().detect_boss()
+    
+    def detect_stage_match(self, stage_key):
+        """階段畫面比對（取得共用的檢測名額，限制同時進行的影像運算）"""
+        with self.orchestrator.detection_slots:
+            return super().detect_stage_match(stage_key)
+    
+    def classify_frame(self, stage_keys=None, include_crash=False):
+        """批次畫面比對（取得共用的檢測名額，限制同時進行的影像運算）"""
+        with self.orchestrator.detection_slots:
+            return super().classify_frame(stage_keys, include_crash)
+    
+    def send_telegram_message(self, chat_id, message):
+        """透過共用連線發送，訊息加上客戶端名稱"""
+        return self.orchestrator.send_telegram_message(chat_id, f"[{self.name}] {message}")
+    
+    def notify(self, message, priority=NotificationDispatcher.PRIORITY_INFO, chat_id=None):
+        """排入排程器共用的通知佇列，訊息加上客戶端名稱"""
+        return self.orchestrator.notify(f"[{self.name}] {message}", priority, chat_id or self.config.get("telegram_chat_id"))
+    
+    def dump_metrics(self):
+        """效能統計由排程器統一輸出"""
+        pass
+
+class MultiClientOrchestrator(TelegramSenderMixin, DaemonMixin):
+    """多開排程器：單一程序同時操作多個遊戲視窗
+    
+    所有客戶端共用一個截圖引擎、一個Telegram連線與一組效能統計。排程器以固定大小的
+    執行緒池輪流執行各客戶端的階段步驟，每個客戶端同時最多一個步驟，且兩次步驟之間
+    至少間隔 step_interval 秒；影像檢測另以 max_concurrent_detections 限制同時數量。
+    滑鼠點擊經 MOUSE_LOCK 串行化。
+    
+    clients.json 範例：
+    {"telegram_chat_id": "...", "telegram_bot_token": "...",
+     "clients": [{"name": "1號", "config_dir": "clients/1"}, {"name": "2號", "config_dir": "clients/2"}]}
+    每個 config_dir 內為該客戶端的 config.json、stage_screenshots/ 與 crash_screenshots/。
+    """
+    
+    def __init__(self, clients_path="clients.json"):
+        self.config = {
+            "telegram_chat_id": "",
+            "telegram_bot_token": "",
+            "send_welcome_message": True,
+            "max_concurrent_detections": max(1, (os.cpu_count() or 2) // 2),
+            "step_interval": 0.05,  # 同一客戶端兩次步驟的最短間隔（秒）
+            "crash_check_interval": 5,  # 共用當機監控的檢查間隔（秒）
+            "metrics_dump_interval": 60,  # 效能統計輸出到 metrics.json 的間隔（秒，0為停用）
+            "metrics_server_enabled": False,
+            "metrics_server_port": 9464,
+            "control_port": 9465,
+            "clients": []
+        }
+        with open(clients_path, "r", encoding="utf-8") as f:
+            self.config.update(json.load(f))
+        
+        self.metrics = PerformanceMetrics()
+        self.capture = ScreenCapture(self.metrics)
+        # 查找表與SSIM暫存陣列都有鎖或依執行緒分開，所有客戶端共用一份
+        self.color_classifier = ColorClassifier()
+        self.ssim_scorer = SSIMScorer()
+        self.detection_slots = threading.BoundedSemaphore(self.config["max_concurrent_detections"])
+        
+        self.clients = [ClientEngine(entry.get("name") or f"客戶端{i+1}", entry["config_dir"], self)
+                        for i, entry in enumerate(self.config["clients"])]
+        
+        self.is_running = False
+        self.scheduler_thread = None
+        self.executor = None
+        self.telegram_bot = None
+        self.metrics_server = None
+        self.control_server = None
+        self.shutdown_event = threading.Event()
+        self.started_at = time.time()
+        self.last_metrics_dump = 0
+    
+    @property
+    def is_paused(self):
+        """任一客戶端暫停中（例如BOSS出現等待處理）"""
+        return any(client.is_paused for client in self.clients if client.is_running)
+    
+    @property
+    def current_stage(self):
+        """各客戶端目前階段"""
+        return "\n".join(f"[{client.name}] {client.current_stage}" for client in self.clients)
+    
+    @property
+    def current_stage_start_time(self):
+        """停留最久的客戶端進入目前階段的時間"""
+        running = [client.current_stage_start_time for client in self.clients if client.is_running]
+        return min(running) if running else self.started_at
+    
+    def get_prefilter_summary(self):
+        """各客戶端的畫面比對預篩統計"""
+        return "\n".join(f"[{client.name}] {client.get_prefilter_summary()}" for client in self.clients)
+    
+    def get_config_errors(self):
+        """沒有任何客戶端可以啟動時回傳錯誤"""
+        if not self.clients:
+            return ["clients.json 未設定任何客戶端"]
+        if all(client.get_config_errors() for client in self.clients):
+            return [f"[{client.name}] {client.get_config_errors()[0]}" for client in self.clients]
+        return []
+    
+    def start_services(self):
+        """啟動共用的Telegram Bot監聽與本機指標端點"""
+        self.telegram_bot = TelegramBot(self)
+        self.telegram_bot.start_listener()
+        
+        if self.config.get("metrics_server_enabled", False):
+            self.metrics_server = MetricsServer(self, port=self.config.get("metrics_server_port", 9464))
+            if not self.metrics_server.start():
+                self.metrics_server = None
+    
+    def stop_services(self):
+        """停止Telegram Bot監聽與本機指標端點"""
+        if self.telegram_bot:
+            self.telegram_bot.stop_listener()
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        self.stop_notifier()
+    
+    def start_monitoring(self):
+        """啟動所有設定完整的客戶端與排程器"""
+        if self.is_running:
+            return False
+        
+        self.metrics.reset()
+        started = 0
+        for client in self.clients:
+            errors = client.get_config_errors()
+            if errors:
+                print(f"❌ [{client.name}] 設定錯誤，略過: {errors[0]}")
+                continue
+            client.start_monitoring()
+            started += 1
+        
+        if not started:
+            return False
+        
+        self.is_running = True
+        self.executor = ThreadPoolExecutor(max_workers=started, thread_name_prefix="client")
+        self.scheduler_thread = threading.Thread(target=self.scheduler_loop, daemon=True)
+        self.scheduler_thread.start()
+        threading.Thread(target=self.crash_watchdog_loop, daemon=True).start()
+        print(f"✅ 多開排程器已啟動: {started} 個客戶端")
+        return True
+    
+    def stop_monitoring(self):
+        """停止所有客戶端"""
+        self.is_running = False
+        for client in self.clients:
+            if client.is_running:
+                client.stop_monitoring()
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.dump_metrics()
+    
+    def dump_metrics(self):
+        """輸出所有客戶端共用的效能統計到 metrics.json"""
+        try:
+            self.metrics.dump("metrics.json")
+            self.last_metrics_dump = time.time()
+        except Exception as e:
+            print(f"❌ 輸出效能統計失敗: {e}")
+    
+    def pause_monitoring(self, highlight=False):
+        """暫停所有客戶端"""
+        for client in self.clients:
+            if client.is_running:
+                client.pause_monitoring(highlight)
+    
+    def resume_monitoring(self):
+        """恢復所有客戶端"""
+        for client in self.clients:
+            if client.is_running:
+                client.resume_monitoring()
+    
+    def crash_watchdog_loop(self):
+        """共用的當機監控：每次檢查只擷取一次涵蓋所有客戶端區域的畫面，各客戶端只比對自己的範圍
+        
+        整輪檢查佔用一個檢測名額，與各客戶端的畫面比對一起受 max_concurrent_detections 限制。
+        """
+        while self.is_running:
+            clients = [client for client in self.clients if client.is_running]
+            current_hashes = {}
+            with self.detection_slots:
+                self.capture.begin_tick([client.get_crash_area() for client in clients])
+                try:
+                    for client in clients:
+                        client.run_crash_check(current_hashes)
+                finally:
+                    self.capture.end_tick()
+            time.sleep(self.config.get("crash_check_interval", 5))
+    
+    def scheduler_loop(self):
+        """輪流把可執行的客戶端步驟交給執行緒池"""
+        in_flight = {}
+        last_started = {}
+        step_interval = self.config.get("step_interval", 0.05)
+        
+        while self.is_running:
+            now = time.perf_counter()
+            for client in self.clients:
+                if not client.is_running or client.is_paused:
+                    continue
+                
+                future = in_flight.get(client.name)
+                if future is not None and not future.done():
+                    continue
+                if now - last_started.get(client.name, 0) < step_interval:
+                    continue
+                
+                last_started[client.name] = now
+                try:
+                    in_flight[client.name] = self.executor.submit(client.run_stage_step)
+                except RuntimeError:
+                    return  # 執行緒池已關閉
+            
+            dump_interval = self.config.get("metrics_dump_interval", 60)
+            if dump_interval and time.time() - self.last_metrics_dump >= dump_interval:
+                self.dump_metrics()
+            
+            time.sleep(0.01)
+
 if __name__ == "__main__":
+    if "--clients" in sys.argv[1:]:
+        # 多開模式：python game_monitor.py --clients clients.json
+        index = sys.argv.index("--clients")
+        clients_path = sys.argv[index + 1] if index + 1 < len(sys.argv) else "clients.json"
+        sys.exit(MultiClientOrchestrator(clients_path).run())
+    
+    if "--headless" in sys.argv[1:]:
+        sys.exit(HeadlessMonitor().run())
+    
     app = GameMonitor()
     app.run()
\ No newline at end of file
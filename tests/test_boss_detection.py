@@ -0,0 +1,163 @@
+"""BOSS顏色檢測：漸進掃描必須與完整掃描的結果完全相同"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+RED = (0, 0, 255, 255)  # BGRA
+GREEN = (0, 200, 0, 255)
+
+
+def blank(height=120, width=400, value=30):
+    frame = np.full((height, width, 4), value, dtype=np.uint8)
+    frame[:, :, 3] = 255
+    return frame
+
+
+def red_line():
+    """1像素寬的紅線：360個符合的像素，位於取樣格點之外"""
+    frame = blank()
+    frame[61, 20:380] = RED
+    return frame
+
+
+def dotted_stroke():
+    """兩列高、只在奇數欄的點狀筆畫"""
+    frame = blank()
+    frame[61:63, 1::2] = RED
+    return frame
+
+
+def small_text():
+    """筆畫比取樣間隔細的小字"""
+    frame = blank()
+    cv2.putText(frame, "BOSS appeared at CH 12", (5, 70), cv2.FONT_HERSHEY_PLAIN, 0.8, RED, 1, cv2.LINE_8)
+    return frame
+
+
+def solid_block():
+    frame = blank()
+    frame[40:60, 100:200] = RED
+    return frame
+
+
+def exact_threshold(extra):
+    """剛好 threshold + extra 個分散的紅色像素"""
+    frame = blank()
+    rng = np.random.default_rng(7)
+    positions = rng.choice(frame.shape[0] * frame.shape[1], 100 + extra, replace=False)
+    frame.reshape(-1, 4)[positions] = RED
+    return frame
+
+
+def near_miss_color():
+    frame = blank()
+    frame[30:90, 50:350] = (0, 0, 150, 255)  # 與目標顏色差距超過容差
+    return frame
+
+
+def bright_non_matching():
+    """紅色通道很亮但整體色差超過容差（白色與橘色）：單通道上限通過，仍須完整判斷"""
+    frame = blank()
+    frame[0:60, :] = (255, 255, 255, 255)
+    frame[60:120, :] = (0, 120, 255, 255)
+    frame[100, 10:150] = RED
+    return frame
+
+
+def green_palette_stroke():
+    frame = blank()
+    frame[10, :] = GREEN
+    return frame
+
+
+def random_frame(seed):
+    rng = np.random.default_rng(seed)
+    frame = blank(int(rng.integers(40, 300)), int(rng.integers(40, 500)))
+    for _ in range(int(rng.integers(0, 6))):
+        y, x = int(rng.integers(0, frame.shape[0])), int(rng.integers(0, frame.shape[1]))
+        frame[y:y + int(rng.integers(1, 4)), x:x + int(rng.integers(1, 200))] = RED
+    return frame
+
+
+CORPUS = {
+    "blank": blank(),
+    "red_line": red_line(),
+    "dotted_stroke": dotted_stroke(),
+    "small_text": small_text(),
+    "solid_block": solid_block(),
+    "at_threshold": exact_threshold(0),
+    "above_threshold": exact_threshold(1),
+    "near_miss_color": near_miss_color(),
+    "bright_non_matching": bright_non_matching(),
+    "green_palette_stroke": green_palette_stroke(),
+}
+CORPUS.update({f"random_{seed}": random_frame(seed) for seed in range(40)})
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = game_monitor.MonitorEngine(str(tmp_path_factory.mktemp("monitor")))
+    engine.config.update({
+        "target_color": (255, 0, 0),
+        "color_tolerance": 50,
+        "color_threshold": 100,
+        "boss_color_rules": [{"color": [0, 200, 0], "tolerance": 30, "threshold": 300}],
+        "boss_sampling_stride": 4,
+        "boss_scan_band_rows": 32,
+    })
+    return engine
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_progressive_matches_full_scan(engine, name):
+    frame = CORPUS[name]
+    assert engine.evaluate_boss_frame(frame, progressive=True) == engine.evaluate_boss_frame(frame, progressive=False)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("blank", False),
+    ("red_line", True),
+    ("dotted_stroke", True),
+    ("small_text", True),
+    ("solid_block", True),
+    ("at_threshold", False),
+    ("above_threshold", True),
+    ("near_miss_color", False),
+    ("bright_non_matching", True),
+    ("green_palette_stroke", True),
+])
+def test_known_frames(engine, name, expected):
+    assert engine.evaluate_boss_frame(CORPUS[name], progressive=True) is expected
+
+
+def test_small_text_is_thinner_than_sampling_grid(engine):
+    """確認小字語料確實會被稀疏格點漏掉，測試才有意義"""
+    rules = engine.get_boss_color_rules()
+    frame = CORPUS["small_text"]
+    sampled = engine.color_classifier.count_matches(frame[::4, ::4], rules)[0]
+    assert sampled <= 100 < engine.color_classifier.count_matches(frame, rules)[0]
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_upper_bound_never_undercounts(engine, name):
+    rules = engine.get_boss_color_rules()
+    frame = CORPUS[name]
+    bounds = engine.color_classifier.count_upper_bounds(frame, rules)
+    assert all(bound >= count for bound, count in zip(bounds, engine.color_classifier.count_matches(frame, rules)))
+
+
+def test_upper_bound_on_region_view(engine):
+    """擷取的區域可能是整張截圖的子視圖（非連續記憶體）"""
+    frame = CORPUS["solid_block"]
+    rules = engine.get_boss_color_rules()
+    view = np.ascontiguousarray(np.pad(frame, ((5, 5), (7, 7), (0, 0))))[5:-5, 7:-7]
+    assert engine.color_classifier.count_upper_bounds(view, rules) == \
+        engine.color_classifier.count_upper_bounds(frame, rules)
+    assert engine.evaluate_boss_frame(view, progressive=True) is True
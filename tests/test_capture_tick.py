@@ -0,0 +1,43 @@
+"""擷取週期只涵蓋該次檢查實際讀取的區域"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+DETECTION_AREA = (0, 0, 100, 50)
+CHANNEL_AREA = (900, 700, 1000, 750)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = game_monitor.MonitorEngine(str(tmp_path))
+    engine.config.update({"detection_area": DETECTION_AREA, "channel_area": CHANNEL_AREA,
+                          "channel_click_timeout": 0.1, "channel_click_retries": 0})
+    engine.is_running = True
+    engine.stage_screenshots = {"A": np.zeros((50, 100, 3), dtype=np.uint8)}
+
+    ticks, grabs = [], []
+    monkeypatch.setattr(engine.capture, "begin_tick", lambda regions: ticks.append(list(regions)))
+    monkeypatch.setattr(engine.capture, "end_tick", lambda: None)
+    monkeypatch.setattr(engine.capture, "grab_gray",
+                        lambda area=None, live=False: grabs.append((area, live)) or np.zeros((50, 100), np.uint8))
+    monkeypatch.setattr(engine, "click", lambda x, y: None)
+    engine.ticks, engine.grabs = ticks, grabs
+    return engine
+
+
+def test_stage_screen_wait_ticks_detection_area_only(engine, monkeypatch):
+    monkeypatch.setattr(engine, "detect_stage_match", lambda key: True)
+    assert engine.wait_for_stage_screen("A", expected=0.1)
+    assert engine.ticks == [[DETECTION_AREA]]
+
+
+def test_channel_click_polls_read_channel_area_live(engine):
+    assert engine.click_and_verify_channel(0, (10, 10)) is False
+    assert all(regions == [] for regions in engine.ticks)
+    assert engine.grabs and all(grab == (CHANNEL_AREA, True) for grab in engine.grabs)
@@ -0,0 +1,68 @@
+"""偵測工作程序：統計回報給主程序，設定變更會自動同步"""
+import multiprocessing
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+AREA = (0, 0, 160, 90)
+
+
+def textured(seed=3):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (9, 16), dtype=np.uint8)
+    return np.kron(small, np.ones((10, 10), dtype=np.uint8))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    screen = np.dstack([textured()] * 3 + [np.full((90, 160), 255, np.uint8)])
+    shot = types.SimpleNamespace(raw=screen.tobytes(), height=90, width=160)
+    sct = types.SimpleNamespace(grab=lambda monitor: shot, monitors=[{}])
+    monkeypatch.setattr(game_monitor.ScreenCapture, "_get_sct", lambda self: sct)
+
+    engine = game_monitor.MonitorEngine(str(tmp_path))
+    engine.config.update({"detection_area": AREA})
+    engine.stage_screenshots = {"A": np.dstack([textured()] * 3)}
+
+    # 以執行緒代替子程序執行同一個進入點，方便替換畫面擷取
+    worker = game_monitor.DetectionWorker(engine)
+    worker.conn, child_conn = multiprocessing.Pipe()
+    thread = threading.Thread(target=game_monitor.detection_worker_main, args=(child_conn, str(tmp_path)), daemon=True)
+    thread.start()
+    worker.sync()
+    engine.detection_worker = worker
+    yield engine
+    worker.conn.send(("stop",))
+    thread.join(2)
+
+
+def test_worker_stats_reach_parent(engine):
+    assert engine.detect_stage_match("A") is True
+    assert engine.detect_stage_match("A") is True
+
+    assert engine.prefilter_stats["match"] == 2
+    snapshot = engine.metrics.snapshot()
+    assert snapshot["histograms"]["capture"]["count"] == 2  # 工作程序內部的擷取耗時
+    assert snapshot["histograms"]["detect_stage_match"]["count"] == 2  # 不重複記錄
+
+
+def test_config_write_is_synced_before_next_call(engine):
+    worker = engine.detection_worker
+    assert engine.detect_stage_match("A") is True
+
+    engine.config["hash_prefilter_enabled"] = False
+    assert engine.detect_stage_match("A") is True
+    assert worker.synced_config["hash_prefilter_enabled"] is False
+    assert engine.prefilter_stats["match"] == 1  # 停用預篩後改以SSIM判定
+
+    engine.config["boss_color_rules"].append({"color": [0, 200, 0], "tolerance": 30})
+    engine.detect_boss()
+    assert worker.synced_config["boss_color_rules"] == engine.config["boss_color_rules"]
@@ -0,0 +1,95 @@
+"""共用截圖緩衝區：讀取端只取得完整且夠新的畫格，點擊基準畫面不經過緩衝區"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+
+def frame(value, height=60, width=80):
+    return np.full((height, width, 4), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = game_monitor.FrameRing(capacity=60 * 80 * 4, slots=2)
+    yield ring
+    ring.close()
+
+
+def test_read_region_copies_area_in_screen_coordinates(ring):
+    image = frame(0)
+    image[20:30, 40:50] = 200
+    ring.write(image, origin=(100, 50))
+
+    number, _, region = ring.read_region((140, 70, 150, 80))
+    assert number == 1
+    assert region.shape == (10, 10, 4) and (region == 200).all()
+    assert ring.read_region((90, 50, 120, 60)) is None  # 超出畫格範圍
+
+
+def test_region_is_not_overwritten_after_wrap(ring):
+    ring.write(frame(10))
+    _, _, region = ring.read_region()
+    for value in (20, 30, 40):
+        ring.write(frame(value))
+    assert (region == 10).all()
+
+
+def test_stale_or_locked_frames_are_not_returned(ring):
+    ring.write(frame(10), timestamp=1.0)
+    assert ring.read_region(max_age=0.2) is None
+
+    ring.write(frame(20))
+    ring.slot_headers[int(ring.header[0]) % ring.slots, 0] += 1  # 模擬寫入中
+    assert ring.read_region() is None
+
+
+def test_concurrent_writer_never_yields_torn_region():
+    """擷取端持續繞圈覆寫時，讀到的每個區域都必須來自同一張畫格"""
+    ring = game_monitor.FrameRing(capacity=400 * 600 * 4, slots=2)
+    stop = threading.Event()
+
+    def writer():
+        value = 0
+        while not stop.is_set():
+            value = (value + 1) % 256
+            ring.write(frame(value, 400, 600))
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        reads = 0
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            latest = ring.read_region()
+            if latest is None:
+                continue
+            region = latest[2]
+            assert (region == region[0, 0, 0]).all()
+            reads += 1
+        assert reads > 0
+    finally:
+        stop.set()
+        thread.join()
+        ring.close()
+
+
+def test_live_grab_bypasses_ring_and_tick(ring, monkeypatch):
+    capture = game_monitor.ScreenCapture()
+    capture.attach_ring(ring)
+    ring.write(frame(10))
+    direct = []
+    monkeypatch.setattr(capture, "_grab_direct", lambda area: direct.append(area) or frame(99)[:10, :10])
+
+    assert (capture.grab_bgra((0, 0, 10, 10)) == 10).all()
+    capture.begin_tick([(0, 0, 10, 10)])
+    assert (capture.grab_gray((0, 0, 10, 10), live=True) == 99).all()
+    capture.end_tick()
+    assert direct == [(0, 0, 10, 10)]
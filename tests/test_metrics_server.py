@@ -0,0 +1,85 @@
+"""指標端點：以本機抓取器讀取 /metrics，確認Prometheus文字格式"""
+import os
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path):
+    engine = game_monitor.MonitorEngine(str(tmp_path))
+    engine.metrics.record("capture", 0.004)
+    engine.metrics.record("capture", 0.012)
+    engine.metrics.record_channel(42.0)
+    engine.metrics.increment("boss_detections")
+    engine.is_running = True
+    engine.current_stage_start_time = time.time() - 3
+
+    server = game_monitor.MetricsServer(engine, port=0)
+    assert server.start()
+    yield server
+    server.stop()
+
+
+OPENER = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # 不經過環境變數設定的代理
+
+
+def scrape(server, path="/metrics"):
+    with OPENER.open(f"http://127.0.0.1:{server.port}{path}", timeout=5) as response:
+        return response.headers.get("Content-Type"), response.read().decode("utf-8")
+
+
+def samples(text):
+    """解析樣本行為 {名稱與標籤: 數值}"""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = float(value)
+    return result
+
+
+def test_metrics_text_format(server):
+    content_type, text = scrape(server)
+    assert content_type.startswith("text/plain; version=0.0.4")
+
+    # 每個指標都有 HELP 與 TYPE
+    for name, kind in [("artale_cycles_total", "counter"), ("artale_boss_detections_total", "counter"),
+                       ("artale_telegram_send_failures_total", "counter"),
+                       ("artale_current_stage_seconds", "gauge"), ("artale_duration_seconds", "histogram")]:
+        assert re.search(rf"^# HELP {name} \S", text, re.M)
+        assert f"# TYPE {name} {kind}\n" in text
+
+    values = samples(text)
+    assert values["artale_cycles_total"] == 1
+    assert values["artale_boss_detections_total"] == 1
+    assert values["artale_running"] == 1
+    assert 3 <= values["artale_current_stage_seconds"] < 60
+
+
+def test_histogram_buckets_are_cumulative(server):
+    values = samples(scrape(server)[1])
+    buckets = [(float(match.group(1).replace("+Inf", "inf")), value) for key, value in values.items()
+               if (match := re.fullmatch(r'artale_duration_seconds_bucket\{name="capture",le="([^"]+)"\}', key))]
+
+    assert buckets[-1] == (float("inf"), 2)
+    assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+    assert dict(buckets)[0.005] == 1 and dict(buckets)[0.015] == 2
+    assert values['artale_duration_seconds_count{name="capture"}'] == 2
+    assert values['artale_duration_seconds_sum{name="capture"}'] == pytest.approx(0.016)
+    assert values['artale_duration_seconds_count{name="cycle"}'] == 1
+
+
+def test_other_paths(server):
+    assert scrape(server, "/healthz")[1] == "ok\n"
+    with pytest.raises(urllib.error.HTTPError) as error:
+        scrape(server, "/missing")
+    assert error.value.code == 404
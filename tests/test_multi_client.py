@@ -0,0 +1,105 @@
+"""多開：客戶端共用影像運算資源；當機監控只比對各自區域內的畫面，整輪只擷取一次"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+
+def texture(seed, height=200, width=200):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 10, width // 10), dtype=np.uint8)
+    return np.kron(small, np.ones((10, 10), dtype=np.uint8))
+
+
+DIALOG, NORMAL_1, NORMAL_2 = texture(1), texture(2), texture(3)
+
+
+def bgr(left, right):
+    gray = np.hstack([left, right])
+    return np.dstack([gray] * 3)
+
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("clients.json", "w", encoding="utf-8") as f:
+        json.dump({"clients": [{"name": "1號", "config_dir": "c1"}, {"name": "2號", "config_dir": "c2"}]}, f)
+    orchestrator = game_monitor.MultiClientOrchestrator("clients.json")
+
+    first, second = orchestrator.clients
+    first.config.update({"detection_area": (0, 0, 150, 100), "channel_area": (20, 120, 200, 200)})
+    second.config.update({"detection_area": (200, 0, 400, 200)})
+    # 各自在自己的視窗出現斷線對話框時擷取的全螢幕參考截圖
+    first.crash_screenshots = {"disconnect": bgr(DIALOG, NORMAL_2)}
+    second.crash_screenshots = {"disconnect": bgr(NORMAL_1, DIALOG)}
+
+    alerts = []
+    for client in orchestrator.clients:
+        client.is_running, client.is_paused = True, False
+        client.active_crash_key = client.pending_crash_recovery = None
+        monkeypatch.setattr(client, "send_crash_alert", lambda key, client=client: alerts.append(client.name))
+    orchestrator.alerts = alerts
+    return orchestrator
+
+
+def run_once(orchestrator, monkeypatch, screen):
+    grabs = []
+
+    def grab_direct(area):
+        grabs.append(area)
+        x1, y1, x2, y2 = area
+        gray = screen[y1:y2, x1:x2]
+        return np.dstack([gray, gray, gray, np.full_like(gray, 255)])
+
+    monkeypatch.setattr(orchestrator.capture, "_grab_direct", grab_direct)
+    orchestrator.is_running = True
+    monkeypatch.setattr(game_monitor.time, "sleep", lambda seconds: setattr(orchestrator, "is_running", False))
+    orchestrator.crash_watchdog_loop()
+    return grabs
+
+
+def test_crash_area_defaults_to_client_regions(orchestrator):
+    first, second = orchestrator.clients
+    assert first.get_crash_area() == (0, 0, 200, 200)
+    assert second.get_crash_area() == (200, 0, 400, 200)
+
+
+def test_only_the_crashed_client_enters_recovery(orchestrator, monkeypatch):
+    grabs = run_once(orchestrator, monkeypatch, np.hstack([DIALOG, NORMAL_2]))
+
+    first, second = orchestrator.clients
+    assert first.pending_crash_recovery == "disconnect"
+    assert second.pending_crash_recovery is None
+    assert orchestrator.alerts == ["1號"]
+    assert grabs == [(0, 0, 400, 200)]  # 兩個客戶端共用一次擷取
+
+
+def test_client_without_regions_is_skipped(orchestrator, monkeypatch):
+    second = orchestrator.clients[1]
+    second.config["detection_area"] = None
+    run_once(orchestrator, monkeypatch, np.hstack([NORMAL_1, DIALOG]))
+    assert second.pending_crash_recovery is None
+    assert orchestrator.alerts == []
+
+
+def test_clients_share_classifier_and_scorer(orchestrator):
+    first, second = orchestrator.clients
+    assert first.color_classifier is second.color_classifier is orchestrator.color_classifier
+    assert first.ssim_scorer is second.ssim_scorer is orchestrator.ssim_scorer
+
+    frame = np.zeros((20, 20, 4), dtype=np.uint8)
+    frame[:, :, 2] = 255
+    for client in (first, second):
+        client.evaluate_boss_frame(frame, progressive=False)
+    assert len(orchestrator.color_classifier._tables) == 1  # 規則相同只建一張查找表
+
+    second.config["target_color"] = (0, 255, 0)
+    assert second.evaluate_boss_frame(frame, progressive=False) is False
+    assert first.evaluate_boss_frame(frame, progressive=False) is True
+    assert len(orchestrator.color_classifier._tables) == 2
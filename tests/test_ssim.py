@@ -0,0 +1,62 @@
+"""內建SSIM必須與 scikit-image 的 structural_similarity 數值一致"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+metrics = pytest.importorskip("skimage.metrics")
+
+
+def textured(seed, height=90, width=160):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 10, width // 10), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def noisy(gray, seed, sigma):
+    rng = np.random.default_rng(seed)
+    return np.clip(gray + rng.normal(0, sigma, gray.shape), 0, 255).astype(np.uint8)
+
+
+BASE = textured(1)
+PAIRS = {
+    "identical": (BASE, BASE.copy()),
+    "noise": (BASE, noisy(BASE, 2, 12)),
+    "heavy_noise": (BASE, noisy(BASE, 3, 60)),
+    "brightness": (BASE, cv2.add(BASE, 40)),
+    "shifted": (BASE, np.roll(BASE, 3, axis=1)),
+    "unrelated": (BASE, textured(4)),
+    "flat": (np.full((90, 160), 40, np.uint8), np.full((90, 160), 41, np.uint8)),
+    "odd_size": (textured(5, 37, 53), noisy(textured(5, 37, 53), 6, 20)),
+}
+
+
+def reference_ssim(current, reference, gaussian):
+    kwargs = {"gaussian_weights": True, "sigma": 1.5} if gaussian else {"win_size": 7}
+    return metrics.structural_similarity(current, reference, data_range=255, **kwargs)
+
+
+@pytest.mark.parametrize("gaussian", [False, True], ids=["box", "gaussian"])
+@pytest.mark.parametrize("name", sorted(PAIRS))
+def test_score_matches_skimage(name, gaussian):
+    reference, current = PAIRS[name]
+    scorer = game_monitor.SSIMScorer()
+    score = scorer.score(current, scorer.prepare_reference(reference, gaussian))
+    assert score == pytest.approx(reference_ssim(current, reference, gaussian), abs=1e-4)
+
+
+@pytest.mark.parametrize("gaussian", [False, True], ids=["box", "gaussian"])
+def test_score_many_matches_skimage(gaussian):
+    scorer = game_monitor.SSIMScorer()
+    current = noisy(BASE, 7, 15)
+    references = [reference for reference, _ in PAIRS.values() if reference.shape == current.shape]
+    references += [current for _, current in PAIRS.values() if current.shape == BASE.shape]
+    scores = scorer.score_many(current, [scorer.prepare_reference(reference, gaussian) for reference in references])
+    expected = [reference_ssim(current, reference, gaussian) for reference in references]
+    assert scores == pytest.approx(expected, abs=1e-4)
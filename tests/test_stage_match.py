@@ -0,0 +1,51 @@
+"""階段比對：雜湊預篩不可在亮度不同的低紋理畫面上直接判定匹配"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+
+def textured(height=90, width=160, seed=3):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 10, width // 10), dtype=np.uint8)
+    return np.kron(small, np.ones((10, 10), dtype=np.uint8))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = game_monitor.MonitorEngine(str(tmp_path))
+    engine.config.update({"detection_area": (0, 0, 160, 90), "stage_similarity_threshold": 80})
+    return engine
+
+
+def match(engine, reference_gray, current_gray):
+    engine.stage_screenshots = {"A": np.dstack([reference_gray] * 3)}
+    engine.invalidate_reference_cache()
+    engine.capture.grab_gray = lambda area=None: current_gray
+    return engine.detect_stage_match("A")
+
+
+def test_black_frame_does_not_match_flat_gray_reference(engine):
+    reference = np.full((90, 160), 40, dtype=np.uint8)
+    current = np.zeros((90, 160), dtype=np.uint8)
+    assert match(engine, reference, current) is False
+    assert engine.prefilter_stats["match"] == 0
+
+
+def test_identical_textured_frame_is_accepted_by_hash(engine):
+    reference = textured()
+    assert match(engine, reference, reference.copy()) is True
+    assert engine.prefilter_stats["match"] == 1
+
+
+def test_brightness_shifted_textured_frame_falls_through_to_ssim(engine):
+    reference = textured()
+    current = (reference // 4).astype(np.uint8)  # 明暗方向相同（雜湊相同）但亮度與對比差很多
+    match(engine, reference, current)
+    assert engine.prefilter_stats["match"] == 0
+    assert engine.prefilter_stats["ssim"] == 1
@@ -0,0 +1,166 @@
+"""通知佇列限流：以本機模擬的 Bot API 伺服器驗證摘要合併、警報保留權杖與429延後重送
+
+可直接執行：python tests/test_telegram_rate_limit.py
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game_monitor  # noqa: E402
+
+Dispatcher = game_monitor.NotificationDispatcher
+
+
+class MockBotApi(ThreadingHTTPServer):
+    """記錄每則 sendMessage；前 rate_limit_count 次請求回應429（retry_after 秒）"""
+
+    daemon_threads = True
+
+    def __init__(self, rate_limit_count=0, retry_after=1):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.rate_limit_count = rate_limit_count
+        self.retry_after = retry_after
+        self.requests = []  # (時間, 是否回應429, 訊息內容)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def sent_texts(self):
+        with self.lock:
+            return [text for _, limited, text in self.requests if not limited]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # 關閉 Nagle，避免 keep-alive 連線上每個回應多等 40ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        text = parse_qs(self.rfile.read(length).decode()).get("text", [""])[0]
+        server = self.server
+        with server.lock:
+            limited = len(server.requests) < server.rate_limit_count
+            server.requests.append((time.monotonic(), limited, text))
+
+        if limited:
+            status = 429
+            body = {"ok": False, "error_code": 429, "parameters": {"retry_after": server.retry_after}}
+        else:
+            status = 200
+            body = {"ok": True, "result": {"message_id": len(server.requests)}}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_server(**kwargs):
+    server = MockBotApi(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    created = []
+
+    def make(server, **config):
+        engine = game_monitor.MonitorEngine(str(tmp_path))
+        engine.config.update({
+            "telegram_api_url": server.url,
+            "telegram_bot_token": "TEST",
+            "telegram_chat_id": "1",
+            "telegram_rate_per_chat": 1.0,
+            "telegram_rate_burst": 3,
+        })
+        engine.config.update(config)
+        created.append((engine, server))
+        return engine
+
+    yield make
+    for engine, server in created:
+        engine.stop_notifier()
+        if engine.telegram_api:
+            engine.telegram_api.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_burst_of_low_priority_notifications_is_coalesced(make_engine):
+    server = start_server()
+    engine = make_engine(server)
+
+    receipts = [engine.notify(f"超時通知 {i}", Dispatcher.PRIORITY_TIMEOUT) for i in range(40)]
+    assert all(receipt.wait(10) for receipt in receipts)
+
+    texts = server.sent_texts()
+    assert len(texts) <= 5
+    assert any("則通知彙整" in text for text in texts)
+    # 每則通知恰好送出一次
+    items = [item for text in texts for item in text.split(Dispatcher.DIGEST_SEPARATOR)
+             if not item.startswith("📦")]
+    assert sorted(items) == sorted(f"超時通知 {i}" for i in range(40))
+    assert engine.metrics.snapshot()["counters"]["notifications_coalesced"] >= 35
+
+
+def test_boss_alert_uses_reserved_token_while_low_priority_waits(make_engine):
+    server = start_server()
+    engine = make_engine(server)
+    limiter = engine.get_rate_limiter()
+    # 權杖桶只剩一個：低優先順序必須保留給警報，只能等待補充
+    assert limiter.try_acquire("1") == 0
+    assert limiter.try_acquire("1") == 0
+
+    info = engine.notify("一般通知", Dispatcher.PRIORITY_INFO)
+    time.sleep(0.1)
+    start = time.monotonic()
+    boss = engine.notify("BOSS出現", Dispatcher.PRIORITY_BOSS)
+    assert boss.wait(2)
+    assert time.monotonic() - start < 0.5
+    assert info.status == "queued"
+    assert server.sent_texts() == ["BOSS出現"]
+
+    assert info.wait(5)
+    assert server.sent_texts() == ["BOSS出現", "一般通知"]
+
+
+def test_rate_limited_send_is_requeued_without_using_attempts(make_engine):
+    server = start_server(rate_limit_count=2, retry_after=1)
+    engine = make_engine(server, notification_max_attempts=1)
+
+    start = time.monotonic()
+    receipt = engine.notify("BOSS出現", Dispatcher.PRIORITY_BOSS)
+    assert receipt.wait(10)
+    elapsed = time.monotonic() - start
+
+    assert receipt.attempts == 1
+    assert [limited for _, limited, _ in server.requests] == [True, True, False]
+    # 兩次429都依 retry_after 等待後才重送
+    gaps = [b[0] - a[0] for a, b in zip(server.requests, server.requests[1:])]
+    assert all(gap >= 0.9 for gap in gaps)
+    assert elapsed >= 1.8
+    assert engine.metrics.snapshot()["counters"]["telegram_rate_limited"] == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))